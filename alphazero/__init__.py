@@ -9,8 +9,11 @@ Usage:
 """
 
 from .game_interface import GameInterface
-from .network import PolicyValueNet, NetworkConfig, create_xiangqi_net
+from .network import PolicyValueNet, NetworkConfig, create_xiangqi_net, make_batch_policy_value_fn
 from .mcts_generic import GenericMCTS
+from .export import export_model, load_inference_model
+from .precision import with_precision
+from .registry import ModelRegistry
 from .trainer import Trainer, TrainerConfig, AlphaZeroDataset
 
 __all__ = [
@@ -18,7 +21,12 @@ __all__ = [
 	"PolicyValueNet",
 	"NetworkConfig",
 	"create_xiangqi_net",
+	"make_batch_policy_value_fn",
 	"GenericMCTS",
+	"export_model",
+	"load_inference_model",
+	"with_precision",
+	"ModelRegistry",
 	"Trainer",
 	"TrainerConfig",
 	"AlphaZeroDataset",
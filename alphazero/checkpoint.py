@@ -0,0 +1,150 @@
+"""Flat tensor checkpoints: a JSON header and page-aligned raw tensors.
+
+Layout: 8-byte magic, little-endian uint64 header length, UTF-8 JSON header, then
+each tensor's bytes at a PAGE-aligned offset. The header records the network
+architecture ("legacy" XQNet or "generic" PolicyValueNet with its NetworkConfig)
+and, per tensor, dtype, shape and offset. Loading memory-maps the file and views
+the tensors in place: nothing is unpickled or copied, and processes loading the
+same file share its pages through the OS page cache.
+"""
+from __future__ import annotations
+
+import dataclasses
+import json
+import os
+import struct
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+import torch
+import torch.nn as nn
+
+from .network import NetworkConfig, PolicyValueNet
+
+
+MAGIC = b"XQFLAT01"
+PAGE = 4096
+
+# torch dtype name -> numpy dtype of the same width used to view the raw bytes
+_NP_DTYPES = {
+	"float32": np.float32,
+	"float16": np.float16,
+	"bfloat16": np.int16,
+	"float64": np.float64,
+	"int64": np.int64,
+	"int32": np.int32,
+	"int16": np.int16,
+	"int8": np.int8,
+	"uint8": np.uint8,
+	"bool": np.bool_,
+}
+
+
+def _align(n: int) -> int:
+	return -(-n // PAGE) * PAGE
+
+
+def network_spec(model: nn.Module) -> Tuple[str, Dict[str, Any]]:
+	"""(arch, constructor arguments) describing model, for the checkpoint header."""
+	if isinstance(model, PolicyValueNet):
+		return "generic", dataclasses.asdict(model.config)
+	from xq.policy import NUM_COMPACT_ACTIONS
+	return "legacy", {
+		"in_channels": model.stem.in_channels,
+		"channels": model.stem.out_channels,
+		"num_blocks": len(model.blocks),
+		"compact": model.p_fc.out_features == NUM_COMPACT_ACTIONS,
+	}
+
+
+def build_network(arch: str, config: Dict[str, Any], device: Any = None) -> nn.Module:
+	"""Network described by network_spec (on `device`, e.g. "meta" to skip initialisation)."""
+	with torch.device(device or "cpu"):
+		if arch == "generic":
+			cfg = dict(config)
+			if cfg.get("move_offsets") is not None:
+				cfg["move_offsets"] = tuple(tuple(o) for o in cfg["move_offsets"])
+			return PolicyValueNet(NetworkConfig(**cfg))
+		from xq.nn import XQNet
+		return XQNet(**config)
+
+
+def save_flat(model: nn.Module, path: str, meta: Optional[Dict[str, Any]] = None) -> None:
+	"""Write model's state dict and architecture as a flat checkpoint."""
+	arch, config = network_spec(model)
+	state = {k: v.detach().cpu().contiguous() for k, v in model.state_dict().items()}
+	tensors: Dict[str, Dict[str, Any]] = {}
+	offset = 0
+	for name, t in state.items():
+		dtype = str(t.dtype).replace("torch.", "")
+		if dtype not in _NP_DTYPES:
+			raise ValueError(f"unsupported dtype {t.dtype} for {name}")
+		tensors[name] = {"dtype": dtype, "shape": list(t.shape), "offset": offset, "nbytes": t.numel() * t.element_size()}
+		offset = _align(offset + tensors[name]["nbytes"])
+	header = {"arch": arch, "config": config, "tensors": tensors, "meta": meta or {}}
+	raw = json.dumps(header).encode("utf-8")
+	data_start = _align(len(MAGIC) + 8 + len(raw))
+	os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+	tmp = path + ".tmp"
+	with open(tmp, "wb") as f:
+		f.write(MAGIC)
+		f.write(struct.pack("<Q", len(raw)))
+		f.write(raw)
+		for name, t in state.items():
+			f.seek(data_start + tensors[name]["offset"])
+			f.write(t.view(torch.int16).numpy().tobytes() if t.dtype == torch.bfloat16 else t.numpy().tobytes())
+		f.truncate(data_start + offset)
+	os.replace(tmp, path)  # readers never see a partly written checkpoint
+
+
+def is_flat(path: str) -> bool:
+	try:
+		with open(path, "rb") as f:
+			return f.read(len(MAGIC)) == MAGIC
+	except OSError:
+		return False
+
+
+def _read_header(path: str) -> Tuple[Dict[str, Any], int]:
+	"""(header, file offset of the tensor data)."""
+	with open(path, "rb") as f:
+		if f.read(len(MAGIC)) != MAGIC:
+			raise ValueError(f"{path} is not a flat checkpoint")
+		(n,) = struct.unpack("<Q", f.read(8))
+		return json.loads(f.read(n).decode("utf-8")), _align(len(MAGIC) + 8 + n)
+
+
+def read_header(path: str) -> Dict[str, Any]:
+	"""Header (arch, config, tensor table, meta) without touching the tensor data."""
+	return _read_header(path)[0]
+
+
+def read_flat(path: str) -> Tuple[Dict[str, Any], Dict[str, torch.Tensor]]:
+	"""(header, state dict) with every tensor a view into a private (copy-on-write)
+	memory map of the file."""
+	header, data_start = _read_header(path)
+	mm = np.memmap(path, dtype=np.uint8, mode="c")
+	state: Dict[str, torch.Tensor] = {}
+	for name, spec in header["tensors"].items():
+		start = data_start + spec["offset"]
+		arr = mm[start:start + spec["nbytes"]].view(_NP_DTYPES[spec["dtype"]]).reshape(spec["shape"])
+		t = torch.from_numpy(arr)
+		state[name] = t.view(torch.bfloat16) if spec["dtype"] == "bfloat16" else t
+	return header, state
+
+
+def load_flat(path: str) -> Tuple[nn.Module, str]:
+	"""Eval-mode network from a flat checkpoint, its parameters backed by the mapping."""
+	header, state = read_flat(path)
+	model = build_network(header["arch"], header["config"], device="meta")
+	model.load_state_dict(state, assign=True)
+	materialize_buffers(model)
+	return model.eval(), header["arch"]
+
+
+def materialize_buffers(model: nn.Module) -> None:
+	"""Rebuild derived (non-checkpointed) buffers of a model constructed on the meta
+	device, through each module's reset_buffers()."""
+	for module in model.modules():
+		if any(b.is_meta for b in module.buffers(recurse=False)) and hasattr(module, "reset_buffers"):
+			module.reset_buffers()
@@ -0,0 +1,201 @@
+"""Inference export: BN folding, int8 dynamic quantisation and TorchScript artefacts.
+
+export_model() turns a trained PolicyValueNet or legacy XQNet into a traced
+TorchScript file that load_inference_model() (and so the API server, arena and
+self-play) loads in place of a state dict or flat checkpoint (alphazero.checkpoint). The artefact records its source
+architecture and export options, plus the accuracy check against the float
+model, in an "export.json" extra file.
+"""
+from __future__ import annotations
+
+import copy
+import json
+import os
+import zipfile
+from typing import Any, Dict, Optional, Tuple
+
+import torch
+import torch.nn as nn
+
+from .checkpoint import is_flat, load_flat
+from .network import PolicyValueNet, ResidualBlock, create_xiangqi_net, policy_head_of
+
+
+_META_FILE = "export.json"
+
+# (conv, batchnorm) attribute pairs folded by fold_batchnorm
+_BN_PAIRS = {
+	PolicyValueNet: (("stem", "stem_bn"), ("p_conv", "p_bn"), ("v_conv", "v_bn")),
+	ResidualBlock: (("conv1", "bn1"), ("conv2", "bn2")),
+}
+
+
+class _ChannelsLast(nn.Module):
+	"""Feeds the wrapped network channels-last input (its convs hold channels-last weights)."""
+
+	def __init__(self, model: nn.Module) -> None:
+		super().__init__()
+		self.model = model
+
+	def forward(self, x: torch.Tensor) -> Tuple[torch.Tensor, torch.Tensor]:
+		return self.model(x.contiguous(memory_format=torch.channels_last))
+
+
+def model_arch(model: nn.Module) -> str:
+	"""'generic' for PolicyValueNet, 'legacy' otherwise (XQNet)."""
+	return "generic" if isinstance(model, PolicyValueNet) else "legacy"
+
+
+def fold_batchnorm(model: nn.Module) -> nn.Module:
+	"""Eval-mode copy of model with every BatchNorm folded into the preceding conv
+	(the BN is replaced by Identity). Models without BN are returned as copies."""
+	from torch.nn.utils.fusion import fuse_conv_bn_eval
+
+	model = copy.deepcopy(model).eval()
+	for module in model.modules():
+		for conv_name, bn_name in _BN_PAIRS.get(type(module), ()):
+			bn = getattr(module, bn_name)
+			if isinstance(bn, nn.BatchNorm2d):
+				setattr(module, conv_name, fuse_conv_bn_eval(getattr(module, conv_name), bn))
+				setattr(module, bn_name, nn.Identity())
+	return model
+
+
+@torch.no_grad()
+def check_accuracy(reference: nn.Module, candidate: nn.Module, inputs: torch.Tensor) -> Dict[str, float]:
+	"""Compare candidate against reference on inputs: policy max abs error and mean
+	KL(reference || candidate) over softmax policies, top-1 move agreement and value
+	max abs error."""
+	ref_logits, ref_v = reference.eval()(inputs)
+	logits, v = candidate(inputs)
+	ref_p = torch.softmax(ref_logits.float(), dim=-1)
+	log_p = torch.log_softmax(logits.float(), dim=-1)
+	kl = (ref_p * (torch.log(ref_p.clamp_min(1e-12)) - log_p)).sum(dim=-1)
+	return {
+		"policy_max_abs": float((ref_p - log_p.exp()).abs().max()),
+		"policy_kl": float(kl.mean()),
+		"top1_agreement": float((ref_logits.argmax(dim=-1) == logits.argmax(dim=-1)).float().mean()),
+		"value_max_abs": float((ref_v.float() - v.float()).abs().max()),
+	}
+
+
+def export_model(
+	model: nn.Module,
+	path: str,
+	fold_bn: bool = True,
+	quantize: bool = False,
+	channels_last: bool = False,
+	check_inputs: Optional[torch.Tensor] = None,
+	min_top1: float = 0.9,
+	max_value_error: float = 0.05,
+) -> Dict[str, Any]:
+	"""Trace model for CPU inference and save it as a TorchScript artefact at path.
+
+	fold_bn folds BatchNorm into the convs, quantize applies int8 dynamic
+	quantisation to the Linear layers (the dense heads), channels_last stores conv
+	weights and activations channels-last. With check_inputs (a [N, C, H, W] batch
+	of real positions) the artefact is compared with the float model and ValueError
+	is raised if top-1 agreement is below min_top1 or a value differs by more than
+	max_value_error. Returns the metadata saved with the artefact.
+	"""
+	reference = copy.deepcopy(model).cpu().eval()
+	net = fold_batchnorm(reference) if fold_bn else copy.deepcopy(reference)
+	if quantize:
+		from torch.ao.quantization import quantize_dynamic
+		net = quantize_dynamic(net, {nn.Linear}, dtype=torch.qint8)
+	if channels_last:
+		net = _ChannelsLast(net.to(memory_format=torch.channels_last))
+	if check_inputs is not None:
+		example = check_inputs[:1].cpu()
+	elif isinstance(reference, PolicyValueNet):
+		cfg = reference.config
+		example = torch.zeros(1, cfg.input_channels, cfg.board_height, cfg.board_width)
+	else:
+		example = torch.zeros(1, reference.stem.in_channels, 10, 9)
+	with torch.no_grad():
+		traced = torch.jit.trace(net.eval(), example)
+	meta: Dict[str, Any] = {
+		"arch": model_arch(reference),
+		"fold_bn": fold_bn,
+		"quantize": quantize,
+		"channels_last": channels_last,
+		"input_shape": list(example.shape[1:]),
+	}
+	if check_inputs is not None:
+		acc = check_accuracy(reference, traced, check_inputs.cpu())
+		meta["accuracy"] = acc
+		if acc["top1_agreement"] < min_top1 or acc["value_max_abs"] > max_value_error:
+			raise ValueError(f"exported model deviates from the float model: {acc}")
+	os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+	torch.jit.save(traced, path, _extra_files={_META_FILE: json.dumps(meta)})
+	return meta
+
+
+def is_exported(path: str) -> bool:
+	"""True if path is a TorchScript archive (export_model output) rather than a state dict."""
+	if not zipfile.is_zipfile(path):
+		return False
+	with zipfile.ZipFile(path) as zf:
+		return any(name.endswith("/constants.pkl") or name == "constants.pkl" for name in zf.namelist())
+
+
+def load_inference_model(
+	path: str, map_location: str = "cpu", mmap: bool = False, precision: str = "fp32"
+) -> Tuple[nn.Module, str]:
+	"""Load an eval-mode Xiangqi network from a state dict, a flat checkpoint or an
+	exported artefact.
+
+	Flat checkpoints are always memory-mapped (see alphazero.checkpoint). State
+	dicts are matched to their architecture with xiangqi_net_for. With mmap the
+	checkpoint is memory-mapped and its tensors become the model's parameters (no
+	read-and-copy); checkpoints in torch's legacy non-zip format load normally.
+	A precision other than "fp32" converts the network with
+	alphazero.precision.with_precision, raising ValueError if it fails calibration.
+	Returns (model, arch) with arch "legacy" or "generic"; for artefacts arch is that
+	of the exported network.
+	"""
+	if is_flat(path):
+		model, arch = load_flat(path)
+	elif is_exported(path):
+		model = torch.jit.load(path, map_location=map_location).eval()
+		arch = read_export_metadata(path).get("arch", "legacy")
+	else:
+		assign = mmap and zipfile.is_zipfile(path)
+		state_dict = torch.load(path, map_location=map_location, mmap=assign)
+		model, arch = xiangqi_net_for(state_dict)
+		model.load_state_dict(state_dict, assign=assign)
+		model.eval()
+	if precision != "fp32":
+		from .precision import with_precision
+		model, _ = with_precision(model, precision)
+	return model, arch
+
+
+def xiangqi_net_for(state_dict: Dict[str, Any]) -> Tuple[nn.Module, str]:
+	"""Untrained network matching a Xiangqi state dict, and its arch: BatchNorm keys
+	mean the generic PolicyValueNet (policy head from policy_head_of), otherwise
+	legacy XQNet; the policy size tells the 8100 and compact action spaces apart,
+	and the stem and block keys give the trunk width and depth."""
+	from xq.nn import XQNet
+	from xq.policy import NUM_COMPACT_ACTIONS
+
+	compact = "p_move.actions" in state_dict or (
+		"p_fc.weight" in state_dict and state_dict["p_fc.weight"].shape[0] == NUM_COMPACT_ACTIONS
+	)
+	channels = state_dict["stem.weight"].shape[0]
+	blocks = len({key.split(".")[1] for key in state_dict.keys() if key.startswith("blocks.")})
+	if any("bn" in key for key in state_dict.keys()):
+		net = create_xiangqi_net(policy_head_of(state_dict), compact=compact, hidden_channels=channels, num_res_blocks=blocks)
+		return net, "generic"
+	return XQNet(channels=channels, num_blocks=blocks, compact=compact), "legacy"
+
+
+def read_export_metadata(path: str) -> Dict[str, Any]:
+	"""Metadata saved by export_model ({} for plain state dicts)."""
+	if not zipfile.is_zipfile(path):
+		return {}
+	with zipfile.ZipFile(path) as zf:
+		for name in zf.namelist():
+			if name.endswith("/extra/" + _META_FILE):
+				return json.loads(zf.read(name).decode("utf-8") or "{}")
+	return {}
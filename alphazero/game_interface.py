@@ -1,8 +1,11 @@
 from __future__ import annotations
 
+import copy
 from abc import ABC, abstractmethod
 from typing import List, Tuple, Optional, Any
 
+import numpy as np
+
 
 class GameInterface(ABC):
 	"""Abstract interface for any board game to work with AlphaZero framework."""
@@ -61,4 +64,42 @@ class GameInterface(ABC):
 	def display(self, state: Any) -> str:
 		"""Return human-readable string representation of state."""
 		pass
+	
+	# Batch API. The defaults loop over the per-state methods; games should override
+	# them with vectorised versions where they can.
+	
+	def states_to_tensor(self, states: List[Any]) -> np.ndarray:
+		"""Return float32 array [N, *observation_shape] for a batch of states."""
+		return np.stack([np.asarray(self.state_to_tensor(s), dtype=np.float32) for s in states])
+	
+	def legal_action_masks(self, states: List[Any]) -> np.ndarray:
+		"""Return bool array [N, action_size], True where the action is legal."""
+		masks = np.zeros((len(states), self.get_action_size()), dtype=bool)
+		for i, s in enumerate(states):
+			masks[i, self.get_legal_actions(s)] = True
+		return masks
+	
+	def game_results(self, states: List[Any]) -> List[Optional[float]]:
+		"""Return get_game_result for each state."""
+		return [self.get_game_result(s) for s in states]
+	
+	# Optional make/unmake protocol. Games that override apply_action and undo_action
+	# are searched on a single mutable state instead of a new state per tree edge.
+	
+	def apply_action(self, state: Any, action: int) -> None:
+		"""Apply a legal action to state in place. Legality need not be checked."""
+		raise NotImplementedError
+	
+	def undo_action(self, state: Any) -> None:
+		"""Revert the most recent apply_action on state."""
+		raise NotImplementedError
+	
+	def supports_make_unmake(self) -> bool:
+		"""True if this game overrides apply_action and undo_action."""
+		cls = type(self)
+		return cls.apply_action is not GameInterface.apply_action and cls.undo_action is not GameInterface.undo_action
+	
+	def copy_state(self, state: Any) -> Any:
+		"""Independent copy of state (used to snapshot leaves during make/unmake search)."""
+		return copy.deepcopy(state)
 
@@ -2,102 +2,311 @@ from __future__ import annotations
 
 import math
 import random
+import time
 from typing import Callable, Dict, Optional, Tuple, List, Any
 
+import numpy as np
+
 from .game_interface import GameInterface
 
 
 PolicyValueFn = Callable[[Any], Tuple[List[float], float]]
+BatchPolicyValueFn = Callable[[List[Any]], List[Tuple[List[float], float]]]  # one (policy, value) per state
+
+_UNCHECKED = object()  # MCTSNode.terminal before get_game_result has been called
 
 
 class MCTSNode:
+	"""Search node with child statistics in numpy arrays indexed by slot.
+
+	actions[i], P[i], N[i], W[i] describe the edge to the i-th legal action; W is
+	from this node's player's POV. Child nodes are created the first time selection
+	traverses an edge. terminal caches get_game_result for this node's state
+	(None once known to be ongoing), so adjudication runs once per node.
+	"""
+
+	__slots__ = ("prior", "visit_count", "value_sum", "actions", "P", "N", "W", "children", "terminal", "is_expanded")
+
 	def __init__(self, prior: float) -> None:
 		self.prior = prior
 		self.visit_count = 0
 		self.value_sum = 0.0
-		self.children: Dict[int, MCTSNode] = {}
-	
+		self.actions: np.ndarray = np.empty(0, dtype=np.int64)
+		self.P: np.ndarray = np.empty(0)
+		self.N: np.ndarray = np.empty(0)
+		self.W: np.ndarray = np.empty(0)
+		self.children: Dict[int, MCTSNode] = {}  # action -> child
+		self.terminal: Any = _UNCHECKED
+		self.is_expanded = False
+
 	def value(self) -> float:
 		return self.value_sum / max(1, self.visit_count)
-	
-	def uct_score(self, parent_visit: int, cpuct: float) -> float:
-		u = cpuct * self.prior * math.sqrt(parent_visit) / (1 + self.visit_count)
-		return self.value() + u
+
+	def child(self, slot: int) -> "MCTSNode":
+		action = int(self.actions[slot])
+		node = self.children.get(action)
+		if node is None:
+			node = MCTSNode(prior=float(self.P[slot]))
+			self.children[action] = node
+		return node
 
 
 class GenericMCTS:
-	"""Generic MCTS for any game implementing GameInterface."""
-	
-	def __init__(self, game: GameInterface, cpuct: float = 1.5, dirichlet_alpha: float = 0.3, dirichlet_frac: float = 0.25):
+	"""Generic MCTS for any game implementing GameInterface.
+
+	Simulations are iterative (no recursion) and PUCT selection is vectorised over a
+	node's edge arrays. With batch_size > 1 and a batch_policy_value_fn, leaves are
+	collected under virtual loss and evaluated batch_size at a time. The last search
+	tree is kept in self.root; pass it back as root= to continue searching it.
+
+	Games that support make/unmake (GameInterface.apply_action / undo_action) are
+	searched on the caller's state in place, which is restored after every
+	simulation; otherwise each tree edge goes through get_next_state.
+
+	stats: optional collector with the xq.stats.SearchStats interface. Each search
+	records into a fresh instance (self.last_stats) and merges it into this one.
+	Encoding happens inside the policy functions, so it is counted as inference.
+	"""
+
+	def __init__(self, game: GameInterface, cpuct: float = 1.5, dirichlet_alpha: float = 0.3, dirichlet_frac: float = 0.25,
+				 batch_size: int = 1, virtual_loss: float = 1.0, stats: Optional[Any] = None):
 		self.game = game
 		self.cpuct = cpuct
 		self.dirichlet_alpha = dirichlet_alpha
 		self.dirichlet_frac = dirichlet_frac
-	
-	def search(self, state: Any, policy_value_fn: PolicyValueFn, num_simulations: int = 200) -> Dict[int, float]:
-		"""Run MCTS and return action visit counts."""
-		root = MCTSNode(prior=1.0)
-		
-		for _ in range(num_simulations):
-			self._simulate(state, root, policy_value_fn)
-		
-		# Return visit counts as policy
-		total = sum(child.visit_count for child in root.children.values())
-		if total == 0:
+		self.batch_size = max(1, batch_size)
+		self.virtual_loss = virtual_loss
+		self.root: Optional[MCTSNode] = None
+		self._inplace = game.supports_make_unmake()
+		self.stats = stats
+		self.last_stats: Optional[Any] = None
+		self._st: Optional[Any] = None  # collector of the search in progress
+
+	def search(
+		self,
+		state: Any,
+		policy_value_fn: Optional[PolicyValueFn],
+		num_simulations: int = 200,
+		batch_policy_value_fn: Optional[BatchPolicyValueFn] = None,
+		root: Optional[MCTSNode] = None,
+		add_noise: bool = True,
+	) -> Dict[int, float]:
+		"""Run MCTS and return root visit counts normalised to probabilities.
+		Either policy_value_fn or batch_policy_value_fn must be given; the batched one
+		is used when batch_size > 1 (or when it is the only one).
+		"""
+		if policy_value_fn is None and batch_policy_value_fn is None:
+			raise ValueError("policy_value_fn or batch_policy_value_fn is required")
+		if policy_value_fn is None:
+			policy_value_fn = lambda s: batch_policy_value_fn([s])[0]
+		if root is None:
+			root = MCTSNode(prior=1.0)
+		self.root = root
+		st = self._st = type(self.stats)() if self.stats is not None else None
+		t_run = time.perf_counter()
+		total_sims = num_simulations
+		if not root.is_expanded and self._terminal(root, state) is None:
+			policy, value = self._evaluate(policy_value_fn, state)
+			self._expand(root, state, policy, add_noise=add_noise)
+			root.visit_count += 1
+			root.value_sum += value
+			num_simulations -= 1
+		if batch_policy_value_fn is not None and self.batch_size > 1:
+			done = 0
+			while done < num_simulations:
+				n = self._simulate_batch(state, root, batch_policy_value_fn, min(self.batch_size, num_simulations - done))
+				if n == 0:
+					break
+				done += n
+		else:
+			for _ in range(num_simulations):
+				self._simulate(state, root, policy_value_fn)
+		if st is not None:
+			st.searches += 1
+			st.simulations += total_sims
+			st.wall_s += time.perf_counter() - t_run
+			self.stats.merge(st)
+			self.last_stats = st
+			self._st = None
+		return self.action_probs(root)
+
+	def action_probs(self, root: Optional[MCTSNode] = None) -> Dict[int, float]:
+		"""Root visit counts normalised to probabilities, keyed by action."""
+		root = root or self.root
+		if root is None:
+			return {}
+		total = float(root.N.sum())
+		if total <= 0:
 			return {}
-		return {action: child.visit_count / total for action, child in root.children.items()}
-	
-	def _simulate(self, state: Any, node: MCTSNode, policy_value_fn: PolicyValueFn) -> float:
-		# Check terminal
-		result = self.game.get_game_result(state)
-		if result is not None:
-			return result
-		
-		# Expand if not yet
-		if not node.children:
-			legal = self.game.get_legal_actions(state)
-			if not legal:
-				return 0.0
-			
-			policy, value = policy_value_fn(state)
-			
-			# Mask and normalize
-			legal_probs = {a: policy[a] for a in legal}
-			total = sum(legal_probs.values())
-			if total > 0:
-				legal_probs = {a: p / total for a, p in legal_probs.items()}
+		return {int(a): float(n) / total for a, n in zip(root.actions, root.N) if n > 0}
+
+	def _simulate(self, state: Any, root: MCTSNode, policy_value_fn: PolicyValueFn) -> None:
+		path, node, leaf_state = self._descend(state, root)
+		try:
+			value = node.terminal
+			if value is None:
+				policy, value = self._evaluate(policy_value_fn, leaf_state)
+				self._expand(node, leaf_state, policy)
+		finally:
+			self._rewind(leaf_state, path)
+		self._backup(path, node, value)
+
+	def _evaluate(self, policy_value_fn: PolicyValueFn, state: Any) -> Tuple[Any, float]:
+		st = self._st
+		if st is None:
+			return policy_value_fn(state)
+		t0 = time.perf_counter()
+		out = policy_value_fn(state)
+		dt = time.perf_counter() - t0
+		st.add_time("inference", dt)
+		st.record_batch(1, dt)
+		return out
+
+	def _simulate_batch(self, state: Any, root: MCTSNode, batch_fn: BatchPolicyValueFn, n: int) -> int:
+		"""Collect up to n leaves under virtual loss, evaluate them in one call and back
+		them up. Terminal leaves are backed up on the spot; the batch is cut short when
+		selection reaches a leaf that is already pending. Returns simulations done.
+		"""
+		batch: List[Tuple[List[Tuple[MCTSNode, int]], MCTSNode, Any]] = []
+		pending = set()
+		done = 0
+		while len(batch) + done < n:
+			path, node, leaf_state = self._descend(state, root)
+			if node.terminal is not None:
+				self._rewind(leaf_state, path)
+				self._backup(path, node, node.terminal)
+				done += 1
+				continue
+			if id(node) in pending:
+				self._rewind(leaf_state, path)
+				break
+			self._add_virtual_loss(path, 1.0)
+			pending.add(id(node))
+			if self._inplace:
+				snapshot = self.game.copy_state(leaf_state)
+				self._rewind(leaf_state, path)
+				leaf_state = snapshot
+			batch.append((path, node, leaf_state))
+		if batch:
+			st = self._st
+			if st is not None:
+				t0 = time.perf_counter()
+			outputs = batch_fn([leaf_state for _, _, leaf_state in batch])
+			if st is not None:
+				dt = time.perf_counter() - t0
+				st.add_time("inference", dt)
+				st.record_batch(len(batch), dt)
+			if st is not None:
+				t0 = time.perf_counter()
+			masks = self.game.legal_action_masks([leaf_state for _, _, leaf_state in batch])
+			if st is not None:
+				st.add_time("movegen", time.perf_counter() - t0)
+			for (path, node, leaf_state), (policy, value), mask in zip(batch, outputs, masks):
+				self._add_virtual_loss(path, -1.0)
+				self._expand(node, leaf_state, policy, legal=np.flatnonzero(mask))
+				self._backup(path, node, value)
+		return done + len(batch)
+
+	def _descend(self, state: Any, root: MCTSNode) -> Tuple[List[Tuple[MCTSNode, int]], MCTSNode, Any]:
+		"""Select from root down to an unexpanded or terminal node. With make/unmake the
+		returned state is the caller's, advanced along path; pass it to _rewind."""
+		st = self._st
+		if st is not None:
+			t0 = time.perf_counter()
+			movegen0 = st.phase_s["movegen"]
+		path: List[Tuple[MCTSNode, int]] = []
+		node = root
+		while self._terminal(node, state) is None and node.is_expanded:
+			slot = self._select(node)
+			path.append((node, slot))
+			if self._inplace:
+				self.game.apply_action(state, int(node.actions[slot]))
+			else:
+				state = self.game.get_next_state(state, int(node.actions[slot]))
+			node = node.child(slot)
+		if st is not None:
+			# adjudication of newly reached nodes is booked under movegen
+			st.add_time("select", time.perf_counter() - t0 - (st.phase_s["movegen"] - movegen0))
+			st.record_leaf(len(path), node.terminal is not None)
+		return path, node, state
+
+	def _rewind(self, state: Any, path: List[Tuple[MCTSNode, int]]) -> None:
+		"""Undo the moves _descend applied in place (no-op without make/unmake)."""
+		if self._inplace:
+			for _ in path:
+				self.game.undo_action(state)
+
+	def _terminal(self, node: MCTSNode, state: Any) -> Optional[float]:
+		if node.terminal is _UNCHECKED:
+			if self._st is not None:
+				t0 = time.perf_counter()
+				node.terminal = self.game.get_game_result(state)
+				self._st.add_time("movegen", time.perf_counter() - t0)
 			else:
-				w = 1.0 / len(legal)
-				legal_probs = {a: w for a in legal}
-			
-			# Add Dirichlet noise at root
-			if node.visit_count == 0 and len(legal_probs) > 0:
-				noise = _sample_dirichlet(len(legal_probs), self.dirichlet_alpha)
-				actions = list(legal_probs.keys())
-				for i, a in enumerate(actions):
-					legal_probs[a] = (1 - self.dirichlet_frac) * legal_probs[a] + self.dirichlet_frac * noise[i]
-			
-			# Create children
-			for action, prob in legal_probs.items():
-				node.children[action] = MCTSNode(prior=prob)
-			
+				node.terminal = self.game.get_game_result(state)
+		return node.terminal
+
+	def _select(self, node: MCTSNode) -> int:
+		N = node.N
+		q = np.divide(node.W, N, out=np.zeros_like(node.W), where=N > 0)
+		u = self.cpuct * math.sqrt(max(1, node.visit_count)) * node.P / (1.0 + N)
+		return int(np.argmax(q + u))
+
+	def _expand(self, node: MCTSNode, state: Any, policy: Any, add_noise: bool = False, legal: Any = None) -> None:
+		"""legal: the state's legal actions if already known (e.g. from a batched mask)."""
+		st = self._st
+		if legal is None:
+			if st is not None:
+				t0 = time.perf_counter()
+				legal = self.game.get_legal_actions(state)
+				st.add_time("movegen", time.perf_counter() - t0)
+			else:
+				legal = self.game.get_legal_actions(state)
+		if st is not None:
+			st.record_expand(len(legal))
+		if len(legal) == 0:
+			# No moves but not adjudicated: score as a draw
+			node.terminal = 0.0
+			return
+		actions = np.asarray(legal, dtype=np.int64)
+		priors = np.asarray(policy, dtype=np.float64)[actions] if isinstance(policy, np.ndarray) else np.array([policy[a] for a in legal], dtype=np.float64)
+		total = priors.sum()
+		if total > 0:
+			priors = priors / total
+		else:
+			priors = np.full(len(legal), 1.0 / len(legal))
+		# Dirichlet noise at the root only
+		if add_noise:
+			noise = np.array(_sample_dirichlet(len(legal), self.dirichlet_alpha))
+			priors = (1 - self.dirichlet_frac) * priors + self.dirichlet_frac * noise
+		node.actions = actions
+		node.P = priors
+		node.N = np.zeros(len(legal))
+		node.W = np.zeros(len(legal))
+		node.is_expanded = True
+
+	def _backup(self, path: List[Tuple[MCTSNode, int]], leaf: MCTSNode, value: float) -> None:
+		# value is from the leaf player's POV; each edge is scored for the player moving on it
+		if self._st is not None:
+			t0 = time.perf_counter()
+		leaf.visit_count += 1
+		leaf.value_sum += value
+		for node, slot in reversed(path):
+			value = -value
+			node.N[slot] += 1
+			node.W[slot] += value
 			node.visit_count += 1
 			node.value_sum += value
-			return value
-		
-		# Select best child
-		best_action = max(node.children.items(), key=lambda kv: kv[1].uct_score(node.visit_count, self.cpuct))[0]
-		child = node.children[best_action]
-		
-		# Recurse
-		next_state = self.game.get_next_state(state, best_action)
-		value = -self._simulate(next_state, child, policy_value_fn)
-		
-		# Backup
-		node.visit_count += 1
-		node.value_sum += value
-		
-		return value
+		if self._st is not None:
+			self._st.add_time("backup", time.perf_counter() - t0)
+
+	def _add_virtual_loss(self, path: List[Tuple[MCTSNode, int]], sign: float) -> None:
+		# A pending leaf counts as a lost visit for every mover on its path
+		vl = sign * self.virtual_loss
+		for node, slot in path:
+			node.N[slot] += sign
+			node.W[slot] -= vl
+			node.visit_count += int(sign)
 
 
 def _sample_dirichlet(k: int, alpha: float) -> List[float]:
@@ -108,4 +317,3 @@ def _sample_dirichlet(k: int, alpha: float) -> List[float]:
 	if s <= 0:
 		return [1.0 / k] * k
 	return [v / s for v in vals]
-
@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from typing import Tuple
+from typing import Any, List, Optional, Sequence, Tuple
 
 import torch
 import torch.nn as nn
@@ -17,6 +17,26 @@ class NetworkConfig:
 	action_size: int
 	hidden_channels: int = 64
 	num_res_blocks: int = 3
+	# "dense": one Linear from the policy features to action_size logits.
+	# "conv": one logit plane per move offset (d_rank, d_file), gathered onto the
+	# from*H*W+to action space; requires move_offsets and action_size == (H*W)**2
+	# (or len(action_map)).
+	policy_head: str = "dense"
+	move_offsets: Optional[Sequence[Tuple[int, int]]] = None
+	# from*H*W+to index of each action when the action space is a subset of the
+	# from-to pairs (Xiangqi's compact space); used by the conv head
+	action_map: Optional[Sequence[int]] = None
+
+
+# Every (d_rank, d_file) a Xiangqi piece can move by: straight lines (rook, cannon,
+# king, pawn, flying general), knight, bishop and advisor steps
+XIANGQI_MOVE_OFFSETS: Tuple[Tuple[int, int], ...] = (
+	tuple((d, 0) for d in range(-9, 10) if d)
+	+ tuple((0, d) for d in range(-8, 9) if d)
+	+ ((1, 2), (2, 1), (2, -1), (1, -2), (-1, -2), (-2, -1), (-2, 1), (-1, 2))
+	+ ((2, 2), (2, -2), (-2, 2), (-2, -2))
+	+ ((1, 1), (1, -1), (-1, 1), (-1, -1))
+)
 
 
 class ResidualBlock(nn.Module):
@@ -35,6 +55,60 @@ class ResidualBlock(nn.Module):
 		return x
 
 
+def move_plane_index(height: int, width: int, offsets: Sequence[Tuple[int, int]]) -> torch.Tensor:
+	"""Gather index from flattened move planes [len(offsets) * H * W (+1 pad)] onto the
+	from*H*W+to action space. Plane k holds, at square `from`, the logit of moving by
+	offsets[k]; from-to pairs no offset connects point at the pad entry."""
+	squares = height * width
+	pad = len(offsets) * squares
+	index = torch.full((squares * squares,), pad, dtype=torch.long)
+	rank = torch.arange(height).view(-1, 1).expand(height, width)
+	file = torch.arange(width).view(1, -1).expand(height, width)
+	for k, (dr, df) in enumerate(offsets):
+		tr, tf = rank + dr, file + df
+		valid = (tr >= 0) & (tr < height) & (tf >= 0) & (tf < width)
+		frm = (rank * width + file)[valid]
+		index[frm * squares + (tr * width + tf)[valid]] = k * squares + frm
+	return index
+
+
+class ConvPolicyHead(nn.Module):
+	"""Convolutional policy head: a 3x3 conv predicts one logit per (from-square, move
+	offset), and a fixed gather lays them out as from-to logits. Actions no offset
+	reaches get UNREACHABLE_LOGIT, so they take no probability mass and soft-target
+	cross-entropy stays finite. About 15k weights instead of the dense head's 23M."""
+
+	UNREACHABLE_LOGIT = -1e4
+
+	def __init__(self, in_channels: int, height: int, width: int, offsets: Sequence[Tuple[int, int]],
+				 action_map: Optional[Sequence[int]] = None) -> None:
+		super().__init__()
+		self.conv = nn.Conv2d(in_channels, len(offsets), kernel_size=3, padding=1)
+		self._geometry = (height, width, tuple(offsets))
+		if action_map is not None:
+			# a subset action space is part of the architecture, so it is saved
+			self.register_buffer("actions", torch.as_tensor(list(action_map), dtype=torch.long))
+		self.register_buffer("index", torch.empty(0, dtype=torch.long), persistent=False)
+		self.reset_buffers()
+
+	def reset_buffers(self) -> None:
+		"""(Re)compute the gather index, e.g. once a model built on the meta device has
+		had its weights assigned."""
+		if self.conv.weight.is_meta:
+			self.index = torch.empty(0, dtype=torch.long, device="meta")
+			return
+		height, width, offsets = self._geometry
+		index = move_plane_index(height, width, offsets)
+		if hasattr(self, "actions"):
+			index = index[self.actions.cpu()]
+		self.index = index.to(self.conv.weight.device)
+
+	def forward(self, x: torch.Tensor) -> torch.Tensor:
+		planes = self.conv(x).reshape(x.size(0), -1)
+		pad = planes.new_full((x.size(0), 1), self.UNREACHABLE_LOGIT)
+		return torch.cat([planes, pad], dim=1)[:, self.index]
+
+
 class PolicyValueNet(nn.Module):
 	"""Generic CNN policy-value network for board games."""
 	
@@ -54,7 +128,16 @@ class PolicyValueNet(nn.Module):
 		# Policy head
 		self.p_conv = nn.Conv2d(config.hidden_channels, 32, kernel_size=1)
 		self.p_bn = nn.BatchNorm2d(32)
-		self.p_fc = nn.Linear(32 * config.board_height * config.board_width, config.action_size)
+		if config.policy_head == "conv":
+			squares = config.board_height * config.board_width
+			actions = squares * squares if config.action_map is None else len(config.action_map)
+			if not config.move_offsets or config.action_size != actions:
+				raise ValueError("conv policy head needs move_offsets and a from-to action space of (H*W)**2 actions (or action_map)")
+			self.p_move = ConvPolicyHead(32, config.board_height, config.board_width, config.move_offsets, config.action_map)
+		elif config.policy_head == "dense":
+			self.p_fc = nn.Linear(32 * config.board_height * config.board_width, config.action_size)
+		else:
+			raise ValueError(f"unknown policy_head {config.policy_head!r}")
 		
 		# Value head
 		self.v_conv = nn.Conv2d(config.hidden_channels, 32, kernel_size=1)
@@ -70,8 +153,10 @@ class PolicyValueNet(nn.Module):
 		
 		# Policy head
 		p = F.relu(self.p_bn(self.p_conv(x)))
-		p = p.reshape(p.size(0), -1)
-		p = self.p_fc(p)
+		if self.config.policy_head == "conv":
+			p = self.p_move(p)
+		else:
+			p = self.p_fc(p.reshape(p.size(0), -1))
 		
 		# Value head
 		v = F.relu(self.v_bn(self.v_conv(x)))
@@ -82,15 +167,60 @@ class PolicyValueNet(nn.Module):
 		return p, v.squeeze(-1)
 
 
-def create_xiangqi_net() -> PolicyValueNet:
-	"""Factory for Xiangqi-specific network."""
+def create_xiangqi_net(
+	policy_head: str = "dense", compact: bool = False, hidden_channels: int = 64, num_res_blocks: int = 3
+) -> PolicyValueNet:
+	"""Factory for Xiangqi-specific network (policy_head "dense" or "conv"). With
+	compact the policy covers xq.policy's compact action space instead of 8100."""
+	action_size, action_map = 8100, None
+	if compact:
+		from xq.policy import COMPACT_TO_FULL
+		action_size = len(COMPACT_TO_FULL)
+		action_map = COMPACT_TO_FULL.tolist() if policy_head == "conv" else None
 	config = NetworkConfig(
 		input_channels=15,
 		board_height=10,
 		board_width=9,
-		action_size=8100,
-		hidden_channels=64,
-		num_res_blocks=3
+		action_size=action_size,
+		hidden_channels=hidden_channels,
+		num_res_blocks=num_res_blocks,
+		policy_head=policy_head,
+		move_offsets=XIANGQI_MOVE_OFFSETS if policy_head == "conv" else None,
+		action_map=action_map,
 	)
 	return PolicyValueNet(config)
 
+
+def policy_head_of(state_dict: Any) -> str:
+	"""Policy head ("dense" or "conv") of a PolicyValueNet state dict."""
+	return "conv" if any(key.startswith("p_move.") for key in state_dict.keys()) else "dense"
+
+
+def make_batch_policy_value_fn(model: nn.Module, game: Any, device: Optional[torch.device] = None, action_map: Optional[Any] = None):
+	"""Batched policy-value function for GenericMCTS (batch_policy_value_fn): one
+	game.states_to_tensor call and one forward pass per batch. Policies are returned
+	as numpy arrays over game.get_action_size() actions.
+
+	action_map gives the game action of each policy output for networks with a
+	smaller action space (for Xiangqi's compact networks, xq.policy.COMPACT_TO_FULL);
+	their policies are scattered into the game's space. A network whose policy size
+	differs from the game's without an action_map is rejected with ValueError.
+	"""
+	if device is None:
+		device = next(model.parameters()).device
+	action_size = game.get_action_size()
+	index = None if action_map is None else torch.as_tensor(action_map, dtype=torch.long, device=device)
+
+	@torch.no_grad()
+	def fn(states: List[Any]) -> List[Tuple[Any, float]]:
+		model.eval()
+		x = torch.from_numpy(game.states_to_tensor(states)).to(device)
+		logits, values = model(x)
+		policies = torch.softmax(logits.float(), dim=-1)
+		if index is not None:
+			policies = torch.zeros(policies.shape[0], action_size, device=device).index_copy_(1, index, policies)
+		elif policies.shape[-1] != action_size:
+			raise ValueError(f"network policy has {policies.shape[-1]} outputs but the game has {action_size} actions; pass action_map")
+		return list(zip(policies.cpu().numpy(), values.float().cpu().tolist()))
+
+	return fn
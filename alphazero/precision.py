@@ -0,0 +1,117 @@
+"""Reduced-precision inference: bfloat16/float16 networks and int8 dynamic
+quantisation, accepted only after a calibration check against float32.
+
+with_precision(model, "bf16") returns a network that runs in bfloat16 but takes
+and returns float32 tensors, so callers (infer_policy_value, the batched
+evaluators, MCTS policy functions) are unchanged. The converted network is first
+compared with the fp32 one on a sample of positions; a mode whose mean policy KL
+or value MAE exceeds its threshold is refused with ValueError.
+"""
+from __future__ import annotations
+
+import copy
+import functools
+import random
+from typing import Any, Dict, Optional, Tuple
+
+import torch
+import torch.nn as nn
+
+from .export import check_accuracy, fold_batchnorm
+
+
+PRECISIONS = ("fp32", "bf16", "fp16", "int8")
+_DTYPES = {"bf16": torch.bfloat16, "fp16": torch.float16}
+
+
+class ReducedPrecision(nn.Module):
+	"""Runs the wrapped network (whose weights are in dtype) on inputs cast to dtype
+	and returns float32 logits and values."""
+
+	def __init__(self, model: nn.Module, dtype: torch.dtype) -> None:
+		super().__init__()
+		self.model = model
+		self.dtype = dtype
+
+	def forward(self, x: torch.Tensor) -> Tuple[torch.Tensor, torch.Tensor]:
+		logits, values = self.model(x.to(self.dtype))
+		return logits.float(), values.float()
+
+
+def convert(model: nn.Module, precision: str) -> nn.Module:
+	"""Eval-mode copy of model in precision (fp32 returns model itself). int8 folds
+	BatchNorm and quantises the Linear layers (the dense heads); it is CPU only."""
+	if precision not in PRECISIONS:
+		raise ValueError(f"unknown precision {precision!r} (expected one of {PRECISIONS})")
+	if isinstance(model, torch.jit.ScriptModule) and precision != "fp32":
+		raise ValueError("exported artefacts keep the precision they were exported with")
+	if precision == "fp32":
+		return model.eval()
+	if precision == "int8":
+		from torch.ao.quantization import quantize_dynamic
+		return quantize_dynamic(fold_batchnorm(model).cpu(), {nn.Linear}, dtype=torch.qint8).eval()
+	dtype = _DTYPES[precision]
+	return ReducedPrecision(copy.deepcopy(model).to(dtype), dtype).eval()
+
+
+def calibration_inputs(n: int = 256, max_plies: int = 80, seed: int = 0) -> torch.Tensor:
+	"""[n, 15, 10, 9] encoded Xiangqi positions (opening to middlegame) sampled from
+	seeded random games of up to max_plies plies. Built once per process for each
+	argument set; the cached tensor is shared, so do not modify it in place."""
+	return _calibration_tensor(n, max_plies, seed)
+
+
+@functools.lru_cache(maxsize=4)
+def _calibration_tensor(n: int, max_plies: int, seed: int) -> torch.Tensor:
+	from xq import GameState
+	from xq.encoding import states_to_tensor
+
+	# every ply of a few games is a candidate, so move generation runs about once
+	# per position instead of once per ply of a separate playout for each
+	rng = random.Random(seed)
+	states = []
+	while len(states) < n:
+		s = GameState()
+		s.setup_starting_position()
+		for _ in range(max_plies + 1):
+			states.append(s.clone())
+			moves = s.generate_legal_moves()
+			if not moves:
+				break
+			s.apply_move(rng.choice(moves))
+	return states_to_tensor(rng.sample(states, n))
+
+
+def with_precision(
+	model: nn.Module,
+	precision: str = "fp32",
+	inputs: Optional[torch.Tensor] = None,
+	max_policy_kl: float = 0.01,
+	max_value_mae: float = 0.01,
+) -> Tuple[nn.Module, Dict[str, Any]]:
+	"""(model converted to precision, calibration report).
+
+	The report holds check_accuracy's metrics plus value_mae against the fp32 model
+	on inputs (default calibration_inputs() on the model's device). Raises
+	ValueError if policy_kl > max_policy_kl or value_mae > max_value_mae. fp32 is
+	returned unchanged with an empty report.
+	"""
+	candidate = convert(model, precision)
+	if precision == "fp32":
+		return candidate, {}
+	reference = model
+	if precision == "int8" and next(model.parameters()).device.type != "cpu":
+		reference = copy.deepcopy(model).cpu()
+	if inputs is None:
+		inputs = calibration_inputs()
+	inputs = inputs.to(next(reference.parameters()).device)
+	report: Dict[str, Any] = {"precision": precision, "positions": int(inputs.shape[0])}
+	report.update(check_accuracy(reference, candidate, inputs))
+	with torch.no_grad():
+		report["value_mae"] = float((reference(inputs)[1].float() - candidate(inputs)[1]).abs().mean())
+	if report["policy_kl"] > max_policy_kl or report["value_mae"] > max_value_mae:
+		raise ValueError(
+			f"{precision} inference deviates from fp32 beyond the thresholds "
+			f"(policy_kl {report['policy_kl']:.4g} > {max_policy_kl} or value_mae {report['value_mae']:.4g} > {max_value_mae})"
+		)
+	return candidate, report
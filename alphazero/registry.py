@@ -0,0 +1,220 @@
+"""Thread-safe cache of loaded inference models, keyed by checkpoint path.
+
+ModelRegistry.get(path) returns a ModelEntry holding the eval-mode model and
+metadata gathered once at load time (parameter counts, layers, load and warm-up
+timings), so request handlers never reload a model just to describe it. Up to
+`capacity` models stay resident (least recently used evicted). A checkpoint whose
+file changes on disk is reloaded on next use and swapped in atomically; requests
+already holding the previous entry keep using it until they finish. A path can be
+resident in several inference precisions (alphazero.precision) at once; each is
+its own entry, calibrated against fp32 when loaded.
+
+shared_registry() is the process-wide instance: every engine in a process (API
+handlers, arena players, self-play games) attaches to the same loaded weights
+through it instead of loading its own copy.
+"""
+from __future__ import annotations
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+import torch
+import torch.nn as nn
+
+from .export import load_inference_model, read_export_metadata
+from .precision import with_precision
+
+
+@dataclass
+class ModelEntry:
+	path: str
+	model: nn.Module
+	arch: str  # "legacy" or "generic"
+	version: int  # 1 on first load, +1 on every reload of the path
+	mtime: float
+	size: int
+	info: Dict[str, Any] = field(default_factory=dict)
+	precision: str = "fp32"
+
+
+def _input_shape(model: nn.Module, meta: Dict[str, Any]) -> Tuple[int, int, int]:
+	if meta.get("input_shape"):
+		return tuple(meta["input_shape"])  # type: ignore[return-value]
+	config = getattr(model, "config", None)
+	if config is not None:
+		return (config.input_channels, config.board_height, config.board_width)
+	return (15, 10, 9)
+
+
+def describe_model(model: nn.Module) -> Dict[str, Any]:
+	"""Parameter counts, per-parameter layer list, module structure and trunk shape
+	(read from parameter names, so exported artefacts are covered too)."""
+	params = list(model.named_parameters())
+	stem = next((p for name, p in params if name.endswith("stem.weight")), None)
+	blocks = {name.split("blocks.", 1)[1].split(".", 1)[0] for name, _ in params if "blocks." in name}
+	return {
+		"architecture": {
+			"in_channels": int(stem.shape[1]) if stem is not None else None,
+			"channels": int(stem.shape[0]) if stem is not None else None,
+			"num_blocks": len(blocks),
+		},
+		"parameters": {
+			"total": sum(p.numel() for _, p in params),
+			"trainable": sum(p.numel() for _, p in params if p.requires_grad),
+		},
+		"layers": [
+			{
+				"name": name,
+				"shape": list(p.shape),
+				"dtype": str(p.dtype),
+				"requires_grad": p.requires_grad,
+				"num_params": p.numel(),
+			}
+			for name, p in params
+		],
+		"structure": [{"name": name, "type": type(m).__name__} for name, m in model.named_modules() if name],
+	}
+
+
+class ModelRegistry:
+	"""LRU cache of inference models (see module docstring).
+
+	mmap: load state dicts memory-mapped and assign the mapped tensors as the
+	model's parameters, so weights are paged in on demand instead of read and copied.
+	warmup: run a dummy batch of warmup_batch after loading so the first real request
+	does not pay for lazy initialisation (a batch of one is always run, to read the
+	policy size).
+	max_policy_kl, max_value_mae: calibration thresholds for reduced precisions
+	(see alphazero.precision.with_precision).
+	"""
+
+	def __init__(
+		self,
+		capacity: int = 4,
+		mmap: bool = True,
+		warmup: bool = True,
+		warmup_batch: int = 8,
+		max_policy_kl: float = 0.01,
+		max_value_mae: float = 0.01,
+	) -> None:
+		self.capacity = max(1, capacity)
+		self.mmap = mmap
+		self.warmup = warmup
+		self.warmup_batch = warmup_batch
+		self.max_policy_kl = max_policy_kl
+		self.max_value_mae = max_value_mae
+		self._entries: "OrderedDict[Tuple[str, str], ModelEntry]" = OrderedDict()
+		self._versions: Dict[Tuple[str, str], int] = {}
+		self._lock = threading.Lock()
+		self._load_locks: Dict[Tuple[str, str], threading.Lock] = {}
+
+	def get(self, path: str, precision: str = "fp32") -> ModelEntry:
+		"""Entry for path in precision, loading it (or reloading it if the file
+		changed) as needed. Raises FileNotFoundError for a missing file, ValueError for
+		a precision that fails calibration and the loader's error otherwise."""
+		key = (os.path.abspath(path), precision)
+		st = os.stat(key[0])
+		with self._lock:
+			entry = self._entries.get(key)
+			if entry is not None and (entry.mtime, entry.size) == (st.st_mtime, st.st_size):
+				self._entries.move_to_end(key)
+				return entry
+			load_lock = self._load_locks.setdefault(key, threading.Lock())
+		with load_lock:
+			# another request may have finished the same load while we waited
+			with self._lock:
+				entry = self._entries.get(key)
+				if entry is not None and (entry.mtime, entry.size) == (st.st_mtime, st.st_size):
+					self._entries.move_to_end(key)
+					return entry
+			return self._load(key, path)
+
+	def reload(self, path: str, precision: str = "fp32") -> ModelEntry:
+		"""Load path again even if unchanged and swap the new version in."""
+		key = (os.path.abspath(path), precision)
+		with self._lock:
+			load_lock = self._load_locks.setdefault(key, threading.Lock())
+		with load_lock:
+			return self._load(key, path)
+
+	def peek(self, path: str, precision: str = "fp32") -> Optional[ModelEntry]:
+		"""Cached entry for path without loading or refreshing it."""
+		with self._lock:
+			return self._entries.get((os.path.abspath(path), precision))
+
+	def evict(self, path: str) -> bool:
+		"""Drop every precision of path; True if any was resident."""
+		path = os.path.abspath(path)
+		with self._lock:
+			keys = [key for key in self._entries if key[0] == path]
+			for key in keys:
+				del self._entries[key]
+			return bool(keys)
+
+	def clear(self) -> None:
+		with self._lock:
+			self._entries.clear()
+
+	def entries(self) -> List[ModelEntry]:
+		"""Resident entries, least recently used first."""
+		with self._lock:
+			return list(self._entries.values())
+
+	def _load(self, key: Tuple[str, str], path: str) -> ModelEntry:
+		file, precision = key
+		st = os.stat(file)
+		t0 = time.perf_counter()
+		model, arch = load_inference_model(file, mmap=self.mmap)
+		model, calibration = with_precision(model, precision, max_policy_kl=self.max_policy_kl, max_value_mae=self.max_value_mae)
+		load_ms = 1000.0 * (time.perf_counter() - t0)
+		meta = read_export_metadata(file)
+		t0 = time.perf_counter()
+		with torch.no_grad():
+			logits, _ = model(torch.zeros((self.warmup_batch if self.warmup else 1,) + _input_shape(model, meta)))
+		warmup_ms = 1000.0 * (time.perf_counter() - t0) if self.warmup else None
+		info = describe_model(model)
+		info["architecture"]["policy_output"] = int(logits.shape[-1])
+		info.update({
+			"arch": arch,
+			"exported": bool(meta),
+			"export": meta,
+			"file_size": st.st_size,
+			"load_ms": load_ms,
+			"warmup_ms": warmup_ms,
+			"precision": precision,
+			"calibration": calibration,
+		})
+		with self._lock:
+			version = self._versions.get(key, 0) + 1
+			self._versions[key] = version
+			entry = ModelEntry(
+				path=path, model=model, arch=arch, version=version, mtime=st.st_mtime, size=st.st_size, info=info, precision=precision
+			)
+			self._entries[key] = entry
+			self._entries.move_to_end(key)
+			while len(self._entries) > self.capacity:
+				self._entries.popitem(last=False)
+		return entry
+
+
+_shared: Optional[ModelRegistry] = None
+_shared_lock = threading.Lock()
+
+
+def shared_registry(capacity: int = 4) -> ModelRegistry:
+	"""The process-wide registry, created on first use (capacity only applies then)."""
+	global _shared
+	with _shared_lock:
+		if _shared is None:
+			_shared = ModelRegistry(capacity=capacity)
+		return _shared
+
+
+def cached_model(path: str, precision: str = "fp32") -> nn.Module:
+	"""Eval-mode model for path in precision from the process-wide registry (loaded
+	once per process, reloaded when the file changes)."""
+	return shared_registry().get(path, precision).model
@@ -1,14 +1,15 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from typing import List, Tuple, Any
+from typing import List, Tuple, Any, Optional
 
 import torch
 import torch.nn as nn
+import torch.nn.functional as F
 import torch.optim as optim
 from torch.utils.data import Dataset, DataLoader
 
-from .network import PolicyValueNet
+from .network import ConvPolicyHead, PolicyValueNet
 
 
 @dataclass
@@ -17,14 +18,27 @@ class TrainerConfig:
 	batch_size: int = 32
 	epochs: int = 10
 	weight_decay: float = 1e-4
+	# distillation (Trainer with a teacher): weight of the teacher's policy and value
+	# targets against the game's pi and z (1.0 = teacher only, pi/z unused), and the
+	# softmax temperature applied to both policies
+	distill_alpha: float = 1.0
+	distill_temperature: float = 1.0
 
 
 class AlphaZeroDataset(Dataset):
 	"""Generic dataset for (state_tensor, policy_target, value_target) tuples."""
 	
-	def __init__(self, samples: List[Tuple[Any, List[float], float]]):
-		"""samples: [(state_tensor_np, pi, z)]"""
+	def __init__(self, samples: List[Tuple[Any, Optional[List[float]], float]], action_size: Optional[int] = None):
+		"""samples: [(state_tensor_np, pi, z)]; pi=None marks a value-only sample
+		(e.g. a fast search under playout cap randomisation). action_size sizes the
+		zero targets of value-only samples; by default it is taken from the first pi,
+		so it is required when no sample has one."""
 		self.samples = samples
+		if action_size is None:
+			action_size = next((len(pi) for _, pi, _ in samples if pi is not None), None)
+			if action_size is None:
+				raise ValueError("action_size is required when no sample has a policy target")
+		self.action_size = action_size
 	
 	def __len__(self):
 		return len(self.samples)
@@ -32,28 +46,45 @@ class AlphaZeroDataset(Dataset):
 	def __getitem__(self, idx):
 		state_np, pi, z = self.samples[idx]
 		state_t = torch.from_numpy(state_np).float()
-		pi_t = torch.tensor(pi, dtype=torch.float32)
+		if pi is None:
+			pi_t = torch.zeros(self.action_size, dtype=torch.float32)
+		else:
+			pi_t = torch.tensor(pi, dtype=torch.float32)
 		z_t = torch.tensor(z, dtype=torch.float32)
-		return state_t, pi_t, z_t
+		has_pi_t = torch.tensor(0.0 if pi is None else 1.0, dtype=torch.float32)
+		return state_t, pi_t, z_t, has_pi_t
 
 
 class Trainer:
-	"""Generic trainer for PolicyValueNet."""
+	"""Generic trainer for PolicyValueNet.
 	
-	def __init__(self, model: PolicyValueNet, config: TrainerConfig, device: str = "cpu"):
+	With a teacher (any network with the same input planes and action space, e.g. a
+	larger PolicyValueNet, a legacy XQNet or an exported artefact) the trainer
+	distils: the model learns the teacher's policy and value on the stored
+	positions, blended with the game targets by config.distill_alpha. Every sample
+	gets a policy target from the teacher, including value-only ones.
+	"""
+	
+	def __init__(
+		self, model: PolicyValueNet, config: TrainerConfig, device: str = "cpu", teacher: Optional[nn.Module] = None,
+		action_size: Optional[int] = None,
+	):
+		"""action_size: the model's policy size; read from model.config when omitted."""
 		self.model = model.to(device)
 		self.config = config
+		self.action_size = action_size if action_size is not None else model.config.action_size
 		self.device = device
+		self.teacher = teacher.to(device).eval() if teacher is not None else None
 		self.optimizer = optim.Adam(model.parameters(), lr=config.lr, weight_decay=config.weight_decay)
-		self.criterion_policy = nn.CrossEntropyLoss()
+		self.criterion_policy = nn.CrossEntropyLoss(reduction="none")
 		self.criterion_value = nn.MSELoss()
 	
-	def train_step(self, samples: List[Tuple[Any, List[float], float]]) -> float:
+	def train_step(self, samples: List[Tuple[Any, Optional[List[float]], float]]) -> float:
 		"""Train on a batch of samples. Returns average loss."""
 		if not samples:
 			return 0.0
 		
-		dataset = AlphaZeroDataset(samples)
+		dataset = AlphaZeroDataset(samples, self.action_size)
 		loader = DataLoader(dataset, batch_size=self.config.batch_size, shuffle=True)
 		
 		self.model.train()
@@ -61,16 +92,19 @@ class Trainer:
 		num_batches = 0
 		
 		for epoch in range(self.config.epochs):
-			for state_batch, pi_batch, z_batch in loader:
+			for state_batch, pi_batch, z_batch, has_pi_batch in loader:
 				state_batch = state_batch.to(self.device)
 				pi_batch = pi_batch.to(self.device)
 				z_batch = z_batch.to(self.device)
+				has_pi_batch = has_pi_batch.to(self.device)
 				
 				self.optimizer.zero_grad()
 				logits, v = self.model(state_batch)
 				
-				loss_p = self.criterion_policy(logits, pi_batch)
-				loss_v = self.criterion_value(v, z_batch)
+				if self.teacher is None:
+					loss_p, loss_v = self._game_loss(logits, v, pi_batch, z_batch, has_pi_batch)
+				else:
+					loss_p, loss_v = self._distill_loss(state_batch, logits, v, pi_batch, z_batch, has_pi_batch)
 				loss = loss_p + loss_v
 				
 				loss.backward()
@@ -81,6 +115,31 @@ class Trainer:
 		
 		return total_loss / max(1, num_batches)
 	
+	def _game_loss(self, logits, v, pi_batch, z_batch, has_pi_batch) -> Tuple[torch.Tensor, torch.Tensor]:
+		# Policy loss only over samples that carry a pi target
+		loss_p = (self.criterion_policy(logits, pi_batch) * has_pi_batch).sum() / has_pi_batch.sum().clamp(min=1.0)
+		return loss_p, self.criterion_value(v, z_batch)
+	
+	def _distill_loss(self, state_batch, logits, v, pi_batch, z_batch, has_pi_batch) -> Tuple[torch.Tensor, torch.Tensor]:
+		with torch.no_grad():
+			t_logits, t_v = self.teacher(state_batch)
+		if t_logits.shape[-1] != logits.shape[-1]:
+			raise ValueError(f"teacher predicts {t_logits.shape[-1]} actions, student {logits.shape[-1]}")
+		t = self.config.distill_temperature
+		soft = torch.softmax(t_logits.float() / t, dim=-1)
+		# no target mass on actions the student cannot predict (a conv head's unreachable pairs)
+		soft = soft * (logits.detach() > ConvPolicyHead.UNREACHABLE_LOGIT)
+		soft = soft / soft.sum(dim=-1, keepdim=True).clamp_min(1e-12)
+		# soft-target cross-entropy, scaled by t^2 to keep gradients comparable across temperatures
+		loss_p = -(soft * F.log_softmax(logits / t, dim=-1)).sum(dim=-1).mean() * t * t
+		loss_v = self.criterion_value(v, t_v.float())
+		alpha = self.config.distill_alpha
+		if alpha < 1.0:
+			game_p, game_v = self._game_loss(logits, v, pi_batch, z_batch, has_pi_batch)
+			loss_p = alpha * loss_p + (1.0 - alpha) * game_p
+			loss_v = alpha * loss_v + (1.0 - alpha) * game_v
+		return loss_p, loss_v
+	
 	def save(self, path: str) -> None:
 		torch.save(self.model.state_dict(), path)
 	
@@ -3,8 +3,15 @@ from pydantic import BaseModel
 from typing import Optional, List, Dict
 import uuid
 import math
-
-from xq import GameState, constants as C, Move, legal_move_mask, alphabeta_search, MCTS
+import os
+import time
+
+from xq import GameState, constants as C, Move, legal_move_mask, alphabeta_search, MCTS, GumbelMCTS
+from xq.mcts import Node
+from xq.policy import move_index
+from xq.budget import BudgetConfig, SimAllocator, run_adaptive
+from xq.parallel import RootParallelMCTS
+from xq.stats import SearchStats, record_phase
 import threading
 
 app = FastAPI(title="Xiangqi API", version="0.2.0")
@@ -33,46 +40,35 @@ except Exception:
     pass
 
 games: Dict[str, GameState] = {}
-_loaded_model = None
-_model_path_cache = "models/latest.pt"
-_model_type_cache = "legacy"  # "legacy" or "generic"
+DEFAULT_MODEL_PATH = "models/latest.pt"
+MODEL_CACHE_SIZE = 4  # models kept loaded by the registry (LRU)
+INFERENCE_PRECISION = "fp32"  # or "bf16" / "fp16" / "int8", checked against fp32 on load (alphazero.precision)
+_last_model = {"path": DEFAULT_MODEL_PATH, "framework": None}  # for /api/model/framework
 
 
-def _load_model(model_path: str):
-    """
-    Load either legacy XQNet or generic PolicyValueNet based on state_dict keys.
-    Returns (model, model_type) where model_type is "legacy" or "generic".
-    """
-    import torch
-    import os
-    
-    if not os.path.exists(model_path):
-        return None, None
-    
+def _get_registry():
+    # process-wide, so self-play started from the API shares the loaded models
+    from alphazero.registry import shared_registry
+    return shared_registry(capacity=MODEL_CACHE_SIZE)
+
+
+def _get_model(model_path: Optional[str]):
+    """Registry entry for model_path (default DEFAULT_MODEL_PATH), or None if the
+    file is missing or cannot be loaded. Concurrent requests for different models
+    share the registry instead of evicting each other's model."""
+    model_path = model_path or DEFAULT_MODEL_PATH
+    _last_model["path"] = model_path
     try:
-        # Load state dict to inspect keys
-        state_dict = torch.load(model_path, map_location='cpu')
-        
-        # Check if it's generic (has batch norm keys) or legacy
-        has_bn = any('bn' in key for key in state_dict.keys())
-        
-        if has_bn:
-            # Generic model
-            from alphazero.network import create_xiangqi_net
-            model = create_xiangqi_net()
-            model.load_state_dict(state_dict)
-            model.eval()
-            return model, "generic"
-        else:
-            # Legacy model
-            from xq.nn import XQNet
-            model = XQNet()
-            model.load_state_dict(state_dict)
-            model.eval()
-            return model, "legacy"
+        entry = _get_registry().get(model_path, INFERENCE_PRECISION)
+    except FileNotFoundError:
+        _last_model["framework"] = None
+        return None
     except Exception as e:
         print(f"Error loading model: {e}")
-        return None, None
+        _last_model["framework"] = None
+        return None
+    _last_model["framework"] = entry.arch
+    return entry
 
 
 def _sq_to_coord(sq: int, one_based: bool = False) -> str:
@@ -211,10 +207,22 @@ def make_move(game_id: str, body: MoveBody):
                 break
     if mv_obj is None:
         raise HTTPException(status_code=400, detail="illegal or missing move")
+    _cancel_ponder(game_id)
     s.apply_move(mv_obj)
+    if s.adjudicate_result() is not None:
+        _allocators.pop(game_id, None)
     return _serialize_state(game_id, s)
 
 
+@app.delete("/api/games/{game_id}")
+def delete_game(game_id: str):
+    if games.pop(game_id, None) is None:
+        raise HTTPException(status_code=404, detail="game not found")
+    _cancel_ponder(game_id)
+    _allocators.pop(game_id, None)
+    return {"deleted": game_id}
+
+
 @app.get("/api/convert/moveid-to-coord")
 def convert_moveid_to_coord(move_id: int):
     # Decode using bit layout knowledge from xq.move.Move
@@ -252,12 +260,20 @@ class HumanAiBody(BaseModel):
     from_coord: Optional[str] = None
     to_coord: Optional[str] = None
     # engine options
-    engine: str = "ab"  # ab | mcts | mcts_nn
+    engine: str = "ab"  # ab | mcts | mcts_nn | gumbel | gumbel_nn
     depth: int = 3
     sims: int = 100
     tau: float = 1.0
     model_path: Optional[str] = None
     time_ms: Optional[int] = None
+    smart_stop: bool = False  # stop MCTS once the best move can no longer change
+    adaptive_sims: bool = False  # scale sims with position complexity (averaging `sims`)
+    workers: int = 1  # mcts / mcts_nn: >1 splits `sims` over root-parallel worker processes
+    stats: bool = False  # include search instrumentation in the response
+    # pondering (mcts / mcts_nn): keep searching while the human thinks
+    ponder: bool = False
+    ponder_sims: int = 2000
+    ponder_ms: Optional[int] = None
 
 
 @app.post("/api/games/{game_id}/human-ai")
@@ -290,77 +306,244 @@ def human_ai(game_id: str, body: HumanAiBody):
                 break
     if mv_obj is None:
         raise HTTPException(status_code=400, detail="illegal or missing human move")
+    ponder_root = _take_ponder(game_id, s, (body.engine, body.model_path))
     s.apply_move(mv_obj)
     human_move = {"from": mv_obj.from_sq, "to": mv_obj.to_sq, "from_coord": _sq_to_coord(mv_obj.from_sq), "to_coord": _sq_to_coord(mv_obj.to_sq), "move_id": int(mv_obj)}
 
     # Compute AI move
     ai_move_obj: Optional[Move] = None
     ai_score = None
+    search_info = None
     if body.engine == "ab":
         ai_move_obj, ai_score = alphabeta_search(s, body.depth)
-    elif body.engine == "mcts" or body.engine == "mcts_nn":
-        def policy_fn(state: GameState):
-            mask = legal_move_mask(state)
-            legal_count = sum(1 for x in mask if x > 0)
-            p = [0.0] * (C.NUM_SQUARES * C.NUM_SQUARES)
-            if legal_count > 0:
-                w = 1.0 / legal_count
-                for i, v in enumerate(mask):
-                    if v > 0:
-                        p[i] = w
-            score = _simple_material_eval(state)
-            pov = score if state.side_to_move == C.RED else -score
-            val = math.tanh(pov / 2000.0)
-            return p, float(val)
-        # Optionally use NN when engine=mcts_nn
-        if body.engine == "mcts_nn":
-            global _loaded_model, _model_path_cache, _model_type_cache
-            model_path = body.model_path or _model_path_cache
-            if _loaded_model is None or model_path != _model_path_cache:
-                _loaded_model, _model_type_cache = _load_model(model_path)
-                _model_path_cache = model_path
-            
-            if _loaded_model is not None:
-                from xq.nn import state_to_tensor  # type: ignore
-                import torch  # type: ignore
-                def policy_fn(state: GameState):  # type: ignore
-                    with torch.no_grad():
-                        x = state_to_tensor(state).unsqueeze(0)
-                        logits, v = _loaded_model(x)
-                        policy = torch.softmax(logits[0], dim=-1).tolist()
-                        return policy, float(v.item())
-        mcts = MCTS()
-        root = mcts.run(s, policy_fn, num_simulations=body.sims, time_limit_s=(body.time_ms/1000.0 if body.time_ms else None))
-        probs = mcts.action_probs(root, tau=body.tau)
-        if probs:
-            best_idx = max(probs.items(), key=lambda kv: kv[1])[0]
+    elif body.engine in ("mcts", "mcts_nn", "gumbel", "gumbel_nn"):
+        policy_fn = _human_ai_policy_fn(body.engine, body.model_path)
+        mcts = _make_mcts(body.engine, smart_stop=body.smart_stop, stats=body.stats)
+        # Reuse the pondered subtree for the move the human actually played
+        reused: Optional[Node] = None
+        if ponder_root is not None:
+            reused = ponder_root.children.get(move_index(mv_obj.from_sq, mv_obj.to_sq))
+            if reused is not None and not reused.actions:
+                reused = None
+        reused_visits = reused.visits if reused is not None else 0
+        root = _run_mcts(game_id, mcts, s, policy_fn, max(0, body.sims - reused_visits), body.time_ms, body.adaptive_sims, root=reused,
+                         workers=body.workers, policy_args=(body.engine, body.model_path))
+        search_info = _search_info(mcts)
+        search_info["reused_visits"] = reused_visits
+        best_idx = mcts.best_action(root)
+        if best_idx is not None:
             from_sq = best_idx // C.NUM_SQUARES
             to_sq = best_idx % C.NUM_SQUARES
             for cand in s.generate_legal_moves():
                 if cand.from_sq == from_sq and cand.to_sq == to_sq:
                     ai_move_obj = cand
                     break
+        if ai_move_obj is not None and body.ponder and body.engine in ("mcts", "mcts_nn"):
+            ponder_tree = root.children.get(move_index(ai_move_obj.from_sq, ai_move_obj.to_sq))
+            s.apply_move(ai_move_obj)
+            if s.adjudicate_result() is None:
+                _start_ponder(game_id, s, (body.engine, body.model_path), policy_fn, ponder_tree, body.ponder_sims, body.ponder_ms)
+            s.undo_move()
     else:
-        raise HTTPException(status_code=400, detail="unknown engine; use 'ab' or 'mcts' or 'mcts_nn'")
+        raise HTTPException(status_code=400, detail="unknown engine; use 'ab', 'mcts', 'mcts_nn', 'gumbel' or 'gumbel_nn'")
 
     if ai_move_obj is not None:
         s.apply_move(ai_move_obj)
+    if s.adjudicate_result() is not None:
+        _allocators.pop(game_id, None)
     ai_move = None if ai_move_obj is None else {"from": ai_move_obj.from_sq, "to": ai_move_obj.to_sq, "from_coord": _sq_to_coord(ai_move_obj.from_sq), "to_coord": _sq_to_coord(ai_move_obj.to_sq), "move_id": int(ai_move_obj), "score": ai_score}
     state = _serialize_state(game_id, s)
-    return {"human": human_move, "ai": ai_move, "state": state}
+    return {"human": human_move, "ai": ai_move, "state": state, "search": search_info}
+
+
+def _human_ai_policy_fn(engine: str, model_path: Optional[str]):
+    """Policy function for the human-ai MCTS engines. The NN variant captures the
+    model loaded now, so a background ponder keeps using it if the registry swaps it."""
+    def policy_fn(state: GameState):
+        mask = legal_move_mask(state)
+        legal_count = sum(1 for x in mask if x > 0)
+        p = [0.0] * (C.NUM_SQUARES * C.NUM_SQUARES)
+        if legal_count > 0:
+            w = 1.0 / legal_count
+            for i, v in enumerate(mask):
+                if v > 0:
+                    p[i] = w
+        score = _simple_material_eval(state)
+        pov = score if state.side_to_move == C.RED else -score
+        val = math.tanh(pov / 2000.0)
+        return p, float(val)
+    # Optionally use NN when engine=mcts_nn / gumbel_nn
+    if engine in ("mcts_nn", "gumbel_nn"):
+        entry = _get_model(model_path)
+        if entry is not None:
+            model = entry.model
+            from xq.nn import state_to_tensor  # type: ignore
+            import torch  # type: ignore
+            def policy_fn(state: GameState):  # type: ignore
+                with torch.no_grad():
+                    with record_phase("encode"):
+                        x = state_to_tensor(state).unsqueeze(0)
+                    logits, v = model(x)
+                    policy = torch.softmax(logits[0], dim=-1).tolist()
+                    return policy, float(v.item())
+    return policy_fn
+
+
+# Background pondering: after the AI moves, keep searching the position the human
+# has to answer; the subtree for the human's actual reply seeds the next AI search.
+PONDER_IDLE_S = 300.0  # ponders of games without a request for this long are cancelled and dropped
+PONDER_SWEEP_S = 30.0  # how often the background sweeper looks for idle ponders
+
+
+class _Ponder:
+    def __init__(self, zkey: int, ply: int, key: tuple) -> None:
+        self.zkey = zkey
+        self.ply = ply
+        self.key = key  # (engine, model_path) the tree was searched with
+        self.root: Optional[Node] = None
+        self.cancel = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+        self.last_active = time.monotonic()  # last request for this game
+
+    def stop(self) -> None:
+        self.cancel.set()
+        if self.thread is not None:
+            self.thread.join()
+
+
+_ponders: Dict[str, _Ponder] = {}
+_ponder_lock = threading.Lock()
+
+
+def _start_ponder(game_id: str, s: GameState, key: tuple, policy_fn, root: Optional[Node], sims: int, time_ms: Optional[int]) -> None:
+    _sweep_idle_ponders()
+    p = _Ponder(s.zkey, len(s.history), key)
+    p.root = root
+    state = s.clone()
+
+    def work():
+        p.root = MCTS().run(
+            state,
+            policy_fn,
+            num_simulations=sims,
+            time_limit_s=(time_ms/1000.0 if time_ms else None),
+            add_noise=False,
+            root=root,
+            should_stop=p.cancel.is_set,
+        )
+
+    p.thread = threading.Thread(target=work, daemon=True)
+    with _ponder_lock:
+        old = _ponders.pop(game_id, None)
+        _ponders[game_id] = p
+    if old is not None:
+        old.stop()
+    p.thread.start()
+
+
+def _cancel_ponder(game_id: str) -> Optional[_Ponder]:
+    with _ponder_lock:
+        p = _ponders.pop(game_id, None)
+    if p is not None:
+        p.stop()
+    return p
+
+
+def _take_ponder(game_id: str, s: GameState, key: tuple) -> Optional[Node]:
+    """Stop the game's ponder search; return its tree if it matches s and the engine."""
+    p = _cancel_ponder(game_id)
+    if p is None or p.key != key or p.zkey != s.zkey or p.ply != len(s.history):
+        return None
+    return p.root
+
+
+def _sweep_idle_ponders() -> None:
+    """Cancel, join and drop the ponders of games idle for more than PONDER_IDLE_S."""
+    now = time.monotonic()
+    with _ponder_lock:
+        stale = [gid for gid, p in _ponders.items() if now - p.last_active > PONDER_IDLE_S]
+        dropped = [_ponders.pop(gid) for gid in stale]
+    for p in dropped:
+        p.stop()
+
+
+@app.middleware("http")
+async def _note_game_activity(request, call_next):
+    """Any request under /api/games/{game_id} keeps that game's ponder alive."""
+    parts = request.url.path.split("/")
+    if len(parts) > 3 and parts[1:3] == ["api", "games"]:
+        with _ponder_lock:
+            p = _ponders.get(parts[3])
+            if p is not None:
+                p.last_active = time.monotonic()
+    return await call_next(request)
+
+
+_ponder_sweeper_stop = threading.Event()
+
+
+@app.on_event("startup")
+def _start_ponder_sweeper():
+    def sweep():
+        while not _ponder_sweeper_stop.wait(PONDER_SWEEP_S):
+            _sweep_idle_ponders()
+    _ponder_sweeper_stop.clear()
+    threading.Thread(target=sweep, daemon=True).start()
+
+
+@app.on_event("shutdown")
+def _stop_ponders():
+    _ponder_sweeper_stop.set()
+    with _ponder_lock:
+        dropped = list(_ponders.values())
+        _ponders.clear()
+    for p in dropped:
+        p.stop()
 
 
 @app.get("/api/model/framework")
 def get_model_framework():
     """Return information about the currently loaded model framework."""
-    global _loaded_model, _model_path_cache, _model_type_cache
     return {
-        "loaded": _loaded_model is not None,
-        "path": _model_path_cache,
-        "framework": _model_type_cache if _loaded_model is not None else None
+        "loaded": _last_model["framework"] is not None,
+        "path": _last_model["path"],
+        "framework": _last_model["framework"]
+    }
+
+
+@app.get("/api/model/registry")
+def model_registry():
+    """Models resident in the registry, least recently used first."""
+    return {
+        "capacity": _get_registry().capacity,
+        "models": [
+            {
+                "path": e.path,
+                "framework": e.arch,
+                "version": e.version,
+                "precision": e.precision,
+                "modified": e.mtime,
+                "load_ms": e.info["load_ms"],
+                "warmup_ms": e.info["warmup_ms"],
+            }
+            for e in _get_registry().entries()
+        ],
     }
 
 
+@app.post("/api/model/reload")
+def reload_model(model_path: str = DEFAULT_MODEL_PATH):
+    """Load model_path again and swap it in; in-flight searches finish on the old weights."""
+    import os
+    if not os.path.exists(model_path):
+        raise HTTPException(status_code=404, detail="Model file not found")
+    try:
+        entry = _get_registry().reload(model_path, INFERENCE_PRECISION)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return {"path": entry.path, "framework": entry.arch, "version": entry.version, "precision": entry.precision, "load_ms": entry.info["load_ms"]}
+
+
 @app.get("/api/health")
 def health():
     return {"status": "ok"}
@@ -373,41 +556,17 @@ def model_info(model_path: str = "models/latest.pt", offset: int = 0, limit: int
         raise HTTPException(status_code=404, detail="Model file not found")
     
     try:
-        import torch
-        from xq.nn import XQNet
-        
-        # Load model
-        model = XQNet()
-        state_dict = torch.load(model_path, map_location="cpu")
-        model.load_state_dict(state_dict)
-        
-        # Get model structure
-        structure = []
-        for name, module in model.named_modules():
-            if name:  # skip root
-                structure.append({
-                    "name": name,
-                    "type": type(module).__name__
-                })
-        
-        # Count parameters
-        total_params = sum(p.numel() for p in model.parameters())
-        trainable_params = sum(p.numel() for p in model.parameters() if p.requires_grad)
-        
-        # Get layer details
-        layers = []
-        for name, param in model.named_parameters():
-            layers.append({
-                "name": name,
-                "shape": list(param.shape),
-                "dtype": str(param.dtype),
-                "requires_grad": param.requires_grad,
-                "num_params": param.numel()
-            })
+        # Loaded once and described at load time by the registry
+        entry = _get_registry().get(model_path, INFERENCE_PRECISION)
+        info = entry.info
+        arch = info["architecture"]
+        structure = info["structure"]
+        total_params = info["parameters"]["total"]
+        trainable_params = info["parameters"]["trainable"]
+        layers = info["layers"]
         
         # File info
-        file_size = os.path.getsize(model_path)
-        file_size_mb = file_size / (1024 * 1024)
+        file_size_mb = info["file_size"] / (1024 * 1024)
         
         # Build topology graph
         topology = {
@@ -416,26 +575,26 @@ def model_info(model_path: str = "models/latest.pt", offset: int = 0, limit: int
         }
         
         # Add input node
-        topology["nodes"].append({"id": "input", "label": "Input\n[15,10,9]", "type": "input"})
+        topology["nodes"].append({"id": "input", "label": f"Input\n[{arch['in_channels']},10,9]", "type": "input"})
         
         # Add stem
-        topology["nodes"].append({"id": "stem", "label": "Stem Conv\n64 channels", "type": "conv"})
+        topology["nodes"].append({"id": "stem", "label": f"Stem Conv\n{arch['channels']} channels", "type": "conv"})
         topology["edges"].append({"from": "input", "to": "stem"})
         
         # Add residual blocks
         prev = "stem"
-        for i in range(3):
+        for i in range(arch["num_blocks"]):
             block_id = f"block{i}"
-            topology["nodes"].append({"id": block_id, "label": f"ResBlock {i+1}\n64 channels", "type": "residual"})
+            topology["nodes"].append({"id": block_id, "label": f"ResBlock {i+1}\n{arch['channels']} channels", "type": "residual"})
             topology["edges"].append({"from": prev, "to": block_id})
             prev = block_id
         
         # Policy head
         topology["nodes"].append({"id": "p_conv", "label": "Policy Conv\n32 channels", "type": "conv"})
         topology["edges"].append({"from": prev, "to": "p_conv"})
-        topology["nodes"].append({"id": "p_fc", "label": "Policy FC\n8100", "type": "dense"})
+        topology["nodes"].append({"id": "p_fc", "label": f"Policy FC\n{arch['policy_output']}", "type": "dense"})
         topology["edges"].append({"from": "p_conv", "to": "p_fc"})
-        topology["nodes"].append({"id": "policy_out", "label": "Policy Output\n[8100]", "type": "output"})
+        topology["nodes"].append({"id": "policy_out", "label": f"Policy Output\n[{arch['policy_output']}]", "type": "output"})
         topology["edges"].append({"from": "p_fc", "to": "policy_out"})
         
         # Value head
@@ -452,11 +611,13 @@ def model_info(model_path: str = "models/latest.pt", offset: int = 0, limit: int
             "model_path": model_path,
             "file_size_mb": round(file_size_mb, 2),
             "architecture": {
-                "in_channels": 15,
-                "channels": 64,
-                "num_blocks": 3,
-                "policy_output": 8100,
-                "value_output": 1
+                "in_channels": arch["in_channels"],
+                "channels": arch["channels"],
+                "num_blocks": arch["num_blocks"],
+                "policy_output": arch["policy_output"],
+                "value_output": 1,
+                "framework": entry.arch,
+                "version": entry.version
             },
             "parameters": {
                 "total": total_params,
@@ -511,6 +672,8 @@ class TrainLoopBody(BaseModel):
     model_path: str = "models/latest.pt"
     data_dir: str = "data"
     use_nn: bool = False
+    full_search_prob: float = 1.0
+    fast_sims: int = 32
 
 
 @app.post("/api/train/start")
@@ -532,6 +695,8 @@ def start_training(body: TrainLoopBody):
         model_path=body.model_path,
         data_dir=body.data_dir,
         use_nn=body.use_nn,
+        full_search_prob=body.full_search_prob,
+        fast_sims=body.fast_sims,
     )
     
     def callback(msg: str):
@@ -571,12 +736,14 @@ def undo(game_id: str):
         raise HTTPException(status_code=404, detail="game not found")
     if not s.undo_stack:
         raise HTTPException(status_code=400, detail="no move to undo")
+    _cancel_ponder(game_id)
+    _allocators.pop(game_id, None)  # its running mean and last value describe the undone line
     s.undo_move()
     return _serialize_state(game_id, s)
 
 
 @app.get("/api/games/{game_id}/best-move")
-def best_move(game_id: str, engine: str = "ab", depth: int = 3, sims: int = 100, tau: float = 1.0, model_path: Optional[str] = None, time_ms: Optional[int] = None):
+def best_move(game_id: str, engine: str = "ab", depth: int = 3, sims: int = 100, tau: float = 1.0, model_path: Optional[str] = None, time_ms: Optional[int] = None, smart_stop: bool = False, adaptive_sims: bool = False, workers: int = 1, stats: bool = False):
     s = games.get(game_id)
     if not s:
         raise HTTPException(status_code=404, detail="game not found")
@@ -585,7 +752,7 @@ def best_move(game_id: str, engine: str = "ab", depth: int = 3, sims: int = 100,
         if mv is None:
             return {"best": None, "score": score}
         return {"best": {"from": mv.from_sq, "to": mv.to_sq, "move_id": int(mv)}, "score": score}
-    elif engine == "mcts":
+    elif engine in ("mcts", "gumbel"):
         # minimal policy fn: uniform over legal + simple value
         def policy_fn(state: GameState):
             mask = legal_move_mask(state)
@@ -602,13 +769,13 @@ def best_move(game_id: str, engine: str = "ab", depth: int = 3, sims: int = 100,
             val = math.tanh(pov / 2000.0)
             return p, float(val)
 
-        mcts = MCTS()
-        root = mcts.run(s, policy_fn, num_simulations=sims, time_limit_s=(time_ms/1000.0 if time_ms else None))
+        mcts = _make_mcts(engine, smart_stop=smart_stop, stats=stats)
+        root = _run_mcts(game_id, mcts, s, policy_fn, sims, time_ms, adaptive_sims, workers=workers, policy_args=(engine, None))
         probs = mcts.action_probs(root, tau=tau)
         # choose action by max prob
         if not probs:
             return {"best": None, "score": None, "pi": {}}
-        best_idx = max(probs.items(), key=lambda kv: kv[1])[0]
+        best_idx = mcts.best_action(root)
         from_sq = best_idx // C.NUM_SQUARES
         to_sq = best_idx % C.NUM_SQUARES
         mv = None
@@ -619,18 +786,16 @@ def best_move(game_id: str, engine: str = "ab", depth: int = 3, sims: int = 100,
         return {
             "best": (None if mv is None else {"from": mv.from_sq, "to": mv.to_sq, "move_id": int(mv)}),
             "pi": {str(k): v for k, v in probs.items()},
+            "search": _search_info(mcts),
         }
-    elif engine == "mcts_nn":
-        # Load model lazily
-        global _loaded_model, _model_path_cache, _model_type_cache
-        if model_path is None:
-            model_path = _model_path_cache
-        if _loaded_model is None or model_path != _model_path_cache:
-            _loaded_model, _model_type_cache = _load_model(model_path)
-            _model_path_cache = model_path
+    elif engine in ("mcts_nn", "gumbel_nn"):
+        # Load model lazily (cached by the registry)
+        model_path = model_path or DEFAULT_MODEL_PATH
+        entry = _get_model(model_path)
+        model = entry.model if entry is not None else None
 
         def policy_fn(state: GameState):
-            if _loaded_model is None:
+            if model is None:
                 # fallback to uniform + simple value
                 mask = legal_move_mask(state)
                 legal_count = sum(1 for x in mask if x > 0)
@@ -647,17 +812,18 @@ def best_move(game_id: str, engine: str = "ab", depth: int = 3, sims: int = 100,
             from xq.nn import state_to_tensor
             import torch
             with torch.no_grad():
-                x = state_to_tensor(state).unsqueeze(0)
-                logits, v = _loaded_model(x)
+                with record_phase("encode"):
+                    x = state_to_tensor(state).unsqueeze(0)
+                logits, v = model(x)
                 policy = torch.softmax(logits[0], dim=-1).tolist()
                 return policy, float(v.item())
 
-        mcts = MCTS()
-        root = mcts.run(s, policy_fn, num_simulations=sims, time_limit_s=(time_ms/1000.0 if time_ms else None))
+        mcts = _make_mcts(engine, smart_stop=smart_stop, stats=stats)
+        root = _run_mcts(game_id, mcts, s, policy_fn, sims, time_ms, adaptive_sims, workers=workers, policy_args=(engine, model_path))
         probs = mcts.action_probs(root, tau=tau)
         if not probs:
             return {"best": None, "score": None, "pi": {}}
-        best_idx = max(probs.items(), key=lambda kv: kv[1])[0]
+        best_idx = mcts.best_action(root)
         from_sq = best_idx // C.NUM_SQUARES
         to_sq = best_idx % C.NUM_SQUARES
         mv = None
@@ -668,9 +834,96 @@ def best_move(game_id: str, engine: str = "ab", depth: int = 3, sims: int = 100,
         return {
             "best": (None if mv is None else {"from": mv.from_sq, "to": mv.to_sq, "move_id": int(mv)}),
             "pi": {str(k): v for k, v in probs.items()},
+            "search": _search_info(mcts),
         }
     else:
-        raise HTTPException(status_code=400, detail="unknown engine; use 'ab' or 'mcts'")
+        raise HTTPException(status_code=400, detail="unknown engine; use 'ab', 'mcts', 'mcts_nn', 'gumbel' or 'gumbel_nn'")
+
+
+def _make_mcts(engine: str, smart_stop: bool = False, stats: bool = False) -> MCTS:
+    collector = SearchStats() if stats else None
+    if engine.startswith("gumbel"):
+        return GumbelMCTS(stats=collector)
+    return MCTS(smart_stop=smart_stop, stats=collector)
+
+
+# Per-game simulation allocators (adaptive_sims), so budgets average out over a game.
+# Dropped when the game ends, is deleted or has a move undone.
+_allocators: Dict[str, SimAllocator] = {}
+
+
+# Root-parallel search pool, started with the server (when ROOT_PARALLEL_WORKERS > 1)
+# and kept, with the models its workers have loaded, for its lifetime.
+ROOT_PARALLEL_WORKERS = max(1, os.cpu_count() or 1)
+_root_pool: Optional[RootParallelMCTS] = None
+_root_pool_lock = threading.Lock()
+
+
+def _get_root_pool() -> RootParallelMCTS:
+    global _root_pool
+    with _root_pool_lock:
+        if _root_pool is None:
+            _root_pool = RootParallelMCTS(ROOT_PARALLEL_WORKERS, _human_ai_policy_fn)
+        return _root_pool
+
+
+@app.on_event("startup")
+def _start_root_pool():
+    # Spawned in the background so startup is not delayed; a request that arrives
+    # first waits on _root_pool_lock instead of paying for the spawn itself.
+    if ROOT_PARALLEL_WORKERS > 1:
+        threading.Thread(target=_get_root_pool, daemon=True).start()
+
+
+@app.on_event("shutdown")
+def _close_root_pool():
+    if _root_pool is not None:
+        _root_pool.close()
+
+
+def _run_mcts(game_id: str, mcts: MCTS, s: GameState, policy_fn, sims: int, time_ms: Optional[int], adaptive: bool, root: Optional[Node] = None,
+              workers: int = 1, policy_args: Optional[tuple] = None) -> Node:
+    """Run the request's search. workers > 1 (plain MCTS only, no reused tree) merges
+    independent searches from the root-parallel pool; policy_args are passed to
+    _human_ai_policy_fn inside the workers. With adaptive, the allocator sizes the
+    budget on a local root expansion before it is split across the pool."""
+    time_limit_s = time_ms / 1000.0 if time_ms else None
+    search = None
+    if workers > 1 and root is None and policy_args is not None and type(mcts) is MCTS:
+        engine, model_path = policy_args
+        if engine == "mcts_nn":
+            model_path = model_path or DEFAULT_MODEL_PATH
+
+        def search(n: int) -> Node:
+            pool = _get_root_pool()
+            merged = pool.run(s, num_simulations=n, time_limit_s=time_limit_s, policy_args=(engine, model_path), workers=workers,
+                              smart_stop=mcts.smart_stop, stats=SearchStats() if mcts.stats is not None else None)
+            mcts.last_info = pool.last_info
+            if mcts.stats is not None and pool.last_info.stats is not None:
+                mcts.stats.merge(pool.last_info.stats)
+            return merged
+    if adaptive and root is None:
+        allocator = _allocators.get(game_id)
+        if allocator is None:
+            allocator = _allocators[game_id] = SimAllocator()
+        allocator.config = BudgetConfig(mean_sims=sims, min_sims=max(1, sims // 8), max_sims=sims * 4)
+        return run_adaptive(mcts, s, policy_fn, allocator, time_limit_s=time_limit_s, search=search)
+    if search is not None:
+        return search(sims)
+    return mcts.run(s, policy_fn, num_simulations=sims, time_limit_s=time_limit_s, root=root)
+
+
+def _search_info(mcts: MCTS) -> dict:
+    info = mcts.last_info
+    out = {
+        "simulations": info.simulations,
+        "sims_saved": info.sims_saved,
+        "stop_reason": info.stop_reason,
+    }
+    if mcts.stats is not None:
+        # adaptive searches run twice; the attached collector covers both
+        out["stats"] = mcts.stats.summary()
+    return out
 
 
 def _simple_material_eval(state: GameState) -> int:
@@ -704,7 +957,7 @@ from pydantic import BaseModel
 
 
 class SelfPlayBody(BaseModel):
-    engine: str = "mcts"  # "mcts" or "mcts_nn"
+    engine: str = "mcts"  # "mcts", "mcts_nn", "gumbel" or "gumbel_nn"
     sims: int = 100
     max_moves: int = 150
     tau_moves: int = 10
@@ -712,6 +965,8 @@ class SelfPlayBody(BaseModel):
     tau_final: float = 0.05
     model_path: Optional[str] = None
     compact: bool = True  # if true, omit planes and pi in records
+    full_search_prob: float = 1.0
+    fast_sims: int = 32
 
 
 @app.post("/api/selfplay")
@@ -728,6 +983,8 @@ def selfplay(body: SelfPlayBody):
         model_path=body.model_path,
         store_planes=(not body.compact),
         store_pi=(not body.compact),
+        full_search_prob=body.full_search_prob,
+        fast_sims=body.fast_sims,
     )
     game = self_play_game(cfg)
     return game
@@ -10,6 +10,7 @@ import json
 import math
 import os
 import sys
+import time
 from datetime import datetime
 from typing import List, Tuple, Dict, Callable, Optional
 
@@ -120,6 +121,34 @@ def calculate_elo(scores: List[float], n_games: int) -> Tuple[float, float]:
     return elo_diff, mean_score
 
 
+def timed_policy(policy_func: Callable, times: List[float]) -> Callable:
+    """
+    包装策略函数, 将每步思考时间 (秒) 追加到 times
+    """
+    def policy(state):
+        t0 = time.perf_counter()
+        try:
+            return policy_func(state)
+        finally:
+            times.append(time.perf_counter() - t0)
+    return policy
+
+
+def latency_summary(times: List[float]) -> Dict:
+    """
+    每步耗时统计 (毫秒): 步数, 平均值, 中位数, p90
+    """
+    if not times:
+        return {'moves': 0, 'mean_ms': 0.0, 'median_ms': 0.0, 'p90_ms': 0.0}
+    ms = sorted(1000.0 * t for t in times)
+    return {
+        'moves': len(ms),
+        'mean_ms': sum(ms) / len(ms),
+        'median_ms': ms[len(ms) // 2],
+        'p90_ms': ms[min(len(ms) - 1, int(0.9 * len(ms)))],
+    }
+
+
 def arena(
     engine_a: str,
     engine_b: str,
@@ -146,9 +175,11 @@ def arena(
     Returns:
         结果字典
     """
-    # 创建策略函数
-    policy_a = create_policy_func(engine_a, model_a, params_a or {})
-    policy_b = create_policy_func(engine_b, model_b, params_b or {})
+    # 创建策略函数 (计时, 用于强度-延迟权衡报告)
+    times_a: List[float] = []
+    times_b: List[float] = []
+    policy_a = timed_policy(create_policy_func(engine_a, model_a, params_a or {}), times_a)
+    policy_b = timed_policy(create_policy_func(engine_b, model_b, params_b or {}), times_b)
     
     scores_a = []
     game_results = []
@@ -217,6 +248,8 @@ def arena(
     wins = sum(1 for s in scores_a if s == 1.0)
     draws = sum(1 for s in scores_a if s == 0.5)
     losses = sum(1 for s in scores_a if s == 0.0)
+    latency_a = latency_summary(times_a)
+    latency_b = latency_summary(times_b)
     
     return {
         'engine_a': engine_a,
@@ -230,6 +263,9 @@ def arena(
         'draws': draws,
         'losses': losses,
         'scores': scores_a,
+        'latency_a': latency_a,  # 每步耗时 (毫秒)
+        'latency_b': latency_b,
+        'speedup_a': latency_b['mean_ms'] / latency_a['mean_ms'] if latency_a['mean_ms'] > 0 else 0.0,  # A 相对 B 的提速倍数
         'games': game_results,
         'timestamp': datetime.now().isoformat()
     }
@@ -308,19 +344,10 @@ def create_policy_func(engine: str, model_path: Optional[str], params: Dict) ->
         # Load model
         if model_path and os.path.exists(model_path):
             try:
-                # Try to load with auto-detection
-                state_dict = torch.load(model_path, map_location='cpu')
-                has_bn = any('bn' in k for k in state_dict.keys())
-                
-                if has_bn:
-                    from alphazero.network import create_xiangqi_net
-                    model = create_xiangqi_net()
-                else:
-                    from xq.nn import XQNet
-                    model = XQNet()
-                
-                model.load_state_dict(state_dict)
-                model.eval()
+                # State dict (auto-detected architecture), flat checkpoint or
+                # exported artefact, shared by every player using the same file
+                from alphazero.registry import cached_model
+                model = cached_model(model_path, params.get('precision', 'fp32'))
                 
                 from xq.nn import state_to_tensor
                 
@@ -346,6 +373,9 @@ def create_policy_func(engine: str, model_path: Optional[str], params: Dict) ->
                                 return mv
                     return None
                 return policy
+            except ValueError:
+                # requested precision failed its calibration check
+                raise
             except Exception as e:
                 print(f"Failed to load model {model_path}: {e}")
                 print("Falling back to random policy")
@@ -386,6 +416,10 @@ def main():
                        help="MCTS simulations for player A (if using mcts)")
     parser.add_argument("--sims-b", type=int, default=200,
                        help="MCTS simulations for player B (if using mcts)")
+    parser.add_argument("--precision-a", default="fp32", choices=["fp32", "bf16", "fp16", "int8"],
+                       help="Inference precision for player A (if using mcts_nn)")
+    parser.add_argument("--precision-b", default="fp32", choices=["fp32", "bf16", "fp16", "int8"],
+                       help="Inference precision for player B (if using mcts_nn)")
     parser.add_argument("--games", type=int, default=20,
                        help="Number of games to play (half with each color)")
     parser.add_argument("--output", type=str, default=None,
@@ -410,11 +444,13 @@ def main():
     # Prepare parameters
     params_a = {
         'depth': args.depth_a,
-        'sims': args.sims_a
+        'sims': args.sims_a,
+        'precision': args.precision_a
     }
     params_b = {
         'depth': args.depth_b,
-        'sims': args.sims_b
+        'sims': args.sims_b,
+        'precision': args.precision_b
     }
     
     # Run arena
@@ -439,6 +475,12 @@ def main():
     print(f"  Losses: {results['losses']}")
     print(f"  Win Rate: {results['win_rate']*100:.2f}%")
     print(f"  ELO Difference: {results['elo_diff']:+.1f} (A - B)")
+    print(f"Latency (ms/move): A {results['latency_a']['mean_ms']:.1f} "
+          f"(median {results['latency_a']['median_ms']:.1f}), "
+          f"B {results['latency_b']['mean_ms']:.1f} "
+          f"(median {results['latency_b']['median_ms']:.1f})")
+    print(f"Trade-off: A is {results['speedup_a']:.2f}x the speed of B "
+          f"at {results['elo_diff']:+.1f} ELO")
     print("=" * 60)
     
     if results['elo_diff'] > 0:
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Benchmark Xiangqi network variants for CPU inference.
+
+Each variant is a legacy XQNet or a PolicyValueNet (policy head, trunk width and
+depth, optionally the compact action space). For every variant and thread count a
+fresh process loads its checkpoint (torch and flat formats, timed), measures
+forward latency and throughput over the batch sizes, and reports its peak RSS.
+The JSON report holds every measurement; the printed table marks the Pareto set
+over parameters (capacity), batch-1 latency, throughput and peak memory.
+
+Variant syntax: "xq" (legacy XQNet) or HEAD:CHANNELSxBLOCKS[:compact] with HEAD
+"xq", "dense" or "conv", e.g. "conv:32x2" or "dense:64x3:compact".
+"""
+
+import argparse
+import concurrent.futures
+import json
+import multiprocessing as mp
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import torch
+
+from alphazero import create_xiangqi_net, load_inference_model
+from alphazero.checkpoint import save_flat
+
+
+DEFAULT_VARIANTS = ["xq", "dense:64x3", "conv:64x3", "conv:32x2", "conv:128x6"]
+DEFAULT_BATCHES = [1, 2, 4, 8, 16, 32, 64, 128, 256, 512]
+
+
+def build_variant(spec: str):
+	"""Untrained network for a variant spec (see module docstring)."""
+	from xq.nn import XQNet
+
+	parts = spec.split(":")
+	head = parts[0]
+	channels, blocks = 64, 3
+	if len(parts) > 1:
+		channels, blocks = (int(n) for n in parts[1].split("x"))
+	compact = len(parts) > 2 and parts[2] == "compact"
+	if head == "xq":
+		return XQNet(channels=channels, num_blocks=blocks, compact=compact)
+	if head not in ("dense", "conv"):
+		raise ValueError(f"unknown policy head in variant {spec!r}")
+	return create_xiangqi_net(head, compact=compact, hidden_channels=channels, num_res_blocks=blocks)
+
+
+def _rss_mb(field: str = "VmHWM") -> float:
+	"""Peak (VmHWM) or current (VmRSS) resident set size of this process in MB.
+	ru_maxrss is only a fallback: Linux carries it across exec, so a spawned child
+	would report its parent's peak."""
+	try:
+		with open("/proc/self/status") as f:
+			for line in f:
+				if line.startswith(field + ":"):
+					return int(line.split()[1]) / 1024.0
+	except OSError:
+		pass
+	return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+@torch.no_grad()
+def measure(spec: str, paths: Dict[str, str], threads: int, batch_sizes: List[int], repeats: int) -> Dict:
+	"""Load and time one variant at one thread count (run in a fresh process)."""
+	import xq.nn  # noqa: F401  (keep import time out of the load timings)
+	import xq.policy  # noqa: F401
+
+	torch.set_num_threads(threads)
+	baseline = _rss_mb("VmRSS")
+	load_ms = {}
+	model = None
+	for fmt, path in paths.items():
+		model = None  # the previous format's copy does not count towards the peak
+		t0 = time.perf_counter()
+		model, _ = load_inference_model(path, mmap=True)
+		load_ms[fmt] = 1000.0 * (time.perf_counter() - t0)
+	batches = {}
+	for bs in batch_sizes:
+		x = torch.randn(bs, 15, 10, 9)
+		for _ in range(2):
+			model(x)
+		times = []
+		for _ in range(repeats):
+			t0 = time.perf_counter()
+			model(x)
+			times.append(time.perf_counter() - t0)
+		times.sort()
+		median = times[len(times) // 2]
+		batches[str(bs)] = {
+			"latency_ms": 1000.0 * median,
+			"min_ms": 1000.0 * times[0],
+			"throughput": bs / median,  # positions per second
+		}
+	return {
+		"variant": spec,
+		"threads": threads,
+		"params": sum(p.numel() for p in model.parameters()),
+		"file_bytes": {fmt: os.path.getsize(path) for fmt, path in paths.items()},
+		"load_ms": load_ms,
+		"baseline_rss_mb": baseline,
+		"peak_rss_mb": _rss_mb(),
+		"batches": batches,
+	}
+
+
+def pareto(results: List[Dict], batch: int) -> List[int]:
+	"""Indices of results no other result beats on every axis: more parameters,
+	lower batch-1 latency, higher throughput at batch, lower peak RSS."""
+	def axes(r):
+		first = r["batches"][min(r["batches"], key=int)]
+		return (r["params"], -first["latency_ms"], r["batches"][str(batch)]["throughput"], -r["peak_rss_mb"])
+
+	points = [axes(r) for r in results]
+	front = []
+	for i, p in enumerate(points):
+		dominated = any(
+			all(a >= b for a, b in zip(q, p)) and any(a > b for a, b in zip(q, p))
+			for j, q in enumerate(points) if j != i
+		)
+		if not dominated:
+			front.append(i)
+	return front
+
+
+def print_table(results: List[Dict], front: List[int], batch: int) -> None:
+	print(f"{'variant':<22}{'thr':>4}{'params':>12}{'torch ms':>9}{'flat ms':>9}"
+	      f"{'b1 ms':>9}{f'b{batch} pos/s':>12}{'peak MB':>9}  pareto")
+	for i, r in enumerate(results):
+		first = r["batches"][min(r["batches"], key=int)]
+		print(f"{r['variant']:<22}{r['threads']:>4}{r['params']:>12}"
+		      f"{r['load_ms']['torch']:>9.1f}{r['load_ms']['flat']:>9.1f}"
+		      f"{first['latency_ms']:>9.2f}{r['batches'][str(batch)]['throughput']:>12.0f}"
+		      f"{r['peak_rss_mb']:>9.0f}  {'*' if i in front else ''}")
+
+
+def main():
+	parser = argparse.ArgumentParser(description="Benchmark network variants for CPU inference")
+	parser.add_argument("--variants", nargs="+", default=DEFAULT_VARIANTS, help="Variant specs (see module docstring)")
+	parser.add_argument("--batch_sizes", type=int, nargs="+", default=DEFAULT_BATCHES)
+	parser.add_argument("--threads", type=int, nargs="+", default=sorted({1, os.cpu_count() or 1}),
+	                    help="torch.set_num_threads values")
+	parser.add_argument("--repeats", type=int, default=10, help="Timed forward passes per batch size")
+	parser.add_argument("--pareto_batch", type=int, default=64, help="Batch size whose throughput enters the Pareto set")
+	parser.add_argument("--no_isolate", action="store_true", help="Measure in this process (peak RSS is then cumulative)")
+	parser.add_argument("--out", default="bench_networks.json", help="JSON report path")
+	args = parser.parse_args()
+	if args.pareto_batch not in args.batch_sizes:
+		parser.error("--pareto_batch must be one of --batch_sizes")
+
+	results = []
+	with tempfile.TemporaryDirectory() as tmp:
+		jobs = []
+		for i, spec in enumerate(args.variants):
+			model = build_variant(spec).eval()
+			paths = {"torch": os.path.join(tmp, f"{i}.pt"), "flat": os.path.join(tmp, f"{i}.bin")}
+			torch.save(model.state_dict(), paths["torch"])
+			save_flat(model, paths["flat"])
+			del model
+			jobs.extend((spec, paths, t) for t in args.threads)
+		for spec, paths, threads in jobs:
+			print(f"Measuring {spec} with {threads} thread(s)...", flush=True)
+			job = (spec, paths, threads, args.batch_sizes, args.repeats)
+			if args.no_isolate:
+				results.append(measure(*job))
+				continue
+			# a fresh process per measurement: clean peak RSS and cold load times
+			with concurrent.futures.ProcessPoolExecutor(max_workers=1, mp_context=mp.get_context("spawn")) as pool:
+				results.append(pool.submit(measure, *job).result())
+
+	front = pareto(results, args.pareto_batch)
+	report = {
+		"machine": {
+			"platform": platform.platform(),
+			"processor": platform.processor(),
+			"cpu_count": os.cpu_count(),
+			"torch": torch.__version__,
+		},
+		"batch_sizes": args.batch_sizes,
+		"pareto_batch": args.pareto_batch,
+		"results": results,
+		"pareto": [results[i]["variant"] + f"@{results[i]['threads']}t" for i in front],
+	}
+	os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+	with open(args.out, "w", encoding="utf-8") as f:
+		json.dump(report, f, indent=2)
+	print()
+	print_table(results, front, args.pareto_batch)
+	print(f"\nReport saved to {args.out}")
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Distil a trained Xiangqi network into a smaller PolicyValueNet for serving.
+
+The student (width, depth and policy head set on the command line) learns the
+teacher's policy and value on stored self-play positions. Compare the two with
+scripts/arena.py, which reports the strength difference and per-move latency.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Dict, List
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import torch
+
+from alphazero import Trainer, TrainerConfig, create_xiangqi_net, load_inference_model
+from alphazero.checkpoint import save_flat
+from xq.encoding import planes_to_tensor
+from xq.policy import NUM_ACTIONS, NUM_COMPACT_ACTIONS, pi_to_compact
+
+
+def load_jsonl(path: str) -> List[Dict]:
+	"""Load self-play records from JSONL file."""
+	records = []
+	with open(path, 'r', encoding='utf-8') as f:
+		for line in f:
+			line = line.strip()
+			if not line:
+				continue
+			game = json.loads(line)
+			records.extend(game.get('records', []))
+	return records
+
+
+def to_samples(records: List[Dict], compact: bool, with_pi: bool):
+	"""Trainer samples (planes, pi or None, z); pi is only built when the game
+	targets are blended in (distill_alpha < 1)."""
+	samples = []
+	for rec in records:
+		pi = None
+		if with_pi and rec.get('pi') and rec.get('has_pi', True):
+			pi = [0.0] * (NUM_COMPACT_ACTIONS if compact else NUM_ACTIONS)
+			for k, p in (pi_to_compact(rec['pi']) if compact else rec['pi']).items():
+				pi[int(k)] = float(p)
+		samples.append((planes_to_tensor(rec['planes']).numpy(), pi, float(rec['z'])))
+	return samples
+
+
+@torch.no_grad()
+def forward_ms(model, batch: int = 1, repeats: int = 20) -> float:
+	"""Mean forward latency in milliseconds on a zero batch."""
+	x = torch.zeros(batch, 15, 10, 9)
+	model(x)
+	t0 = time.perf_counter()
+	for _ in range(repeats):
+		model(x)
+	return 1000.0 * (time.perf_counter() - t0) / repeats
+
+
+def main():
+	parser = argparse.ArgumentParser(description="Distil a teacher network into a smaller student")
+	parser.add_argument("--teacher", required=True, help="Teacher model (state dict, flat checkpoint or artefact)")
+	parser.add_argument("--data", required=True, help="Path to selfplay JSONL")
+	parser.add_argument("--model_out", default="models/student.pt", help="Output student path")
+	parser.add_argument("--channels", type=int, default=32, help="Student trunk width")
+	parser.add_argument("--blocks", type=int, default=2, help="Student residual blocks")
+	parser.add_argument("--policy_head", default="conv", choices=["dense", "conv"])
+	parser.add_argument("--epochs", type=int, default=10)
+	parser.add_argument("--batch_size", type=int, default=64)
+	parser.add_argument("--lr", type=float, default=1e-3)
+	parser.add_argument("--alpha", type=float, default=1.0, help="Weight of teacher targets vs game pi/z")
+	parser.add_argument("--temperature", type=float, default=1.0)
+	parser.add_argument("--flat", action="store_true", help="Save a flat mmap checkpoint")
+	args = parser.parse_args()
+
+	device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+	teacher, arch = load_inference_model(args.teacher, map_location="cpu")
+	with torch.no_grad():
+		compact = teacher(torch.zeros(1, 15, 10, 9))[0].shape[-1] == NUM_COMPACT_ACTIONS
+	student = create_xiangqi_net(args.policy_head, compact=compact, hidden_channels=args.channels, num_res_blocks=args.blocks)
+
+	records = load_jsonl(args.data)
+	print(f"Loaded {len(records)} positions")
+	if not records:
+		print("No data to train on!")
+		return
+	samples = to_samples(records, compact, with_pi=args.alpha < 1.0)
+
+	config = TrainerConfig(
+		lr=args.lr,
+		batch_size=args.batch_size,
+		epochs=args.epochs,
+		distill_alpha=args.alpha,
+		distill_temperature=args.temperature,
+	)
+	trainer = Trainer(student, config, device=str(device), teacher=teacher)
+	loss = trainer.train_step(samples)
+	print(f"Distillation loss: {loss:.4f}")
+
+	student = trainer.model.cpu().eval()
+	teacher = teacher.cpu()
+	t_params = sum(p.numel() for p in teacher.parameters())
+	s_params = sum(p.numel() for p in student.parameters())
+	t_ms, s_ms = forward_ms(teacher), forward_ms(student)
+	print(f"Teacher ({arch}): {t_params} params, {t_ms:.2f} ms/position")
+	print(f"Student: {s_params} params, {s_ms:.2f} ms/position ({t_ms / max(s_ms, 1e-9):.1f}x faster)")
+
+	if args.flat:
+		save_flat(student, args.model_out, meta={"teacher": os.path.basename(args.teacher)})
+	else:
+		os.makedirs(os.path.dirname(args.model_out) or ".", exist_ok=True)
+		torch.save(student.state_dict(), args.model_out)
+	print(f"Student saved to {args.model_out}")
+	print(f"Compare strength: scripts/arena.py --engine-a mcts_nn --model-a {args.model_out} "
+	      f"--engine-b mcts_nn --model-b {args.teacher}")
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Export a trained model (legacy XQNet or generic PolicyValueNet state dict) to a
+TorchScript inference artefact for CPU serving and self-play, or with --flat to a
+flat checkpoint (page-aligned tensors, memory-mapped on load, no unpickling).
+Either loads anywhere a model path is accepted (API, arena, self-play).
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import torch
+
+from alphazero.checkpoint import save_flat
+from alphazero.export import export_model, load_inference_model
+from alphazero.precision import calibration_inputs
+
+
+def main():
+	parser = argparse.ArgumentParser(description="Export a model for CPU inference")
+	parser.add_argument("--model", required=True, help="Trained state dict")
+	parser.add_argument("--out", required=True, help="Output artefact path")
+	parser.add_argument("--flat", action="store_true", help="Write a flat mmap checkpoint instead of TorchScript")
+	parser.add_argument("--quantize", action="store_true", help="int8 dynamic quantisation of Linear layers")
+	parser.add_argument("--channels_last", action="store_true", help="Channels-last conv layout")
+	parser.add_argument("--no_fold_bn", action="store_true", help="Keep BatchNorm layers separate")
+	parser.add_argument("--check_positions", type=int, default=256, help="Positions for the accuracy check (0 = skip)")
+	parser.add_argument("--min_top1", type=float, default=0.9)
+	parser.add_argument("--max_value_error", type=float, default=0.05)
+	args = parser.parse_args()
+
+	model, arch = load_inference_model(args.model)
+	if isinstance(model, torch.jit.ScriptModule):
+		print(f"{args.model} is already an exported artefact")
+		return
+	if args.flat:
+		save_flat(model, args.out, meta={"source": os.path.basename(args.model)})
+		print(f"Wrote {arch} flat checkpoint to {args.out}")
+		return
+	check = calibration_inputs(args.check_positions, seed=random.randrange(1 << 30)) if args.check_positions > 0 else None
+	meta = export_model(
+		model,
+		args.out,
+		fold_bn=not args.no_fold_bn,
+		quantize=args.quantize,
+		channels_last=args.channels_last,
+		check_inputs=check,
+		min_top1=args.min_top1,
+		max_value_error=args.max_value_error,
+	)
+	print(f"Exported {arch} model to {args.out}")
+	print(json.dumps(meta, indent=2))
+
+
+if __name__ == "__main__":
+	main()
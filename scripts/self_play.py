@@ -1,13 +1,13 @@
 import argparse
-import json
 import os
+import signal
 import sys
-from typing import List
 
 # Add parent directory to path so we can import xq
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from xq.selfplay import SelfPlayConfig, self_play_game, save_jsonl
+from xq.selfplay import SelfPlayConfig, self_play_game
+from xq.selfplay_pool import SelfPlayPool, ShardWriter
 
 
 def main() -> None:
@@ -20,6 +20,13 @@ def main() -> None:
     parser.add_argument("--tau_start", type=float, default=1.0)
     parser.add_argument("--tau_final", type=float, default=0.05)
     parser.add_argument("--model_path", type=str, default=None)
+    parser.add_argument("--full_search_prob", type=float, default=1.0, help="Fraction of moves searched with --sims and recorded with pi")
+    parser.add_argument("--fast_sims", type=int, default=32, help="Simulations for the remaining (value-only) moves")
+    parser.add_argument("--pipeline_batch", type=int, default=0, help="mcts_nn: evaluate leaves in batches of this size on an inference thread (0 = off)")
+    parser.add_argument("--precision", default="fp32", choices=["fp32", "bf16", "fp16", "int8"], help="mcts_nn: inference precision, checked against fp32 before use")
+    parser.add_argument("--workers", type=int, default=1, help="Self-play processes (1 = play in this process)")
+    parser.add_argument("--seed", type=int, default=None, help="Base seed; worker i uses seed + i")
+    parser.add_argument("--games_per_shard", type=int, default=0, help="Rotate --out into numbered shards of N games (0 = one file)")
     parser.add_argument("--out", type=str, default="selfplay.jsonl")
     args = parser.parse_args()
 
@@ -31,22 +38,52 @@ def main() -> None:
         tau_start=args.tau_start,
         tau_final=args.tau_final,
         model_path=args.model_path,
+        full_search_prob=args.full_search_prob,
+        fast_sims=args.fast_sims,
+        pipeline_batch=args.pipeline_batch,
+        precision=args.precision,
     )
 
-    # Create output directory if needed
-    out_dir = os.path.dirname(args.out)
-    if out_dir and not os.path.exists(out_dir):
-        os.makedirs(out_dir, exist_ok=True)
-    
-    games: List[dict] = []
-    for i in range(args.games):
-        print(f"Playing game {i+1}/{args.games}...")
-        g = self_play_game(cfg)
-        games.append(g)
-        print(f"  Result: {g['result']} ({len(g['records'])} positions)")
-
-    save_jsonl(args.out, games)
-    print(f"Saved {len(games)} games to {args.out}")
+    # Games are streamed to --out (or its shards) as they finish
+    if args.workers > 1:
+        pool = SelfPlayPool(cfg, workers=args.workers, seed=args.seed)
+        # Ctrl-C: finish and save the games in progress, start no new ones
+        signal.signal(signal.SIGINT, lambda *_: (print("Stopping after games in progress..."), pool.request_stop()))
+        try:
+            run = pool.run(
+                args.games,
+                args.out,
+                args.games_per_shard,
+                progress=lambda p: print(
+                    f"Game {p.games_done}/{p.games_total} (worker {p.worker}): result {p.result}, "
+                    f"{p.positions} positions, {p.games_per_s:.2f} games/s"
+                ),
+            )
+        finally:
+            pool.close()
+        for err in run.errors:
+            print(f"  Error: {err}")
+        games, shards = run.games, run.shards
+    else:
+        if args.seed is not None:
+            import random
+            random.seed(args.seed)
+        writer = ShardWriter(args.out, args.games_per_shard)
+        games = 0
+        try:
+            for i in range(args.games):
+                print(f"Playing game {i+1}/{args.games}...")
+                g = self_play_game(cfg)
+                writer.write(g)
+                games += 1
+                print(f"  Result: {g['result']} ({len(g['records'])} positions)")
+        except KeyboardInterrupt:
+            print("Interrupted")
+        finally:
+            writer.close()
+        shards = writer.paths
+
+    print(f"Saved {games} games to {', '.join(shards) or args.out}")
 
 
 if __name__ == "__main__":
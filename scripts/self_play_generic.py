@@ -14,79 +14,58 @@ from typing import List, Dict
 # Add parent directory to path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+import numpy as np
 import torch
 
-from alphazero import GenericMCTS, create_xiangqi_net
+from alphazero import GenericMCTS, load_inference_model, make_batch_policy_value_fn
 from xq.game_adapter import XiangqiGame
+from xq.policy import COMPACT_TO_FULL, NUM_COMPACT_ACTIONS
 
 
-def self_play_game_generic(game_interface, mcts, max_moves: int = 200, temperature: float = 1.0):
+def self_play_game_generic(game_interface, mcts, policy_fn, batch_fn=None, num_simulations: int = 100,
+                           max_moves: int = 200, temperature: float = 1.0):
 	"""
-	Run a single self-play game using the generic framework.
-	Returns a list of (state_tensor, policy, outcome) tuples.
+	Run a single self-play game using the generic framework. With batch_fn and
+	mcts.batch_size > 1 leaves are evaluated in batches; the game's positions are
+	encoded in one states_to_tensor call at the end.
+	Returns (records, winner) with winner 1 (red), -1 (black) or 0 (draw).
 	"""
+	import random
+	
 	state = game_interface.get_initial_state()
-	game_states = []
-	move_count = 0
+	states, policies, players = [], [], []
 	
-	while move_count < max_moves:
-		result = game_interface.get_game_result(state)
-		if result is not None:
+	while len(states) < max_moves and game_interface.get_game_result(state) is None:
+		action_probs = mcts.search(state, policy_fn, num_simulations=num_simulations, batch_policy_value_fn=batch_fn)
+		if not action_probs:
 			break
+		states.append(state)
+		policies.append(action_probs)
+		players.append(game_interface.get_current_player(state))
 		
-		# Run MCTS
-		action_probs = mcts.search(state, temperature=temperature)
-		
-		# Store state tensor and policy
-		state_tensor = game_interface.state_to_tensor(state)
-		game_states.append({
-			'state': state_tensor,
-			'policy': action_probs,
-			'player': game_interface.get_current_player(state)
-		})
-		
-		# Sample action
+		# Sample action with temperature (greedy at 0)
 		actions = list(action_probs.keys())
-		probs = list(action_probs.values())
-		import random
-		action = random.choices(actions, weights=probs, k=1)[0]
-		
-		# Apply action
+		if temperature <= 1e-6:
+			action = max(actions, key=action_probs.get)
+		else:
+			action = random.choices(actions, weights=[action_probs[a] ** (1.0 / temperature) for a in actions], k=1)[0]
 		state = game_interface.get_next_state(state, action)
-		move_count += 1
 	
-	# Get final result
-	result = game_interface.get_game_result(state)
-	if result is None:
-		result = 0.0  # Draw if max moves reached
+	# Final result is from the side to move's POV; unfinished games are draws
+	result = game_interface.get_game_result(state) or 0.0
+	last_player = game_interface.get_current_player(state)
+	winner = 0 if result == 0 else (last_player if result > 0 else -last_player)
 	
-	# Create training records
 	records = []
-	for item in game_states:
-		# Convert policy dict to list format expected by dataset
-		policy_list = [0.0] * game_interface.get_action_size()
-		for action, prob in item['policy'].items():
-			policy_list[action] = prob
-		
-		# Convert state tensor to planes format
-		planes = item['state'].numpy().tolist()
-		
-		# Assign outcome from perspective of the player who made the move
-		player = item['player']
-		if result == 0:
-			z = 0.0  # Draw
-		elif result == player:
-			z = 1.0  # Win
-		else:
-			z = -1.0  # Loss
-		
+	planes = game_interface.states_to_tensor(states) if states else []
+	for tensor, policy, player in zip(planes, policies, players):
 		records.append({
-			'planes': planes,
-			'pi': {str(i): p for i, p in enumerate(policy_list) if p > 0},
-			'z': z
+			'planes': tensor.reshape(tensor.shape[0], -1).tolist(),
+			'pi': {str(a): p for a, p in policy.items() if p > 0},
+			'z': float(winner * player),
 		})
 	
-	return records, result
+	return records, winner
 
 
 def main():
@@ -97,6 +76,7 @@ def main():
 	parser.add_argument("--sims", type=int, default=100, help="MCTS simulations per move")
 	parser.add_argument("--max_moves", type=int, default=200, help="Max moves per game")
 	parser.add_argument("--temperature", type=float, default=1.0, help="Sampling temperature")
+	parser.add_argument("--batch_size", type=int, default=8, help="Leaves evaluated per network call (1 = one at a time)")
 	parser.add_argument("--model", type=str, default=None, help="Path to trained model (optional)")
 	parser.add_argument("--out", default="selfplay_generic.jsonl", help="Output JSONL file")
 	args = parser.parse_args()
@@ -114,27 +94,22 @@ def main():
 	# Initialize model and MCTS
 	if args.model and os.path.exists(args.model):
 		print(f"Loading model from {args.model}")
-		model = create_xiangqi_net().to(device)
-		model.load_state_dict(torch.load(args.model, map_location=device))
-		model.eval()
-		
-		def policy_fn(state):
-			"""Policy function using the trained model."""
-			state_tensor = game.state_to_tensor(state).unsqueeze(0).to(device)
-			with torch.no_grad():
-				logits, value = model(state_tensor)
-			probs = torch.softmax(logits[0], dim=0).cpu().numpy()
-			return probs.tolist(), float(value[0].cpu().item())
+		model, _ = load_inference_model(args.model, map_location=device)
+		with torch.no_grad():
+			compact = model(torch.zeros(1, 15, 10, 9, device=device))[0].shape[-1] == NUM_COMPACT_ACTIONS
+		# XiangqiGame actions are 8100-space indices
+		batch_fn = make_batch_policy_value_fn(model, game, device, action_map=COMPACT_TO_FULL if compact else None)
 	else:
 		print("No model provided, using random policy")
-		def policy_fn(state):
-			"""Random policy fallback."""
-			import numpy as np
-			action_size = game.get_action_size()
-			probs = np.ones(action_size) / action_size
-			return probs.tolist(), 0.0
+		def batch_fn(states):
+			"""Uniform policy fallback."""
+			uniform = np.full(game.get_action_size(), 1.0 / game.get_action_size())
+			return [(uniform, 0.0) for _ in states]
+	
+	def policy_fn(state):
+		return batch_fn([state])[0]
 
-	mcts = GenericMCTS(game, policy_fn, num_simulations=args.sims, c_puct=1.0)
+	mcts = GenericMCTS(game, cpuct=1.0, batch_size=args.batch_size)
 
 	# Create output directory
 	os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
@@ -146,7 +121,8 @@ def main():
 	for game_idx in range(args.games):
 		print(f"Game {game_idx + 1}/{args.games}...", end=" ", flush=True)
 		records, result = self_play_game_generic(
-			game, mcts, 
+			game, mcts, policy_fn, batch_fn,
+			num_simulations=args.sims,
 			max_moves=args.max_moves,
 			temperature=args.temperature
 		)
@@ -121,6 +121,110 @@ def test_generic_framework():
     return True
 
 
+def test_generic_mcts_paths():
+    """GenericMCTS leaves the root state untouched, and make/unmake search visits
+    exactly like the copying path, one simulation at a time and batched."""
+    print("\nTesting GenericMCTS search paths...")
+    
+    import random
+    import numpy as np
+    from alphazero import GenericMCTS
+    from xq.game_adapter import XiangqiGame
+    
+    class CopyingXiangqiGame(XiangqiGame):
+        def supports_make_unmake(self):
+            return False
+    
+    xiangqi = XiangqiGame()
+    
+    def policy_value(state):
+        """Uniform priors; an arbitrary but fixed value per position."""
+        legal = xiangqi.get_legal_actions(state)
+        probs = [0.0] * xiangqi.get_action_size()
+        for a in legal:
+            probs[a] = 1.0 / len(legal)
+        return probs, (state.zkey % 201) / 100.0 - 1.0
+    
+    def search(game, batch_size):
+        random.seed(0)
+        np.random.seed(0)
+        state = game.get_initial_state()
+        before = (state.zkey, list(state.board), len(state.history), state.side_to_move)
+        mcts = GenericMCTS(game, batch_size=batch_size)
+        probs = mcts.search(state, policy_value, num_simulations=300, batch_policy_value_fn=lambda ss: [policy_value(x) for x in ss])
+        assert (state.zkey, list(state.board), len(state.history), state.side_to_move) == before
+        assert mcts.root.N.sum() == 299  # the first simulation expands the root
+        return probs
+    
+    assert xiangqi.supports_make_unmake()
+    for batch_size in (1, 8):
+        assert search(xiangqi, batch_size) == search(CopyingXiangqiGame(), batch_size)
+        print(f"{CHECK} batch_size={batch_size}: root state unchanged, make/unmake and copying visits identical")
+    
+    return True
+
+
+def test_batch_game_api():
+    """XiangqiGame batch methods and make_batch_policy_value_fn match the per-state
+    methods, and batched GenericMCTS self-play runs on a compact network."""
+    print("\nTesting batched game API...")
+    
+    import random
+    import numpy as np
+    import torch
+    from alphazero import GenericMCTS, create_xiangqi_net, make_batch_policy_value_fn
+    from xq import constants as C
+    from xq.game_adapter import XiangqiGame
+    from xq.policy import COMPACT_TO_FULL, policy_from_compact
+    from self_play_generic import self_play_game_generic
+    
+    game = XiangqiGame()
+    rng = random.Random(0)
+    states = []
+    for plies in (0, 3, 12, 40):
+        s = game.get_initial_state()
+        for _ in range(plies):
+            s = game.get_next_state(s, rng.choice(game.get_legal_actions(s)))
+        states.append(s)
+    mated = _mate_in_one()
+    mated.apply_move(next(m for m in mated.generate_legal_moves() if _is_mate_after(mated, m.from_sq * C.NUM_SQUARES + m.to_sq)))
+    states.append(mated)
+    
+    assert np.array_equal(game.states_to_tensor(states), np.stack([game.state_to_tensor(s) for s in states]))
+    for s, mask in zip(states, game.legal_action_masks(states)):
+        assert set(np.flatnonzero(mask).tolist()) == set(game.get_legal_actions(s))
+    results = game.game_results(states)
+    assert results == [game.get_game_result(s) for s in states] and results[-1] == -1.0
+    print(f"{CHECK} states_to_tensor, legal_action_masks and game_results match per-state calls")
+    
+    torch.manual_seed(0)
+    for compact in (False, True):
+        model = create_xiangqi_net(compact=compact, hidden_channels=16, num_res_blocks=1).eval()
+        action_map = COMPACT_TO_FULL if compact else None
+        outputs = make_batch_policy_value_fn(model, game, action_map=action_map)(states)
+        for s, (policy, value) in zip(states, outputs):
+            with torch.no_grad():
+                logits, v = model(torch.from_numpy(game.state_to_tensor(s)).unsqueeze(0))
+            want = torch.softmax(logits[0], dim=-1).numpy()
+            want = policy_from_compact(want) if compact else want
+            assert policy.shape == (8100,) and np.allclose(policy, want, atol=1e-5) and abs(value - float(v)) < 1e-5
+    try:
+        make_batch_policy_value_fn(model, game)(states)  # compact without action_map
+        return False
+    except ValueError:
+        pass
+    print(f"{CHECK} Batch policy function matches per-state inference; compact outputs mapped to 8100")
+    
+    batch_fn = make_batch_policy_value_fn(model, game, action_map=COMPACT_TO_FULL)
+    mcts = GenericMCTS(game, batch_size=4)
+    records, winner = self_play_game_generic(game, mcts, lambda s: batch_fn([s])[0], batch_fn, num_simulations=12, max_moves=4)
+    assert len(records) == 4 and winner == 0 and all(r["z"] == 0.0 for r in records)
+    assert set(int(a) for a in records[0]["pi"]) <= set(game.get_legal_actions(game.get_initial_state()))
+    print(f"{CHECK} Batched GenericMCTS self-play with a compact network")
+    
+    return True
+
+
 def test_model_compatibility():
     """Test that models can be saved and loaded."""
     print("\nTesting model compatibility...")
@@ -249,6 +353,897 @@ def test_cannon_legal_capture():
     return True
 
 
+def _mate_in_one():
+    """Red to move: rook (0,8)->(4,8), guarded by the horse, is the only mate and the
+    only move that does not lose to black's rook (8,3)->(8,0) mate."""
+    from xq import constants as C
+    from xq.state import GameState
+    
+    state = GameState()
+    state.board = [0] * C.NUM_SQUARES
+    for f, r, color, pt in (
+        (3, 0, C.RED, C.PT_KING), (2, 7, C.RED, C.PT_KNIGHT), (0, 8, C.RED, C.PT_ROOK),
+        (4, 9, C.BLACK, C.PT_KING), (3, 9, C.BLACK, C.PT_PAWN), (5, 9, C.BLACK, C.PT_PAWN),
+        (7, 1, C.BLACK, C.PT_ROOK), (8, 3, C.BLACK, C.PT_ROOK),
+    ):
+        state.board[C.index_of(f, r)] = C.make_piece(color, pt)
+    state.red_king_sq = C.index_of(3, 0)
+    state.black_king_sq = C.index_of(4, 9)
+    state.side_to_move = C.RED
+    state.undo_stack.clear()
+    state.history.clear()
+    state.history_gives_check.clear()
+    state.history_capture.clear()
+    state.history_chase_pair.clear()
+    state._init_state()
+    return state
+
+
+def _is_mate_after(state, action):
+    """True if the from-to action is legal in state and leaves the opponent mated."""
+    from xq import constants as C
+    
+    move = next((m for m in state.generate_legal_moves() if m.from_sq * C.NUM_SQUARES + m.to_sq == action), None)
+    if move is None:
+        return False
+    after = state.clone()
+    after.apply_move(move)
+    return not after.generate_legal_moves() and after.is_in_check(after.side_to_move)
+
+
+def test_lazy_children():
+    """Child nodes exist only for edges a simulation has traversed."""
+    print("\nTesting lazy child nodes...")
+    
+    from xq import GameState
+    from xq.mcts import MCTS
+    from xq.selfplay import default_policy_fn
+    
+    state = GameState()
+    state.setup_starting_position()
+    sims = 30  # fewer than the 44 legal moves, so some root edges stay unvisited
+    root = MCTS().run(state, default_policy_fn(), num_simulations=sims)
+    assert len(root.actions) == len(state.generate_legal_moves()) == len(root.edges)
+    assert set(root.children) == {a for a, n in zip(root.actions, root.N) if n > 0}
+    assert len(root.children) < len(root.actions)
+    nodes, edges, stack = 0, 0, [root]
+    while stack:
+        node = stack.pop()
+        nodes += 1
+        edges += len(node.actions)
+        for a, child in node.children.items():
+            assert child.parent is node and node.N[node.actions.index(a)] > 0
+            stack.append(child)
+    assert nodes <= sims + 1 < edges
+    print(f"{CHECK} {nodes} nodes materialised for {sims} simulations over {edges} edges")
+    
+    return True
+
+
+def test_inplace_traversal():
+    """Searches apply and undo moves on one working state: the root state is untouched
+    and every expanded node saw the position its path leads to."""
+    print("\nTesting in-place traversal...")
+    
+    from xq import GameState, Move, constants as C
+    from xq.mcts import MCTS, GumbelMCTS, PipelinedMCTS
+    from xq.selfplay import default_policy_fn
+    
+    state = GameState()
+    state.setup_starting_position()
+    state.apply_move(state.generate_legal_moves()[0])  # a root with history of its own
+    snapshot = (list(state.board), state.side_to_move, state.zkey, list(state.history), len(state.undo_stack))
+    policy_fn = default_policy_fn()
+    searchers = (MCTS(), GumbelMCTS(), PipelinedMCTS(lambda states: [policy_fn(s) for s in states], batch_size=4))
+    
+    def check(node, s):
+        expanded = 0
+        if node.is_expanded and node.actions:
+            legal = {m.from_sq * C.NUM_SQUARES + m.to_sq for m in s.generate_legal_moves()}
+            assert set(node.actions) == legal
+            expanded += 1
+        for slot, action in enumerate(node.actions):
+            child = node.children.get(action)
+            if child is not None:
+                s.apply_move(Move(node.moves[slot]))
+                expanded += check(child, s)
+                s.undo_move()
+        return expanded
+    
+    for mcts in searchers:
+        root = mcts.run(state, policy_fn, num_simulations=120)
+        assert (list(state.board), state.side_to_move, state.zkey, list(state.history), len(state.undo_stack)) == snapshot
+        expanded = check(root, state.clone())
+        assert expanded > 1
+        print(f"{CHECK} {type(mcts).__name__}: root state unchanged, {expanded} expansions match their positions")
+    
+    return True
+
+
+def test_mcts_solver():
+    """The MCTS solver proves a mate in one, stops early and plays the mate."""
+    print("\nTesting MCTS solver...")
+    
+    from xq.mcts import MCTS
+    from xq.selfplay import default_policy_fn
+    
+    state = _mate_in_one()
+    zkey = state.zkey
+    mcts = MCTS()
+    root = mcts.run(state, default_policy_fn(), num_simulations=400)
+    info = mcts.last_info
+    assert root.proven == 1.0 and info.stop_reason == "solved"
+    assert info.sims_saved == 400 - info.simulations > 0
+    best = mcts.best_action(root)
+    assert best is not None and _is_mate_after(state, best)
+    assert mcts.action_probs(root, 1.0) == {best: 1.0}
+    assert state.zkey == zkey
+    print(f"{CHECK} Mate proven after {info.simulations} simulations ({info.sims_saved} saved) and played")
+    
+    return True
+
+
+def test_smart_stop():
+    """Smart stop ends the search once the leading move cannot be overtaken."""
+    print("\nTesting smart stop...")
+    
+    from xq import GameState, constants as C
+    from xq.mcts import MCTS
+    
+    def peaked_policy(state):
+        """95% of the prior on the first legal move, the rest uniform; neutral value."""
+        moves = state.generate_legal_moves()
+        p = [0.0] * (C.NUM_SQUARES * C.NUM_SQUARES)
+        for m in moves:
+            p[m.from_sq * C.NUM_SQUARES + m.to_sq] = 0.05 / len(moves)
+        if moves:
+            p[moves[0].from_sq * C.NUM_SQUARES + moves[0].to_sq] += 0.95
+        return p, 0.0
+    
+    state = GameState()
+    state.setup_starting_position()
+    full = MCTS()
+    full_root = full.run(state, peaked_policy, num_simulations=400, add_noise=False)
+    mcts = MCTS(smart_stop=True)
+    root = mcts.run(state, peaked_policy, num_simulations=400, add_noise=False)
+    info = mcts.last_info
+    assert info.stop_reason == "unreachable" and info.sims_saved > 0
+    assert info.simulations + info.sims_saved == 400
+    lead, runner_up = sorted(root.N, reverse=True)[:2]
+    assert lead - runner_up > info.sims_saved
+    assert mcts.best_action(root) == full.best_action(full_root)
+    print(f"{CHECK} Stopped after {info.simulations} of 400 simulations with the same move as the full search")
+    
+    return True
+
+
+def test_pipelined_mcts():
+    """Pipelined search spends its exact budget, reverts all virtual loss and joins
+    its inference thread, also when the batch policy raises."""
+    print("\nTesting pipelined MCTS...")
+    
+    import threading
+    from xq import GameState
+    from xq.mcts import PipelinedMCTS
+    from xq.selfplay import default_policy_fn
+    
+    uniform = default_policy_fn()
+    
+    def batch_fn(states):  # neutral values: every W must end at exactly 0
+        return [(uniform(s)[0], 0.0) for s in states]
+    
+    state = GameState()
+    state.setup_starting_position()
+    threads = set(threading.enumerate())
+    mcts = PipelinedMCTS(batch_fn, batch_size=8, virtual_loss=3.0)
+    root = mcts.run(state, num_simulations=200, add_noise=False)
+    assert mcts.last_info.simulations == root.visits == sum(root.N) == 200
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        assert node.visits == sum(node.N) and all(w == 0.0 for w in node.W)
+        for slot, action in enumerate(node.actions):
+            child = node.children.get(action)
+            if child is not None and child.is_expanded:
+                assert node.N[slot] == child.visits + 1  # the expanding visit is not counted below
+                stack.append(child)
+    assert set(threading.enumerate()) == threads
+    print(f"{CHECK} 200 simulations in batches of 8; visit counts consistent, virtual loss reverted")
+    
+    calls = []
+    
+    def failing_fn(states):
+        calls.append(len(states))
+        if len(calls) > 3:
+            raise RuntimeError("inference failed")
+        return batch_fn(states)
+    
+    try:
+        PipelinedMCTS(failing_fn, batch_size=8).run(state, num_simulations=200)
+        assert False, "the inference error should reach the caller"
+    except RuntimeError as e:
+        assert str(e) == "inference failed"
+    assert set(threading.enumerate()) == threads
+    print(f"{CHECK} Inference thread exits, also after a failing batch")
+    
+    return True
+
+
+def test_search_stats():
+    """SearchStats records every phase per search and aggregates over searches and games."""
+    print("\nTesting search statistics...")
+    
+    from xq import GameState
+    from xq.mcts import MCTS, PipelinedMCTS
+    from xq.selfplay import SelfPlayConfig, default_policy_fn, self_play_game
+    from xq.stats import PHASES, SearchStats
+    
+    state = GameState()
+    state.setup_starting_position()
+    policy_fn = default_policy_fn()
+    total = SearchStats()
+    mcts = MCTS(stats=total)
+    runs = []
+    for sims in (30, 20):
+        mcts.run(state, policy_fn, num_simulations=sims)
+        st = mcts.last_info.stats
+        assert st is not None and st is not total
+        assert st.searches == 1 and st.simulations == sims
+        assert all(st.phase_s[p] > 0 for p in ("select", "movegen", "inference", "backup"))
+        assert sum(st.depths.values()) == sims and min(st.depths) >= 1
+        assert st.batch_sizes[1] == st.nodes > 0 and len(st.latencies_s) == st.nodes
+        runs.append(st)
+    print(f"{CHECK} Per-search phases, batch sizes, depths and expansions populated")
+    
+    merged = SearchStats()
+    for st in runs:
+        merged.merge(st)
+    for agg in (total, merged):
+        assert agg.searches == 2 and agg.simulations == 50
+        assert agg.depths == runs[0].depths + runs[1].depths
+        assert agg.batch_sizes == runs[0].batch_sizes + runs[1].batch_sizes
+        assert agg.nodes == runs[0].nodes + runs[1].nodes
+        assert all(abs(agg.phase_s[p] - runs[0].phase_s[p] - runs[1].phase_s[p]) < 1e-9 for p in PHASES)
+    summary = total.summary()
+    assert summary["simulations"] == 50 and summary["nn"]["mean_batch"] == 1.0
+    assert summary["depth"]["max"] == max(total.depths) and summary["sims_per_sec"] > 0
+    assert sum(summary["depth"]["hist"].values()) == 50
+    print(f"{CHECK} The attached collector and merge() sum both searches; summary is consistent")
+    
+    pipelined = PipelinedMCTS(lambda states: [policy_fn(s) for s in states], batch_size=8, stats=SearchStats())
+    pipelined.run(state, policy_fn, num_simulations=64)
+    assert pipelined.stats.summary()["nn"]["mean_batch"] > 1
+    print(f"{CHECK} Pipelined search records batches of {pipelined.stats.summary()['nn']['mean_batch']:.1f} leaves")
+    
+    game = self_play_game(SelfPlayConfig(sims=8, max_moves=4, collect_stats=True))
+    summary = game["search_stats"]
+    assert summary["searches"] == len(game["moves"]) > 0
+    assert 0 < summary["simulations"] <= 8 * len(game["moves"]) and summary["nodes"] > 0
+    print(f"{CHECK} Self-play aggregates {summary['searches']} searches into the game's search_stats")
+    
+    return True
+
+
+def test_gumbel_solved_root():
+    """Gumbel search plays the proven mate instead of returning no move."""
+    print("\nTesting Gumbel search on a solved root...")
+    
+    from xq.mcts import GumbelMCTS
+    from xq.selfplay import default_policy_fn
+    
+    state = _mate_in_one()
+    mcts = GumbelMCTS(max_considered=64)  # consider every root move
+    root = mcts.run(state, default_policy_fn(), num_simulations=400)
+    assert root.proven == 1.0 and mcts.last_info.stop_reason == "solved"
+    best = mcts.best_action(root)
+    assert best is not None and _is_mate_after(state, best)
+    for tau in (0.0, 1.0):
+        assert mcts.action_probs(root, tau) == {best: 1.0}
+    print(f"{CHECK} Mate proven after {mcts.last_info.simulations} simulations and played")
+    
+    return True
+
+
+def test_sim_allocator_volatility():
+    """The value-swing factor compares searches from the same side's point of view."""
+    print("\nTesting adaptive budget volatility...")
+    
+    from xq import GameState, constants as C
+    from xq.budget import SimAllocator
+    from xq.mcts import MCTS
+    from xq.selfplay import default_policy_fn
+    
+    state = GameState()
+    state.setup_starting_position()
+    root = MCTS().run(state, default_policy_fn(), num_simulations=0, add_noise=False)
+    calm = SimAllocator().factor(root, state, 0.5)
+    allocator = SimAllocator()
+    allocator.observe(root, state, 0.5)  # red to move, unsearched root: value 0.5 for red
+    assert abs(allocator.factor(root, state, 0.5) - calm) < 1e-9
+    assert allocator.factor(root, state, -0.5) > calm
+    state.side_to_move = C.BLACK  # same position seen by black: -0.5 is no swing
+    assert abs(allocator.factor(root, state, -0.5) - SimAllocator().factor(root, state, -0.5)) < 1e-9
+    assert allocator.factor(root, state, 0.5) > SimAllocator().factor(root, state, 0.5)
+    print(f"{CHECK} Value swing measured from the side to move's point of view")
+    
+    return True
+
+
+def test_run_adaptive():
+    """run_adaptive evaluates the root once (PUCT and Gumbel) and can hand the budget to a caller."""
+    print("\nTesting adaptive search...")
+    
+    from xq import GameState
+    from xq.budget import SimAllocator, run_adaptive
+    from xq.mcts import MCTS, GumbelMCTS
+    from xq.selfplay import default_policy_fn
+    
+    state = GameState()
+    state.setup_starting_position()
+    base = default_policy_fn()
+    root_evals = []
+    
+    def policy_fn(s):
+        if not s.undo_stack:  # the root: every other node is reached by applying moves
+            root_evals.append(1)
+        return base(s)
+    
+    for mcts in (MCTS(), GumbelMCTS()):
+        root_evals.clear()
+        allocator = SimAllocator()
+        root = run_adaptive(mcts, state, policy_fn, allocator)
+        assert len(root_evals) == 1
+        assert root.visits == mcts.last_info.simulations == allocator.config.mean_sims
+        assert mcts.best_action(root) in root.actions
+        print(f"{CHECK} {type(mcts).__name__}: root evaluated once, {root.visits} simulations allocated")
+    
+    budgets = []
+    
+    def search(sims):
+        budgets.append(sims)
+        mcts.last_info.simulations = sims
+        return root
+    
+    mcts = MCTS()
+    assert run_adaptive(mcts, state, policy_fn, SimAllocator(), search=search) is root
+    assert budgets == [SimAllocator().config.mean_sims] and mcts.last_info.simulations == budgets[0]
+    print(f"{CHECK} A custom search receives the allocated budget")
+    
+    return True
+
+
+def test_compact_action_space():
+    """Compact <-> 8100 index maps round-trip and the compact mask covers every legal move."""
+    print("\nTesting compact action space...")
+    
+    import random
+    import numpy as np
+    from xq import GameState, constants as C
+    from xq.policy import (
+        COMPACT_TO_FULL, FULL_TO_COMPACT, NUM_ACTIONS, NUM_COMPACT_ACTIONS, legal_move_mask,
+        pi_from_compact, pi_to_compact, policy_from_compact, policy_to_compact,
+    )
+    
+    assert len(np.unique(COMPACT_TO_FULL)) == NUM_COMPACT_ACTIONS < NUM_ACTIONS
+    assert np.array_equal(FULL_TO_COMPACT[COMPACT_TO_FULL], np.arange(NUM_COMPACT_ACTIONS))
+    assert (FULL_TO_COMPACT >= 0).sum() == NUM_COMPACT_ACTIONS
+    policy = np.random.default_rng(0).random((2, NUM_COMPACT_ACTIONS))
+    assert np.array_equal(policy_to_compact(policy_from_compact(policy)), policy)
+    print(f"{CHECK} {NUM_COMPACT_ACTIONS} compact actions; index and policy maps round-trip")
+    
+    rng = random.Random(0)
+    positions = 0
+    for _ in range(4):
+        state = GameState()
+        state.setup_starting_position()
+        for _ in range(120):
+            legal = state.generate_legal_moves()
+            if not legal or state.adjudicate_result() is not None:
+                break
+            full = [m.from_sq * C.NUM_SQUARES + m.to_sq for m in legal]
+            assert all(FULL_TO_COMPACT[a] >= 0 for a in full)
+            mask = np.array(legal_move_mask(state, compact=True))
+            assert mask.sum() == len(legal) and np.array_equal(np.flatnonzero(mask), np.sort(FULL_TO_COMPACT[full]))
+            assert np.array_equal(policy_from_compact(mask), np.array(legal_move_mask(state)))
+            pi = {str(a): 1.0 / len(full) for a in full}
+            assert pi_from_compact(pi_to_compact(pi)) == pi
+            positions += 1
+            state.apply_move(rng.choice(legal))
+    print(f"{CHECK} Compact masks and pi records cover every legal move in {positions} positions")
+    
+    return True
+
+
+def test_conv_policy_head():
+    """Conv policy head keeps the 8100 from-to action space and reloads by key."""
+    print("\nTesting convolutional policy head...")
+    
+    import torch
+    from alphazero import create_xiangqi_net, load_inference_model
+    from alphazero.network import ConvPolicyHead
+    from xq.state import GameState
+    from xq.encoding import states_to_tensor
+    
+    model = create_xiangqi_net("conv").eval()
+    dense_params = sum(p.numel() for p in create_xiangqi_net().parameters())
+    conv_params = sum(p.numel() for p in model.parameters())
+    assert conv_params < dense_params // 10
+    print(f"{CHECK} Parameters: {conv_params} (dense head: {dense_params})")
+    
+    state = GameState()
+    state.setup_starting_position()
+    with torch.no_grad():
+        logits, value = model(states_to_tensor([state]))
+    assert logits.shape == (1, 8100)
+    legal = [m.from_sq * 90 + m.to_sq for m in state.generate_legal_moves()]
+    assert all(logits[0, a] > ConvPolicyHead.UNREACHABLE_LOGIT for a in legal)
+    print(f"{CHECK} All {len(legal)} legal moves map to predicted logits")
+    
+    path = "test_conv_head.pt"
+    torch.save(model.state_dict(), path)
+    loaded, arch = load_inference_model(path)
+    os.remove(path)
+    assert arch == "generic" and loaded.config.policy_head == "conv"
+    print(f"{CHECK} Conv-head checkpoint detected and loaded")
+    
+    return True
+
+
+def test_flat_checkpoint():
+    """Flat checkpoints round-trip both architectures and are cached per process."""
+    print("\nTesting flat checkpoints...")
+    
+    import torch
+    from alphazero import create_xiangqi_net, load_inference_model
+    from alphazero.checkpoint import is_flat, save_flat
+    from alphazero.registry import cached_model
+    from xq.nn import XQNet
+    
+    x = torch.randn(2, 15, 10, 9)
+    for name, model in (("legacy", XQNet().eval()), ("generic", create_xiangqi_net("conv").eval())):
+        path = f"test_flat_{name}.bin"
+        save_flat(model, path)
+        assert is_flat(path)
+        loaded, arch = load_inference_model(path)
+        with torch.no_grad():
+            assert arch == name
+            assert torch.equal(model(x)[0], loaded(x)[0])
+        assert cached_model(path) is cached_model(path)
+        os.remove(path)
+        print(f"{CHECK} {name} flat checkpoint loads with identical outputs")
+    
+    return True
+
+
+def test_export_model():
+    """export_model with BN folding, int8 quantisation and channels-last matches the float model."""
+    print("\nTesting inference export...")
+    
+    import tempfile
+    import torch
+    from alphazero import create_xiangqi_net, load_inference_model
+    from alphazero.export import export_model, fold_batchnorm, read_export_metadata
+    from alphazero.precision import calibration_inputs
+    
+    torch.manual_seed(0)
+    model = create_xiangqi_net(hidden_channels=16, num_res_blocks=2)
+    inputs = calibration_inputs(64)
+    model.train()
+    with torch.no_grad():
+        model(inputs)  # non-trivial BatchNorm running statistics to fold
+    model.eval()
+    folded = fold_batchnorm(model)
+    assert not any(isinstance(m, torch.nn.BatchNorm2d) for m in folded.modules())
+    with torch.no_grad():
+        (ref_p, ref_v), (p, v) = model(inputs), folded(inputs)
+    assert torch.allclose(ref_p, p, atol=1e-4) and torch.allclose(ref_v, v, atol=1e-5)
+    print(f"{CHECK} fold_batchnorm removes every BatchNorm and keeps the outputs")
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        for options in ({}, {"channels_last": True}, {"quantize": True}, {"quantize": True, "channels_last": True}):
+            path = os.path.join(tmp, "net.pt")
+            meta = export_model(model, path, check_inputs=inputs, **options)
+            acc = meta["accuracy"]
+            assert meta["quantize"] == options.get("quantize", False) and meta["channels_last"] == options.get("channels_last", False)
+            assert acc["top1_agreement"] >= 0.9 and acc["value_max_abs"] <= 0.05
+            if not options.get("quantize"):
+                assert acc["top1_agreement"] == 1.0 and acc["value_max_abs"] < 1e-4
+            loaded, arch = load_inference_model(path)
+            assert arch == "generic" and read_export_metadata(path) == meta
+            with torch.no_grad():
+                logits, value = loaded(inputs)
+            assert logits.shape == ref_p.shape and value.shape == ref_v.shape
+            print(f"{CHECK} Export {options or 'fold_bn'}: top-1 {acc['top1_agreement']:.2f}, value error {acc['value_max_abs']:.1e}")
+        
+        path = os.path.join(tmp, "refused.pt")
+        try:
+            export_model(model, path, quantize=True, check_inputs=inputs, max_value_error=0.0)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError("an export failing its accuracy check was saved")
+        assert not os.path.exists(path)
+        print(f"{CHECK} An export failing the accuracy check raises and writes nothing")
+    
+    return True
+
+
+def test_model_registry():
+    """ModelRegistry keeps the most recently used models, reloads changed files and bumps versions."""
+    print("\nTesting model registry...")
+    
+    import tempfile
+    import torch
+    from alphazero import create_xiangqi_net
+    from alphazero.registry import ModelRegistry
+    
+    registry = ModelRegistry(capacity=2, warmup=False)
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = [os.path.join(tmp, f"m{i}.pt") for i in range(3)]
+        for path in paths:
+            torch.save(create_xiangqi_net(hidden_channels=8, num_res_blocks=1).state_dict(), path)
+        a, b = registry.get(paths[0]), registry.get(paths[1])
+        assert registry.get(paths[0]) is a  # a is now the most recently used
+        registry.get(paths[2])
+        assert registry.peek(paths[1]) is None and registry.peek(paths[0]) is a
+        assert [e.path for e in registry.entries()] == [paths[0], paths[2]]
+        print(f"{CHECK} Capacity 2: the least recently used model is evicted")
+        
+        assert a.version == 1 and a.arch == "generic"
+        torch.save(create_xiangqi_net(hidden_channels=16, num_res_blocks=1).state_dict(), paths[0])
+        os.utime(paths[0], (a.mtime + 10, a.mtime + 10))
+        a2 = registry.get(paths[0])
+        assert a2 is not a and a2.version == 2 and a2.info["architecture"]["channels"] == 16
+        with torch.no_grad():
+            a.model(torch.zeros(1, 15, 10, 9))  # a request still holding the old entry keeps working
+        print(f"{CHECK} A changed file is reloaded on next use as version 2")
+        
+        a3 = registry.reload(paths[0])
+        assert a3.version == 3 and registry.get(paths[0]) is a3
+        assert registry.evict(paths[0]) and registry.peek(paths[0]) is None
+        assert registry.get(paths[0]).version == 4
+        print(f"{CHECK} reload() and evict-then-load bump the version")
+    
+    return True
+
+
+def test_reduced_precision():
+    """bf16 inference passes calibration; a mode over the thresholds is refused."""
+    print("\nTesting reduced-precision inference...")
+    
+    import time
+    import torch
+    from alphazero import with_precision
+    from alphazero.precision import calibration_inputs
+    from xq.nn import XQNet
+    
+    model = XQNet().eval()
+    inputs = calibration_inputs(32)
+    bf16, report = with_precision(model, "bf16", inputs)
+    with torch.no_grad():
+        logits, value = bf16(inputs)
+    assert logits.dtype == torch.float32 and value.shape == (32,)
+    print(f"{CHECK} bf16: policy KL {report['policy_kl']:.2e}, value MAE {report['value_mae']:.2e}")
+    
+    try:
+        with_precision(model, "int8", inputs, max_value_mae=0.0)
+        return False
+    except ValueError:
+        print(f"{CHECK} int8 refused at a zero value-error threshold")
+    
+    try:
+        with_precision(model, "bf16", inputs, max_policy_kl=0.0, max_value_mae=0.0)
+        return False
+    except ValueError:
+        print(f"{CHECK} bf16 refused at zero thresholds")
+    
+    t0 = time.perf_counter()
+    with_precision(model, "bf16")  # default sample, built once per process
+    assert calibration_inputs() is calibration_inputs()
+    print(f"{CHECK} Default calibration sample built and checked in {time.perf_counter() - t0:.1f}s")
+    
+    return True
+
+
+def test_value_only_samples():
+    """Fast-search self-play records carry no pi, and the trainer skips their policy loss."""
+    print("\nTesting value-only samples...")
+    
+    import numpy as np
+    import torch
+    from alphazero import Trainer, TrainerConfig, create_xiangqi_net
+    from xq.encoding import planes_to_tensor
+    from xq.selfplay import SelfPlayConfig, self_play_game
+    
+    game = self_play_game(SelfPlayConfig(sims=8, fast_sims=4, full_search_prob=0.0, max_moves=6))
+    records = game["records"]
+    assert records and all(r["has_pi"] is False and "pi" not in r for r in records)
+    print(f"{CHECK} {len(records)} fast-search records with has_pi=False and no pi")
+    
+    torch.manual_seed(0)
+    model = create_xiangqi_net(hidden_channels=16, num_res_blocks=1)
+    samples = [(planes_to_tensor(r["planes"]).numpy(), None, float(r["z"])) for r in records]
+    policy_before = model.p_fc.weight.detach().clone()
+    value_before = model.v_fc2.weight.detach().clone()
+    Trainer(model, TrainerConfig(epochs=2, batch_size=4, weight_decay=0.0)).train_step(samples)
+    assert torch.equal(model.p_fc.weight, policy_before)
+    assert not torch.equal(model.v_fc2.weight, value_before)
+    print(f"{CHECK} Value head trained, policy head untouched without pi targets")
+    
+    pi = np.zeros(8100, dtype=np.float32)
+    pi[0] = 1.0
+    model = create_xiangqi_net(hidden_channels=16, num_res_blocks=1)
+    policy_before = model.p_fc.weight.detach().clone()
+    Trainer(model, TrainerConfig(epochs=1, batch_size=8, weight_decay=0.0)).train_step(samples + [(samples[0][0], pi.tolist(), 0.0)])
+    assert not torch.equal(model.p_fc.weight, policy_before)
+    print(f"{CHECK} Mixed batches still train the policy on samples with pi")
+    
+    return True
+
+
+def test_distillation():
+    """A small conv-head student moves towards its teacher's policy and value."""
+    print("\nTesting distillation...")
+    
+    import torch
+    from alphazero import Trainer, TrainerConfig, create_xiangqi_net
+    from alphazero.precision import calibration_inputs
+    from xq.nn import XQNet
+    
+    torch.manual_seed(0)
+    teacher = XQNet().eval()
+    teacher.p_fc.weight.data.mul_(20.0)  # a peaked policy, like a trained network's
+    student = create_xiangqi_net("conv", hidden_channels=16, num_res_blocks=1)
+    inputs = calibration_inputs(32)
+    samples = [(x.numpy(), None, 0.0) for x in inputs]
+    
+    def distance():
+        with torch.no_grad():
+            t_logits, t_v = teacher(inputs)
+            s_logits, s_v = student.eval()(inputs)
+        reachable = s_logits[0] > -1e3  # the conv head's predictable actions
+        t_p = torch.softmax(t_logits.masked_fill(~reachable, -1e9), dim=-1)
+        kl = (t_p * (t_p.clamp_min(1e-12).log() - torch.log_softmax(s_logits, dim=-1))).sum(dim=-1).mean()
+        return float(kl), float((t_v - s_v).abs().mean())
+    
+    before = distance()
+    Trainer(student, TrainerConfig(epochs=20, batch_size=8, lr=1e-3), teacher=teacher).train_step(samples)
+    after = distance()
+    assert after[0] < before[0] and after[1] < before[1]
+    print(f"{CHECK} Policy KL {before[0]:.3f} -> {after[0]:.3f}, value MAE {before[1]:.3f} -> {after[1]:.3f}")
+    
+    return True
+
+
+def test_ponder():
+    """Server pondering: the tree for the predicted reply is reused; cancel and the idle sweep stop it."""
+    print("\nTesting pondering...")
+    
+    import time
+    from fastapi.testclient import TestClient
+    import api.server as server
+    
+    server.ROOT_PARALLEL_WORKERS = 1  # no root-parallel pool for this test
+    with TestClient(server.app) as client:
+        game = client.post("/api/games", json={}).json()
+        gid = game["game_id"]
+        first = game["legal_moves"][0]
+        body = {"engine": "mcts", "sims": 50, "ponder": True, "ponder_sims": 10 ** 6, "ponder_ms": 500}
+        reply = client.post(f"/api/games/{gid}/human-ai", json={**body, "from_sq": first["from"], "to_sq": first["to"]})
+        assert reply.status_code == 200 and reply.json()["ai"] is not None
+        ponder = server._ponders[gid]
+        ponder.thread.join(timeout=10)
+        assert not ponder.thread.is_alive() and ponder.root.visits > 0
+        slot = max(range(len(ponder.root.N)), key=ponder.root.N.__getitem__)
+        predicted = ponder.root.actions[slot]
+        pondered = ponder.root.children[predicted].visits
+        print(f"{CHECK} Pondered {ponder.root.visits} simulations on the reply position")
+        
+        body["ponder_ms"] = None  # the next ponder runs until it is stopped
+        reply = client.post(f"/api/games/{gid}/human-ai", json={**body, "sims": pondered + 10, "from_sq": predicted // 90, "to_sq": predicted % 90})
+        search = reply.json()["search"]
+        assert search["reused_visits"] == pondered > 1
+        assert search["simulations"] == 10
+        print(f"{CHECK} Predicted move played: {pondered} pondered visits reused, 10 searched")
+        
+        ponder = server._ponders[gid]
+        time.sleep(0.2)
+        assert ponder.thread.is_alive()
+        assert client.post(f"/api/games/{gid}/undo").status_code == 200
+        assert not ponder.thread.is_alive() and gid not in server._ponders
+        print(f"{CHECK} Undo cancels and joins the running ponder")
+        
+        gid = client.post("/api/games", json={}).json()["game_id"]
+        client.post(f"/api/games/{gid}/human-ai", json={**body, "from_sq": first["from"], "to_sq": first["to"]})
+        ponder = server._ponders[gid]
+        server._sweep_idle_ponders()
+        assert ponder.thread.is_alive()  # still active
+        ponder.last_active -= server.PONDER_IDLE_S + 1
+        server._sweep_idle_ponders()
+        assert not ponder.thread.is_alive() and gid not in server._ponders
+        print(f"{CHECK} The idle sweep stops and drops an abandoned ponder")
+    
+    return True
+
+
+def test_root_parallel():
+    """Root-parallel search sums worker roots and survives a worker dying mid-search."""
+    print("\nTesting root-parallel search...")
+    
+    import os
+    import random
+    import signal
+    import threading
+    from xq import GameState, constants as C
+    from xq.mcts import MCTS
+    from xq.parallel import RootParallelMCTS, _root_stats, merge_roots
+    from xq.selfplay import default_policy_fn
+    
+    state = GameState()
+    state.setup_starting_position()
+    legal = {m.from_sq * C.NUM_SQUARES + m.to_sq for m in state.generate_legal_moves()}
+    stats = []
+    for seed in (1, 2):
+        random.seed(seed)
+        mcts = MCTS()
+        stats.append(_root_stats(mcts.run(state, default_policy_fn(), num_simulations=30), mcts.last_info))
+    merged = merge_roots(stats)
+    for a, n in zip(merged.actions, merged.N):
+        assert n == sum(st["N"][st["actions"].index(a)] for st in stats)
+    assert merged.visits == 60 and MCTS().best_action(merged) in legal
+    print(f"{CHECK} merge_roots sums visit counts per action")
+    
+    pool = RootParallelMCTS(2, default_policy_fn)
+    try:
+        root = pool.run(state, num_simulations=40)
+        assert root.visits == pool.last_info.simulations == 40
+        assert MCTS().best_action(root) in legal
+        print(f"{CHECK} 2 workers: {root.visits} merged visits, legal best move")
+        
+        root = pool.run(state, num_simulations=41)
+        assert root.visits == pool.last_info.simulations == 41
+        root = pool.run(state, num_simulations=1)
+        assert root.visits == 1
+        print(f"{CHECK} The budget is split exactly (41 and 1 simulations)")
+        
+        hung = pool._procs[1]
+        os.kill(hung.pid, signal.SIGSTOP)
+        root = pool.run(state, num_simulations=10 ** 6, time_limit_s=0.5, grace_s=0.5)
+        assert root.visits > 0 and not hung.is_alive()
+        root = pool.run(state, num_simulations=20)
+        assert root.visits == 20 and pool._procs[1] is not hung and pool._procs[1].is_alive()
+        print(f"{CHECK} A worker hung past a time-limited deadline is terminated, then replaced")
+        
+        killer = threading.Timer(1.0, pool._procs[1].terminate)
+        killer.start()
+        root = pool.run(state, num_simulations=10 ** 6, time_limit_s=2.0)
+        killer.join()
+        assert root.visits == pool.last_info.simulations > 0
+        assert MCTS().best_action(root) in legal
+        root = pool.run(state, num_simulations=20)  # the dead worker was replaced
+        assert root.visits == 20 and pool._procs[1].is_alive()
+        print(f"{CHECK} A worker killed mid-search is skipped, then replaced")
+    finally:
+        pool.close()
+    
+    return True
+
+
+def test_inference_server():
+    """Shared inference server: concurrent clients, reply versions and hot swaps."""
+    print("\nTesting inference server...")
+    
+    import tempfile
+    import threading
+    import numpy as np
+    import torch
+    from alphazero import create_xiangqi_net, load_inference_model
+    from xq import GameState
+    from xq.encoding import states_to_tensor
+    from xq.inference import InferenceServer
+    
+    state = GameState()
+    state.setup_starting_position()
+    moved = state.clone()
+    moved.apply_move(moved.generate_legal_moves()[0])
+    states = [[state], [moved, state]]
+    
+    def expected(path, batch):
+        model = load_inference_model(path)[0]
+        with torch.no_grad():
+            logits, values = model(states_to_tensor(batch))
+        return torch.softmax(logits, dim=-1).numpy(), values.numpy()
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = []
+        for seed in (0, 1):
+            torch.manual_seed(seed)
+            paths.append(os.path.join(tmp, f"m{seed}.pt"))
+            torch.save(create_xiangqi_net(hidden_channels=16, num_res_blocks=1).state_dict(), paths[-1])
+        server = InferenceServer(2, model_path=paths[0], max_wait_ms=50.0)
+        try:
+            replies = [None, None]
+            
+            def ask(i):
+                replies[i] = server.clients[i].evaluate(states[i])
+            
+            threads = [threading.Thread(target=ask, args=(i,)) for i in range(2)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            for i in range(2):
+                policies, values = replies[i]
+                want_p, want_v = expected(paths[0], states[i])
+                assert np.allclose(policies, want_p, atol=1e-5) and np.allclose(values, want_v, atol=1e-5)
+                assert server.clients[i].version == 0
+            print(f"{CHECK} 2 clients answered together with version 0")
+            
+            assert server.swap(paths[1]) == 1
+            policies, _ = server.clients[0].evaluate(states[0])
+            assert server.clients[0].version == 1 and np.allclose(policies, expected(paths[1], states[0])[0], atol=1e-5)
+            try:
+                server.swap(os.path.join(tmp, "missing.pt"))
+                return False
+            except RuntimeError:
+                pass
+            policies, _ = server.clients[1].evaluate(states[0])
+            assert server.version == server.clients[1].version == 1
+            assert np.allclose(policies, expected(paths[1], states[0])[0], atol=1e-5)
+            print(f"{CHECK} Good swap serves version 1; a bad swap raises and keeps it")
+        finally:
+            server.close()
+    
+    return True
+
+
+def test_selfplay_pool():
+    """Worker pool streams every game to rotating shards; a stopped run plays no more."""
+    print("\nTesting self-play worker pool...")
+    
+    import json
+    import tempfile
+    from xq.selfplay import SelfPlayConfig
+    from xq.selfplay_pool import SelfPlayPool
+    
+    pool = SelfPlayPool(SelfPlayConfig(engine="mcts", sims=4, max_moves=6), workers=2, seed=1)
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            seen = []
+            run = pool.run(5, os.path.join(tmp, "sp.jsonl"), games_per_shard=2, progress=lambda p: seen.append(p.games_done))
+            assert run.games == 5 and not run.errors and seen == [1, 2, 3, 4, 5]
+            lines = [json.loads(line) for path in run.shards for line in open(path, encoding="utf-8")]
+            assert len(run.shards) == 3 and len(lines) == 5 and run.positions == sum(len(g["records"]) for g in lines)
+            print(f"{CHECK} 5 games from 2 workers in {len(run.shards)} shards")
+            
+            pool.request_stop()
+            run = pool.run(4, os.path.join(tmp, "stopped.jsonl"))
+            assert run.stopped and run.games == 0
+            assert pool.run(1, os.path.join(tmp, "again.jsonl")).games == 1
+            print(f"{CHECK} request_stop skips pending games; the next run plays again")
+            
+            victims = []
+            
+            def kill(p):  # the other worker is most likely mid-game
+                if p.games_done == 1:
+                    victims.append(next(q for w, q in pool._procs.items() if w != p.worker))
+                    victims[0].terminate()
+            
+            run = pool.run(4, os.path.join(tmp, "killed.jsonl"), progress=kill)
+            assert run.games == 4 and not run.errors and not victims[0].is_alive() and pool.workers == 2
+            print(f"{CHECK} A killed worker is replaced and its game replayed")
+            
+            for idle in list(pool._procs.values()):  # between runs, waiting for a task
+                idle.terminate()
+                idle.join()
+            assert pool.run(2, os.path.join(tmp, "idle.jsonl")).games == 2
+            print(f"{CHECK} Workers killed while waiting for a task do not stall their successors")
+    finally:
+        pool.close()
+    
+    return True
+
+
 def main():
     """Run all tests."""
     print("=" * 60)
@@ -259,9 +1254,32 @@ def main():
         ("Import Test", test_imports),
         ("Legacy Framework", test_legacy_framework),
         ("Generic Framework", test_generic_framework),
+        ("GenericMCTS Paths", test_generic_mcts_paths),
+        ("Batched Game API", test_batch_game_api),
         ("Model Compatibility", test_model_compatibility),
         ("GameInterface", test_game_interface),
         ("Cannon Capture", test_cannon_legal_capture),
+        ("Lazy Child Nodes", test_lazy_children),
+        ("In-Place Traversal", test_inplace_traversal),
+        ("MCTS Solver", test_mcts_solver),
+        ("Smart Stop", test_smart_stop),
+        ("Pipelined MCTS", test_pipelined_mcts),
+        ("Search Stats", test_search_stats),
+        ("Gumbel Solved Root", test_gumbel_solved_root),
+        ("Adaptive Budget Volatility", test_sim_allocator_volatility),
+        ("Adaptive Search", test_run_adaptive),
+        ("Compact Action Space", test_compact_action_space),
+        ("Conv Policy Head", test_conv_policy_head),
+        ("Flat Checkpoint", test_flat_checkpoint),
+        ("Inference Export", test_export_model),
+        ("Model Registry", test_model_registry),
+        ("Reduced Precision", test_reduced_precision),
+        ("Value-Only Samples", test_value_only_samples),
+        ("Distillation", test_distillation),
+        ("Pondering", test_ponder),
+        ("Inference Server", test_inference_server),
+        ("Root-Parallel Search", test_root_parallel),
+        ("Self-Play Pool", test_selfplay_pool),
     ]
     
     passed = 0
@@ -19,12 +19,15 @@ import torch.optim as optim
 from torch.utils.data import Dataset, DataLoader
 
 from xq.nn import XQNet
-from xq import constants as C
+from xq.encoding import planes_to_tensor
+from xq.policy import NUM_ACTIONS, NUM_COMPACT_ACTIONS, pi_to_compact
 
 
 class XQDataset(Dataset):
-	def __init__(self, records: List[Dict]):
+	def __init__(self, records: List[Dict], compact: bool = False):
+		# pi records are keyed by 8100-space index; compact targets are remapped
 		self.records = records
+		self.compact = compact
 
 	def __len__(self):
 		return len(self.records)
@@ -36,18 +39,15 @@ class XQDataset(Dataset):
 		pi = rec.get('pi', {})
 		z = rec['z']
 		# Convert planes to tensor [15, 10, 9]
-		tensor_planes = torch.zeros((15, C.RANKS, C.FILES), dtype=torch.float32)
-		for c in range(15):
-			for sq in range(C.NUM_SQUARES):
-				r = C.rank_of(sq)
-				f = C.file_of(sq)
-				tensor_planes[c, r, f] = float(planes[c][sq])
+		tensor_planes = planes_to_tensor(planes)
 		# Convert pi dict to dense array
-		pi_tensor = torch.zeros(C.NUM_SQUARES * C.NUM_SQUARES, dtype=torch.float32)
-		for k, v in pi.items():
+		pi_tensor = torch.zeros(NUM_COMPACT_ACTIONS if self.compact else NUM_ACTIONS, dtype=torch.float32)
+		for k, v in (pi_to_compact(pi) if self.compact else pi).items():
 			pi_tensor[int(k)] = float(v)
 		z_tensor = torch.tensor(float(z), dtype=torch.float32)
-		return tensor_planes, pi_tensor, z_tensor
+		# fast-search records (playout cap randomisation) carry no policy target
+		has_pi = torch.tensor(1.0 if (pi and rec.get('has_pi', True)) else 0.0, dtype=torch.float32)
+		return tensor_planes, pi_tensor, z_tensor, has_pi
 
 
 def load_jsonl(path: str) -> List[Dict]:
@@ -67,6 +67,8 @@ def main():
 	parser.add_argument("--batch_size", type=int, default=32)
 	parser.add_argument("--lr", type=float, default=1e-3)
 	parser.add_argument("--resume", type=str, default=None, help="Resume from checkpoint")
+	parser.add_argument("--compact_actions", action="store_true",
+	                    help="Policy over the compact action space (ignored when resuming)")
 	args = parser.parse_args()
 
 	device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
@@ -78,29 +80,33 @@ def main():
 		print("No data to train on!")
 		return
 
-	dataset = XQDataset(records)
-	loader = DataLoader(dataset, batch_size=args.batch_size, shuffle=True)
-
-	model = XQNet().to(device)
+	model = XQNet(compact=args.compact_actions)
 	if args.resume and os.path.exists(args.resume):
 		print(f"Resuming from {args.resume}")
-		model.load_state_dict(torch.load(args.resume, map_location=device))
+		state_dict = torch.load(args.resume, map_location="cpu")
+		model = XQNet(compact=state_dict["p_fc.weight"].shape[0] == NUM_COMPACT_ACTIONS)
+		model.load_state_dict(state_dict)
+	model = model.to(device)
+
+	dataset = XQDataset(records, compact=model.p_fc.out_features == NUM_COMPACT_ACTIONS)
+	loader = DataLoader(dataset, batch_size=args.batch_size, shuffle=True)
 
 	optimizer = optim.Adam(model.parameters(), lr=args.lr, weight_decay=1e-4)
-	criterion_policy = nn.CrossEntropyLoss()
+	criterion_policy = nn.CrossEntropyLoss(reduction="none")
 	criterion_value = nn.MSELoss()
 
 	for epoch in range(args.epochs):
 		model.train()
 		total_loss = 0.0
-		for planes, pi_target, z_target in loader:
+		for planes, pi_target, z_target, has_pi in loader:
 			planes = planes.to(device)
 			pi_target = pi_target.to(device)
 			z_target = z_target.to(device)
+			has_pi = has_pi.to(device)
 
 			optimizer.zero_grad()
 			logits, v = model(planes)
-			loss_p = criterion_policy(logits, pi_target)
+			loss_p = (criterion_policy(logits, pi_target) * has_pi).sum() / has_pi.sum().clamp(min=1.0)
 			loss_v = criterion_value(v, z_target)
 			loss = loss_p + loss_v
 			loss.backward()
@@ -17,6 +17,7 @@ import torch
 from torch.utils.data import DataLoader
 
 from alphazero import Trainer, TrainerConfig, AlphaZeroDataset, create_xiangqi_net
+from alphazero.export import xiangqi_net_for
 from xq.game_adapter import XiangqiGame
 
 
@@ -43,6 +44,8 @@ def main():
 	parser.add_argument("--batch_size", type=int, default=32)
 	parser.add_argument("--lr", type=float, default=1e-3)
 	parser.add_argument("--resume", type=str, default=None, help="Resume from checkpoint")
+	parser.add_argument("--policy_head", default="dense", choices=["dense", "conv"],
+	                    help="Policy head: dense from-to Linear or convolutional move planes")
 	args = parser.parse_args()
 
 	device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
@@ -52,7 +55,10 @@ def main():
 	# Initialize game
 	if args.game == "xiangqi":
 		game = XiangqiGame()
-		model = create_xiangqi_net().to(device)
+		model = create_xiangqi_net(args.policy_head)
+		if args.resume and os.path.exists(args.resume):
+			model = xiangqi_net_for(torch.load(args.resume, map_location="cpu"))[0]
+		model = model.to(device)
 	else:
 		raise ValueError(f"Unknown game: {args.game}")
 
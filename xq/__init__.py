@@ -14,7 +14,7 @@ from .zobrist import Zobrist
 from .state import GameState
 from .policy import legal_move_mask
 from .search.alpha_beta import alphabeta_search, TranspositionTable
-from .mcts import MCTS
+from .mcts import MCTS, GumbelMCTS, PipelinedMCTS
 
 __all__ = [
 	"constants",
@@ -25,6 +25,8 @@ __all__ = [
 	"alphabeta_search",
 	"TranspositionTable",
     "MCTS",
+	"GumbelMCTS",
+	"PipelinedMCTS",
 ]
 
 
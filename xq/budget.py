@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+from .state import GameState
+from .mcts import MCTS, Node, PolicyFn
+
+
+@dataclass
+class BudgetConfig:
+	"""Adaptive simulation budget. Budgets average out to mean_sims over a game."""
+	mean_sims: int = 200
+	min_sims: int = 16
+	max_sims: int = 800
+	typical_legal: int = 40  # legal move count that gets a neutral factor
+	check_factor: float = 1.5  # side to move is in check
+	volatility_gain: float = 2.0  # extra factor per unit of value swing
+
+
+class SimAllocator:
+	"""Scales the per-move simulation budget from cheap root signals:
+	legal move count, prior entropy, whether the side to move is in check, and how
+	far the network value at the root moved from the previous search's value (both
+	taken from the current side to move's point of view).
+	Forced moves (a single legal reply) get no search at all.
+
+	Keep one allocator per game: it carries the previous search value and the
+	running mean factor used to hold the average budget at mean_sims.
+	"""
+
+	def __init__(self, config: Optional[BudgetConfig] = None) -> None:
+		self.config = config or BudgetConfig()
+		self._factor_sum = 0.0
+		self._factor_count = 0
+		self._last_value: Optional[float] = None
+		self._last_side: Optional[int] = None  # side to move when _last_value was searched
+
+	def reset(self) -> None:
+		self._factor_sum = 0.0
+		self._factor_count = 0
+		self._last_value = None
+		self._last_side = None
+
+	def factor(self, root: Node, state: GameState, root_value: Optional[float] = None) -> float:
+		cfg = self.config
+		n = len(root.actions)
+		f_legal = min(1.5, max(0.5, math.sqrt(n / cfg.typical_legal)))
+		# Normalised prior entropy: a dominant prior needs less search
+		h = -sum(p * math.log(p) for p in root.P if p > 0)
+		f_entropy = 0.5 + h / math.log(n)
+		f_check = cfg.check_factor if state.is_in_check(state.side_to_move) else 1.0
+		f_vol = 1.0
+		if root_value is not None and self._last_value is not None:
+			# the previous search may have been for either side (e.g. after an undo or
+			# when one allocator serves both players), so flip it into this side's POV
+			last = self._last_value if self._last_side == state.side_to_move else -self._last_value
+			f_vol = min(3.0, 1.0 + cfg.volatility_gain * abs(root_value - last))
+		return f_legal * f_entropy * f_check * f_vol
+
+	def allocate(self, root: Node, state: GameState, root_value: Optional[float] = None) -> int:
+		"""Simulations to spend on this (expanded) root; 0 for forced moves."""
+		if len(root.actions) <= 1:
+			return 0
+		f = self.factor(root, state, root_value)
+		self._factor_sum += f
+		self._factor_count += 1
+		mean_f = self._factor_sum / self._factor_count
+		cfg = self.config
+		sims = int(round(cfg.mean_sims * f / mean_f))
+		return min(cfg.max_sims, max(cfg.min_sims, sims))
+
+	def observe(self, root: Node, state: GameState, root_value: Optional[float] = None) -> None:
+		"""Record the searched root value (POV of state's side to move) for the next search."""
+		if root.visits > 0:
+			self._last_value = sum(root.W) / root.visits
+		else:
+			self._last_value = root_value
+		self._last_side = state.side_to_move
+
+
+def run_adaptive(
+	mcts: MCTS,
+	state: GameState,
+	policy_fn: PolicyFn,
+	allocator: SimAllocator,
+	time_limit_s: Optional[float] = None,
+	add_noise: bool = True,
+	search: Optional[Callable[[int], Node]] = None,
+) -> Node:
+	"""Expand the root, size the budget with the allocator, then search that many
+	simulations on the same root. mcts.last_info describes the second pass.
+	search(sims), if given, runs the sized search instead and returns its root
+	(e.g. a root-parallel search); it must leave its SearchInfo in mcts.last_info.
+	GumbelMCTS continues from the expanded root too (it keeps an unvisited root and
+	draws its Gumbel sample then), so the root is evaluated once either way.
+	"""
+	root = mcts.run(state, policy_fn, num_simulations=0, add_noise=add_noise)
+	root_value = mcts.last_info.root_value
+	sims = allocator.allocate(root, state, root_value)
+	if sims > 0:
+		if search is not None:
+			root = search(sims)
+		else:
+			root = mcts.run(state, policy_fn, num_simulations=sims, time_limit_s=time_limit_s, root=root)
+	mcts.last_info.root_value = root_value
+	allocator.observe(root, state, root_value)
+	return root
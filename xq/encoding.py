@@ -0,0 +1,85 @@
+"""Board -> network input encoding shared by xq.nn, XiangqiGame and the datasets.
+
+Planes (float32, NUM_PLANES x RANKS x FILES), as in GameState.to_planes:
+- 0..6: RED piece types 1..7
+- 7..13: BLACK piece types 1..7
+- 14: side to move (all 1 if RED to move, else 0)
+
+Squares are rank-major (index = rank * FILES + file), so a 90-entry plane
+reshapes directly to [RANKS, FILES]. All encoders take batches and can write
+into a caller-provided buffer (numpy array or CPU torch tensor).
+"""
+from __future__ import annotations
+
+from typing import Any, Sequence
+
+import numpy as np
+
+from . import constants as C
+
+
+NUM_PLANES = 15
+
+# Plane index for each piece code (offset by PT_MAX so codes -7..7 index 0..14); -1 = empty
+_PLANE_OF_PIECE = np.full(2 * C.PT_MAX + 1, -1, dtype=np.int64)
+for _pt in range(1, C.PT_MAX + 1):
+	_PLANE_OF_PIECE[C.make_piece(C.RED, _pt) + C.PT_MAX] = _pt - 1
+	_PLANE_OF_PIECE[C.make_piece(C.BLACK, _pt) + C.PT_MAX] = 7 + _pt - 1
+
+
+def _buffer(out: Any, n: int) -> np.ndarray:
+	"""First n entries of out (allocated if None) as a zeroed numpy view."""
+	if out is None:
+		return np.zeros((n, NUM_PLANES, C.RANKS, C.FILES), dtype=np.float32)
+	arr = out.numpy() if hasattr(out, "numpy") else out
+	if arr.shape[0] < n or arr.shape[1:] != (NUM_PLANES, C.RANKS, C.FILES) or arr.dtype != np.float32:
+		raise ValueError(f"buffer of shape {tuple(arr.shape)} / {arr.dtype} cannot hold {n} encoded boards")
+	arr = arr[:n]
+	arr.fill(0.0)
+	return arr
+
+
+def encode_boards(boards: Any, side_to_move: Any, out: Any = None) -> np.ndarray:
+	"""Encode boards [N, 90] (signed piece codes) with side_to_move [N] into
+	float32 [N, NUM_PLANES, RANKS, FILES]. With out, writes into its first N entries
+	and returns that view."""
+	boards = np.asarray(boards, dtype=np.int64).reshape(-1, C.NUM_SQUARES)
+	n = boards.shape[0]
+	arr = _buffer(out, n)
+	flat = arr.reshape(n, NUM_PLANES, C.NUM_SQUARES)
+	rows, squares = np.nonzero(boards)
+	flat[rows, _PLANE_OF_PIECE[boards[rows, squares] + C.PT_MAX], squares] = 1.0
+	flat[:, 14, :] = (np.asarray(side_to_move).reshape(n) == C.RED)[:, None]
+	return arr
+
+
+def encode_states(states: Sequence[Any], out: Any = None) -> np.ndarray:
+	"""Encode GameStates into float32 [N, NUM_PLANES, RANKS, FILES]."""
+	boards = np.array([s.board for s in states], dtype=np.int64).reshape(len(states), C.NUM_SQUARES)
+	stm = np.fromiter((s.side_to_move for s in states), dtype=np.int64, count=len(states))
+	return encode_boards(boards, stm, out)
+
+
+def planes_to_array(planes: Any, out: Any = None) -> np.ndarray:
+	"""Stored to_planes() lists ([15][90], or a batch [N][15][90]) as float32
+	[N, NUM_PLANES, RANKS, FILES]."""
+	src = np.asarray(planes, dtype=np.float32).reshape(-1, NUM_PLANES, C.RANKS, C.FILES)
+	if out is None:
+		return src
+	arr = _buffer(out, src.shape[0])
+	arr[...] = src
+	return arr
+
+
+def states_to_tensor(states: Sequence[Any], out: Any = None):
+	"""encode_states as a torch tensor sharing memory with the numpy result (or out)."""
+	import torch  # type: ignore
+	return torch.from_numpy(encode_states(states, out))
+
+
+def planes_to_tensor(planes: Any, out: Any = None):
+	"""planes_to_array for one sample ([15][90] -> [15, RANKS, FILES]) or a batch, as torch."""
+	import torch  # type: ignore
+	src = np.asarray(planes, dtype=np.float32)
+	arr = planes_to_array(src, out)
+	return torch.from_numpy(arr[0] if src.ndim == 2 else arr)
@@ -8,6 +8,7 @@ from . import constants as C
 from .state import GameState
 from .move import Move
 from .policy import move_index
+from .encoding import encode_states
 
 
 class XiangqiGame(GameInterface):
@@ -43,6 +44,23 @@ class XiangqiGame(GameInterface):
 				return new_state
 		raise ValueError(f"Illegal action {action}")
 	
+	def apply_action(self, state: GameState, action: int) -> None:
+		state.apply_move(self.action_to_move(state, action))
+	
+	def undo_action(self, state: GameState) -> None:
+		state.undo_move()
+	
+	def copy_state(self, state: GameState) -> GameState:
+		return state.clone()
+	
+	def action_to_move(self, state: GameState, action: int) -> Move:
+		"""Decode a from-to index into a Move from the board, without generating legal
+		moves. The action is assumed legal in state."""
+		from_sq = action // C.NUM_SQUARES
+		to_sq = action % C.NUM_SQUARES
+		captured = state.board[to_sq]
+		return Move.make(from_sq, to_sq, C.piece_type(state.board[from_sq]), C.piece_type(captured) if captured != 0 else 0)
+	
 	def get_game_result(self, state: GameState) -> Optional[float]:
 		"""Return result from current player's POV."""
 		res = state.adjudicate_result()
@@ -62,15 +80,20 @@ class XiangqiGame(GameInterface):
 		return state.side_to_move
 	
 	def state_to_tensor(self, state: GameState) -> np.ndarray:
-		"""Return numpy array [C, H, W]."""
-		planes = state.to_planes()  # 15 x 90
-		tensor = np.zeros((15, C.RANKS, C.FILES), dtype=np.float32)
-		for c in range(15):
-			for sq in range(C.NUM_SQUARES):
-				r = C.rank_of(sq)
-				f = C.file_of(sq)
-				tensor[c, r, f] = float(planes[c][sq])
-		return tensor
+		"""Return numpy array [C, H, W] (same planes as GameState.to_planes)."""
+		return self.states_to_tensor([state])[0]
+	
+	def states_to_tensor(self, states: List[GameState]) -> np.ndarray:
+		"""Return float32 array [N, 15, H, W] (xq.encoding.encode_states)."""
+		return encode_states(states)
+	
+	def legal_action_masks(self, states: List[GameState]) -> np.ndarray:
+		masks = np.zeros((len(states), C.NUM_SQUARES * C.NUM_SQUARES), dtype=bool)
+		for i, s in enumerate(states):
+			codes = np.fromiter((m.code for m in s.generate_legal_moves()), dtype=np.int64)
+			# from-to index straight from the packed move bits
+			masks[i, (codes & 0x7F) * C.NUM_SQUARES + ((codes >> 7) & 0x7F)] = True
+		return masks
 	
 	def get_canonical_form(self, state: GameState, player: int) -> GameState:
 		"""Return state from player's perspective. For Xiangqi, no flip needed (asymmetric)."""
@@ -0,0 +1,204 @@
+from __future__ import annotations
+
+import multiprocessing as mp
+import threading
+import time
+from multiprocessing.connection import wait
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from . import constants as C
+
+
+def _build_model(model_factory: Optional[Callable[[], Any]], model_path: Optional[str], device: str, precision: str = "fp32"):
+	"""model_factory() with model_path's state dict, or without a factory whatever
+	load_inference_model finds at model_path (state dict, flat checkpoint or exported
+	artefact), converted to precision (alphazero.precision)."""
+	import torch  # type: ignore
+	from alphazero.precision import with_precision
+	if model_factory is None:
+		if model_path:
+			from alphazero.export import load_inference_model
+			return load_inference_model(model_path, map_location=device, precision=precision)[0]
+		from .nn import XQNet
+		model_factory = XQNet
+	model = model_factory()
+	if model_path:
+		model.load_state_dict(torch.load(model_path, map_location="cpu"))
+	return with_precision(model.to(device).eval(), precision)[0]
+
+
+def _server_main(
+	conns, control, model_factory, model_path, device: str, max_batch: int, max_wait_s: float, precision: str = "fp32"
+) -> None:
+	"""Serve evaluation requests from the client connections in dynamic batches.
+
+	A batch is closed when it holds max_batch positions or max_wait_s after its first
+	request arrived. Clients are synchronous, so each has at most one request queued.
+	"""
+	import torch  # type: ignore
+	from .encoding import encode_boards
+
+	model = _build_model(model_factory, model_path, device, precision)
+	version = 0
+	live = list(conns)
+	while live:
+		ready = wait(live + [control])
+		if control in ready:
+			msg = control.recv()
+			if msg[0] == "stop":
+				break
+			if msg[0] == "load":
+				_, path, new_version = msg
+				try:
+					model = _build_model(model_factory, path, device, precision)
+				except Exception as e:  # keep serving the current model
+					control.send(("error", f"failed to load {path}: {e!r}"))
+				else:
+					version = new_version
+					control.send(("loaded", version))
+			ready = [c for c in ready if c is not control]
+		requests: List[Tuple[Any, np.ndarray, np.ndarray]] = []
+		n = 0
+		deadline = None
+		while True:
+			for conn in ready:
+				try:
+					boards, stm = conn.recv()
+				except (EOFError, OSError):
+					live.remove(conn)
+					continue
+				requests.append((conn, boards, stm))
+				n += len(boards)
+			if not requests or n >= max_batch:
+				break
+			now = time.perf_counter()
+			if deadline is None:
+				deadline = now + max_wait_s
+			if now >= deadline:
+				break
+			waiting = [c for c in live if all(c is not r[0] for r in requests)]
+			if not waiting:
+				break
+			ready = wait(waiting, timeout=deadline - now)
+			if not ready:
+				break
+		if not requests:
+			continue
+		x = torch.from_numpy(encode_boards(np.concatenate([r[1] for r in requests]), np.concatenate([r[2] for r in requests]))).to(device)
+		with torch.no_grad():
+			logits, values = model(x)
+			policies = torch.softmax(logits.float(), dim=-1).cpu().numpy()
+			values = values.float().cpu().numpy()
+		i = 0
+		for conn, boards, _ in requests:
+			k = len(boards)
+			try:
+				conn.send((policies[i:i + k], values[i:i + k], version))
+			except (BrokenPipeError, OSError):
+				live.remove(conn)
+			i += k
+
+
+class InferenceClient:
+	"""Per-worker handle to an InferenceServer. Pass it to the worker process; it
+	exposes policy_fn / batch_policy_fn for MCTS and PipelinedMCTS. version is the
+	model version that answered the last request."""
+
+	def __init__(self, conn) -> None:
+		self._conn = conn
+		self.version: Optional[int] = None
+
+	def evaluate(self, states: Sequence[Any]) -> Tuple[np.ndarray, np.ndarray]:
+		"""Policies [N, 8100] (softmax over all actions) and values [N] for states."""
+		boards = np.array([s.board for s in states], dtype=np.int8).reshape(len(states), C.NUM_SQUARES)
+		stm = np.fromiter((s.side_to_move for s in states), dtype=np.int8, count=len(states))
+		self._conn.send((boards, stm))
+		policies, values, self.version = self._conn.recv()
+		return policies, values
+
+	def policy_fn(self, state: Any) -> Tuple[np.ndarray, float]:
+		policies, values = self.evaluate([state])
+		return policies[0], float(values[0])
+
+	def batch_policy_fn(self, states: List[Any]) -> List[Tuple[np.ndarray, float]]:
+		policies, values = self.evaluate(states)
+		return list(zip(policies, values.tolist()))
+
+	def close(self) -> None:
+		self._conn.close()
+
+
+class InferenceServer:
+	"""Model-owning inference process shared by self-play workers.
+
+	Workers send raw boards over per-client pipes; the server encodes and evaluates
+	them in dynamic batches (up to max_batch positions, waiting at most max_wait_ms
+	for a batch to fill), so one copy of the weights serves every worker. Clients
+	are allocated up front: hand clients[i] to worker i.
+
+	Without model_factory, model_path may be a state dict of either network or an
+	exported artefact (alphazero.export). swap() hot-loads a new model into the
+	running server between batches and waits for it; replies carry the version they
+	were computed with (InferenceClient.version). precision ("fp32", "bf16", "fp16"
+	or "int8") is applied to every model the server loads; one that fails its
+	calibration check against fp32 stops the server at startup and makes swap()
+	raise (the current model keeps serving).
+	"""
+
+	def __init__(
+		self,
+		num_clients: int,
+		model_path: Optional[str] = None,
+		model_factory: Optional[Callable[[], Any]] = None,
+		device: str = "cpu",
+		max_batch: int = 64,
+		max_wait_ms: float = 2.0,
+		start_method: str = "spawn",
+		precision: str = "fp32",
+	) -> None:
+		ctx = mp.get_context(start_method)
+		server_conns = []
+		self.clients: List[InferenceClient] = []
+		for _ in range(num_clients):
+			a, b = ctx.Pipe()
+			server_conns.append(a)
+			self.clients.append(InferenceClient(b))
+		self._control, control_child = ctx.Pipe()
+		self.version = 0
+		self._swap_lock = threading.Lock()
+		self._proc = ctx.Process(
+			target=_server_main,
+			args=(server_conns, control_child, model_factory, model_path, device, max_batch, max_wait_ms / 1000.0, precision),
+			daemon=True,
+		)
+		self._proc.start()
+		for conn in server_conns:
+			conn.close()
+		control_child.close()
+
+	def swap(self, model_path: str, version: Optional[int] = None) -> int:
+		"""Load model_path into the server (as at construction) and wait until it
+		serves it; returns the new version. Raises RuntimeError if the model cannot be
+		loaded, leaving the current model and version in place."""
+		new_version = self.version + 1 if version is None else version
+		with self._swap_lock:
+			self._control.send(("load", model_path, new_version))
+			while not self._control.poll(0.5):
+				if not self._proc.is_alive():
+					raise RuntimeError("inference server exited")
+			status, detail = self._control.recv()
+			if status != "loaded":
+				raise RuntimeError(detail)
+			self.version = detail
+		return self.version
+
+	def close(self) -> None:
+		try:
+			self._control.send(("stop",))
+		except (BrokenPipeError, OSError):
+			pass
+		self._proc.join(timeout=5.0)
+		if self._proc.is_alive():
+			self._proc.terminate()
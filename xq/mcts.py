@@ -1,17 +1,24 @@
 from __future__ import annotations
 
 import math
+import queue
 import random
+import threading
+import time
 from dataclasses import dataclass, field
 from typing import Callable, Dict, Optional, Tuple, List
 
 from .state import GameState
-from .policy import legal_move_mask, move_index
+from .policy import FULL_TO_COMPACT, move_index, is_compact_policy
 from .move import Move
 from . import constants as C
+from .stats import SearchStats, collecting
 
 
-PolicyFn = Callable[[GameState], Tuple[List[float], float]]  # returns (policy over 8100, value in [-1,1]]
+PolicyFn = Callable[[GameState], Tuple[List[float], float]]  # returns (policy over 8100 or the compact actions, value in [-1,1]]
+BatchPolicyFn = Callable[[List[GameState]], List[Tuple[List[float], float]]]  # one (policy, value) per state
+
+_FULL_TO_COMPACT = FULL_TO_COMPACT.tolist()
 
 
 @dataclass
@@ -22,118 +29,373 @@ class EdgeStats:
 	P: float = 0.0
 
 
+@dataclass
+class SearchInfo:
+	"""Summary of the last MCTS.run call."""
+	simulations: int = 0
+	sims_saved: int = 0
+	stop_reason: str = "budget"  # budget | time | solved | unreachable | dominant | cancelled
+	root_value: Optional[float] = None  # policy_fn value at the root, if expanded by this run
+	stats: Optional[SearchStats] = None  # this run's instrumentation, if MCTS.stats is set
+
+
 class Node:
+	"""Search tree node.
+
+	Edge statistics are kept in parallel lists indexed by slot (sorted by prior,
+	highest first). Child nodes are only materialised the first time selection
+	traverses an edge, so unvisited moves cost a few list entries instead of a Node.
+
+	Solver state: `proven` is the game-theoretic value from this node's side to
+	move (1 win, 0 draw, -1 loss) once known; `R[slot]` holds the proven value of
+	each edge from the mover's POV (None while unknown).
+	"""
+
+	__slots__ = (
+		"parent", "prior", "actions", "moves", "P", "N", "W", "R", "children",
+		"visits", "width", "unsolved", "proven", "is_expanded",
+	)
+
 	def __init__(self, parent: Optional["Node"], prior: float) -> None:
 		self.parent = parent
 		self.prior = prior
-		self.children: Dict[int, Node] = {}
-		self.edges: Dict[int, EdgeStats] = {}
+		self.actions: List[int] = []  # from-to index per slot
+		self.moves: List[int] = []  # packed Move code per slot
+		self.P: List[float] = []
+		self.N: List[int] = []
+		self.W: List[float] = []
+		self.R: List[Optional[float]] = []
+		self.children: Dict[int, Node] = {}  # from-to index -> child, created lazily
+		self.visits: int = 0
+		self.width: int = 0  # number of slots considered by selection
+		self.unsolved: int = 0  # edges whose value is not proven yet
+		self.proven: Optional[float] = None
 		self.is_expanded: bool = False
 
 	def total_visit(self) -> int:
-		return sum(es.N for es in self.edges.values())
+		return self.visits
+
+	@property
+	def edges(self) -> Dict[int, EdgeStats]:
+		"""Snapshot of edge statistics keyed by from-to index."""
+		return {
+			a: EdgeStats(N=n, W=w, Q=(w / n if n > 0 else 0.0), P=p)
+			for a, p, n, w in zip(self.actions, self.P, self.N, self.W)
+		}
+
+	def child(self, slot: int) -> "Node":
+		action = self.actions[slot]
+		node = self.children.get(action)
+		if node is None:
+			node = Node(parent=self, prior=self.P[slot])
+			self.children[action] = node
+		return node
 
 
 class MCTS:
-	def __init__(self, cpuct: float = 1.5, dirichlet_alpha: float = 0.3, dirichlet_frac: float = 0.25) -> None:
+	def __init__(
+		self,
+		cpuct: float = 1.5,
+		dirichlet_alpha: float = 0.3,
+		dirichlet_frac: float = 0.25,
+		widening_mass: Optional[float] = None,
+		widening_min: int = 4,
+		smart_stop: bool = False,
+		stop_visit_share: Optional[float] = None,
+		stop_q_gap: float = 0.1,
+		stop_min_sims: int = 16,
+		stats: Optional[SearchStats] = None,
+	) -> None:
+		"""widening_mass: if set (e.g. 0.95), selection only considers the highest-prior
+		moves covering this much prior mass (at least widening_min of them).
+		smart_stop: end the search once the most visited root move cannot be overtaken
+		with the remaining budget, or (if stop_visit_share is set) once it holds that
+		share of root visits and leads the runner-up's Q by stop_q_gap. Only the argmax
+		is preserved, so use it when the move is picked greedily (tau ~ 0).
+		stats: optional SearchStats that aggregates the instrumentation of every run.
+		"""
 		self.cpuct = cpuct
 		self.dirichlet_alpha = dirichlet_alpha
 		self.dirichlet_frac = dirichlet_frac
+		self.widening_mass = widening_mass
+		self.widening_min = widening_min
+		self.smart_stop = smart_stop
+		self.stop_visit_share = stop_visit_share
+		self.stop_q_gap = stop_q_gap
+		self.stop_min_sims = stop_min_sims
+		self.stats = stats
+		self._st: Optional[SearchStats] = None  # collector of the run in progress
+		self.last_info = SearchInfo()
 
-	def run(self, root_state: GameState, policy_fn: PolicyFn, num_simulations: int = 200, time_limit_s: Optional[float] = None) -> Node:
-		root = Node(parent=None, prior=1.0)
-		self._expand(root_state, root, policy_fn, add_noise=True)
+	def run(
+		self,
+		root_state: GameState,
+		policy_fn: PolicyFn,
+		num_simulations: int = 200,
+		time_limit_s: Optional[float] = None,
+		add_noise: bool = True,
+		root: Optional[Node] = None,
+		should_stop: Optional[Callable[[], bool]] = None,
+	) -> Node:
+		"""Search from root_state. Stops early once the root value is proven (root.proven).
+		Simulation counts and the stop reason are left in self.last_info.
+		add_noise: mix Dirichlet noise into the root priors.
+		root: continue an existing subtree for root_state (e.g. a child kept from an
+		earlier search); it is detached from its parent and keeps its priors.
+		should_stop: polled before every simulation; returning True cancels the search.
+		"""
+		info = SearchInfo()
+		self.last_info = info
+		t_run = self._begin_stats(info)
+		if root is None:
+			root = Node(parent=None, prior=1.0)
+		root.parent = None
+		if not root.is_expanded:
+			info.root_value = self._expand(root_state, root, policy_fn, add_noise=add_noise, is_root=True)
 		start_t = None
 		if time_limit_s is not None:
-			import time
 			start_t = time.perf_counter()
-		for _ in range(num_simulations):
+		# Single working state: moves are applied on the way down and undone after backup
+		state = root_state.clone()
+		for i in range(num_simulations):
+			if root.proven is not None:
+				info.stop_reason = "solved"
+				break
 			if start_t is not None:
-				import time
 				if (time.perf_counter() - start_t) >= time_limit_s:
+					info.stop_reason = "time"
 					break
-			state = root_state.clone()
-			path: List[Tuple[Node, Move, int]] = []  # (node, move, move_idx)
-			node = root
-			# Selection
-			while node.is_expanded and node.children:
-				move, move_idx = self._select(state, node)
-				path.append((node, move, move_idx))
-				state.apply_move(move)
-				node = node.children[move_idx]
-			# Expansion
-			value = self._expand(state, node, policy_fn)
-			# Backup
-			self._backup(path, value, state.side_to_move)
+			if should_stop is not None and should_stop():
+				info.stop_reason = "cancelled"
+				break
+			if self.smart_stop:
+				reason = self._smart_stop_reason(root, num_simulations - i)
+				if reason is not None:
+					info.stop_reason = reason
+					break
+			self._simulate(root, state, policy_fn)
+			info.simulations += 1
+		if info.stop_reason in ("solved", "unreachable", "dominant"):
+			info.sims_saved = num_simulations - info.simulations
+		self._end_stats(info, t_run)
 		return root
 
-	def _select(self, state: GameState, node: Node) -> Tuple[Move, int]:
-		N_sum = node.total_visit() + 1
+	def _begin_stats(self, info: SearchInfo) -> float:
+		self._st = SearchStats() if self.stats is not None else None
+		info.stats = self._st
+		return time.perf_counter()
+
+	def _end_stats(self, info: SearchInfo, t_run: float) -> None:
+		st = self._st
+		if st is not None:
+			st.searches += 1
+			st.simulations += info.simulations
+			st.wall_s += time.perf_counter() - t_run
+			self.stats.merge(st)
+		self._st = None
+
+	def _simulate(self, root: Node, state: GameState, policy_fn: PolicyFn, first_slot: Optional[int] = None) -> None:
+		"""One select/expand/backup pass on the working state, which is restored afterwards.
+		first_slot forces the root edge (used by root policies such as GumbelMCTS).
+		"""
+		st = self._st
+		if st is not None:
+			t0 = time.perf_counter()
+		path: List[Tuple[Node, int]] = []  # (node, slot)
+		node = root
+		slot = first_slot
+		# Selection: apply moves on the working state, skipping proven subtrees
+		while node.is_expanded and node.proven is None:
+			if slot is None:
+				slot = self._select(node)
+			path.append((node, slot))
+			state.apply_move(Move(node.moves[slot]))
+			node = node.child(slot)
+			slot = None
+		if st is not None:
+			st.add_time("select", time.perf_counter() - t0)
+			st.record_leaf(len(path), node.is_expanded)
+		# Expansion
+		value = self._expand(state, node, policy_fn)
+		# Backup, then rewind the working state to the root
+		if st is not None:
+			t0 = time.perf_counter()
+		self._backup(path, value)
+		if node.proven is not None:
+			self._propagate_proven(path, node)
+		for _ in path:
+			state.undo_move()
+		if st is not None:
+			st.add_time("backup", time.perf_counter() - t0)
+
+	def _smart_stop_reason(self, root: Node, remaining: int) -> Optional[str]:
+		if root.visits < self.stop_min_sims or len(root.actions) < 2:
+			return None
+		N, W = root.N, root.W
+		best = max(range(len(N)), key=N.__getitem__)
+		best_n = N[best]
+		second_n = max(n for i, n in enumerate(N) if i != best)
+		if best_n - second_n > remaining:
+			return "unreachable"
+		if self.stop_visit_share is not None and best_n >= self.stop_visit_share * root.visits:
+			best_q = W[best] / best_n
+			other_q = [W[i] / N[i] for i in range(len(N)) if i != best and N[i] > 0]
+			if not other_q or best_q - max(other_q) >= self.stop_q_gap:
+				return "dominant"
+		return None
+
+	def _select(self, node: Node) -> int:
+		sqrt_n = math.sqrt(node.visits + 1)
+		c = self.cpuct
+		P, N, W, R = node.P, node.N, node.W, node.R
 		best_score = -1e9
-		best = None
-		for move_idx, edge in node.edges.items():
-			U = self.cpuct * edge.P * math.sqrt(N_sum) / (1 + edge.N)
-			score = edge.Q + U
+		best = -1
+		for slot in range(node.width):
+			if R[slot] is not None:
+				continue
+			n = N[slot]
+			q = W[slot] / n if n > 0 else 0.0
+			score = q + c * P[slot] * sqrt_n / (1 + n)
 			if score > best_score:
 				best_score = score
-				best = move_idx
-		assert best is not None
-		from_sq = best // C.NUM_SQUARES
-		to_sq = best % C.NUM_SQUARES
-		pt = C.piece_type(state.board[from_sq])
-		move = Move.make(from_sq, to_sq, pt)
-		return move, best
-
-	def _expand(self, state: GameState, node: Node, policy_fn: PolicyFn, add_noise: bool = False) -> float:
+				best = slot
+		if best < 0:
+			# Every considered edge is proven: widen to the remaining moves
+			assert node.width < len(node.actions)
+			node.width = len(node.actions)
+			return self._select(node)
+		return best
+
+	def _expand(
+		self,
+		state: GameState,
+		node: Node,
+		policy_fn: Optional[PolicyFn],
+		add_noise: bool = False,
+		is_root: bool = False,
+		legal_moves: Optional[List[Move]] = None,
+		evaluated: Optional[Tuple[List[float], float]] = None,
+	) -> float:
+		"""Expand node from state and return its value (side to move POV). legal_moves
+		and evaluated, when given, are used instead of generating moves / calling policy_fn."""
 		if node.is_expanded:
 			# return leaf value (side_to_move POV)
-			return 0.0
-		mask = legal_move_mask(state)
-		policy, value = policy_fn(state)
-		# mask illegal
-		s = 0.0
-		priors: Dict[int, float] = {}
-		for i in range(C.NUM_SQUARES * C.NUM_SQUARES):
-			p = policy[i] * mask[i]
-			if p > 0:
-				priors[i] = p
-				s += p
+			return node.proven if node.proven is not None else 0.0
+		st = self._st
+		if st is not None:
+			t0 = time.perf_counter()
+		if legal_moves is None:
+			legal_moves = state.generate_legal_moves()
+		terminal = _terminal_value(state, legal_moves, check_repetition=not is_root)
+		if st is not None:
+			st.add_time("movegen", time.perf_counter() - t0)
+		if terminal is not None:
+			# Cached on the node: proven nodes are never selected or expanded again
+			node.proven = terminal
+			node.is_expanded = True
+			return terminal
+		legal = [move_index(m.from_sq, m.to_sq) for m in legal_moves]
+		if evaluated is not None:
+			policy, value = evaluated
+		elif st is not None:
+			t0 = time.perf_counter()
+			encode0 = st.phase_s["encode"]
+			with collecting(st):
+				policy, value = policy_fn(state)
+			dt = time.perf_counter() - t0
+			st.add_time("inference", dt - (st.phase_s["encode"] - encode0))
+			st.record_batch(1, dt)
+		else:
+			policy, value = policy_fn(state)
+		if st is not None:
+			st.record_expand(len(legal))
+		# mask illegal (policies over the compact action space are looked up through it)
+		if is_compact_policy(policy):
+			priors = [float(policy[_FULL_TO_COMPACT[i]]) for i in legal]
+		else:
+			priors = [float(policy[i]) for i in legal]
+		s = sum(priors)
 		if s > 0:
-			for k in priors:
-				priors[k] /= s
+			priors = [p / s for p in priors]
 		else:
 			# No prior; uniform over legal
-			legal_indices = [i for i in range(len(mask)) if mask[i] > 0]
-			w = 1.0 / max(1, len(legal_indices))
-			priors = {i: w for i in legal_indices}
+			w = 1.0 / max(1, len(legal))
+			priors = [w] * len(legal)
 		# Optional Dirichlet noise at root
 		if add_noise and priors:
-			legal_indices = list(priors.keys())
-			noise = _sample_dirichlet(len(legal_indices), self.dirichlet_alpha)
-			for i, idx in enumerate(legal_indices):
-				priors[idx] = (1 - self.dirichlet_frac) * priors[idx] + self.dirichlet_frac * noise[i]
-		# Create edges/children
-		for idx, p in priors.items():
-			node.edges[idx] = EdgeStats(P=p)
-			node.children[idx] = Node(parent=node, prior=p)
+			noise = _sample_dirichlet(len(priors), self.dirichlet_alpha)
+			priors = [(1 - self.dirichlet_frac) * p + self.dirichlet_frac * n for p, n in zip(priors, noise)]
+		# Edge arrays, highest prior first
+		order = sorted(range(len(legal)), key=lambda i: -priors[i])
+		node.actions = [legal[i] for i in order]
+		node.moves = [legal_moves[i].code for i in order]
+		node.P = [priors[i] for i in order]
+		node.N = [0] * len(order)
+		node.W = [0.0] * len(order)
+		node.R = [None] * len(order)
+		node.unsolved = len(order)
+		node.width = self._widening(node.P)
 		node.is_expanded = True
 		return value
 
-	def _backup(self, path: List[Tuple[Node, Move, int]], value: float, leaf_side_to_move: int) -> None:
-		# value is from leaf state's POV; along path we alternate perspective
-		sign = 1.0
-		for node, _move, idx in reversed(path):
-			es = node.edges[idx]
-			es.N += 1
-			es.W += sign * value
-			es.Q = es.W / es.N
+	def _widening(self, priors: List[float]) -> int:
+		"""Number of (prior-sorted) edges selection may consider."""
+		if self.widening_mass is None:
+			return len(priors)
+		mass = 0.0
+		k = 0
+		for p in priors:
+			if mass >= self.widening_mass:
+				break
+			mass += p
+			k += 1
+		return min(len(priors), max(k, self.widening_min))
+
+	def _backup(self, path: List[Tuple[Node, int]], value: float) -> None:
+		# value is from leaf state's POV; the edge into the leaf belongs to the
+		# opponent, so perspective flips before the first update
+		sign = -1.0
+		for node, slot in reversed(path):
+			node.N[slot] += 1
+			node.W[slot] += sign * value
+			node.visits += 1
 			sign = -sign
 
+	def _propagate_proven(self, path: List[Tuple[Node, int]], leaf: Node) -> None:
+		"""Solver rules: a child proven lost makes the parent a proven win; once every
+		edge is proven the parent takes the best of them. Stops at the first unproven node.
+		"""
+		child = leaf
+		for node, slot in reversed(path):
+			r = -child.proven
+			if node.R[slot] is None:
+				node.R[slot] = r
+				node.unsolved -= 1
+			if r > 0:
+				node.proven = r
+			elif node.unsolved == 0:
+				node.proven = max(node.R)
+			else:
+				return
+			child = node
+
+	def best_action(self, root: Node) -> Optional[int]:
+		"""From-to index of the move to play (most visited, or best proven)."""
+		probs = self.action_probs(root, tau=0.0)
+		return next(iter(probs), None)
+
 	def action_probs(self, root: Node, tau: float = 1.0) -> Dict[int, float]:
 		"""Return action probabilities over 8100 indices from root visit counts with temperature tau.
 		If tau==0, return one-hot at argmax.
+		A solved root returns one-hot at its best proven move; proven losing moves are
+		dropped while any alternative remains.
 		"""
-		counts = {idx: es.N for idx, es in root.edges.items()}
+		if root.proven is not None and root.actions:
+			best = max(range(len(root.actions)), key=lambda i: (root.R[i] if root.R[i] is not None else -2.0, root.N[i]))
+			return {root.actions[best]: 1.0}
+		counts = {a: n for a, n, r in zip(root.actions, root.N, root.R) if r is None or r >= 0}
+		if not counts:
+			counts = dict(zip(root.actions, root.N))
 		if not counts:
 			return {}
 		if tau <= 1e-6:
@@ -145,6 +407,344 @@ class MCTS:
 		return {idx: w / s for idx, w in weights.items()} if s > 0 else {idx: 1.0 / len(weights) for idx in weights}
 
 
+class PipelinedMCTS(MCTS):
+	"""MCTS with leaf evaluation pipelined against tree traversal.
+
+	Leaves are gathered in batches of batch_size under virtual loss and evaluated by
+	batch_policy_fn on a dedicated inference thread (torch releases the GIL inside its
+	kernels). While one batch is being evaluated the next one is gathered; each batch
+	is expanded and backed up as soon as its results arrive, so at most two batches
+	are in flight. Terminal leaves are backed up immediately without evaluation.
+
+	The policy_fn argument of run is accepted for interface compatibility (e.g.
+	run_adaptive) and ignored: every evaluation, including the root, goes through
+	batch_policy_fn.
+	"""
+
+	def __init__(self, batch_policy_fn: BatchPolicyFn, batch_size: int = 16, virtual_loss: float = 1.0, **kwargs) -> None:
+		super().__init__(**kwargs)
+		self.batch_policy_fn = batch_policy_fn
+		self.batch_size = max(1, batch_size)
+		self.virtual_loss = virtual_loss
+
+	def run(
+		self,
+		root_state: GameState,
+		policy_fn: Optional[PolicyFn] = None,
+		num_simulations: int = 200,
+		time_limit_s: Optional[float] = None,
+		add_noise: bool = True,
+		root: Optional[Node] = None,
+		should_stop: Optional[Callable[[], bool]] = None,
+	) -> Node:
+		info = SearchInfo()
+		self.last_info = info
+		t_run = self._begin_stats(info)
+		if root is None:
+			root = Node(parent=None, prior=1.0)
+		root.parent = None
+		single_fn = lambda s: self.batch_policy_fn([s])[0]
+		if not root.is_expanded:
+			info.root_value = self._expand(root_state, root, single_fn, add_noise=add_noise, is_root=True)
+		deadline = None
+		if time_limit_s is not None:
+			deadline = time.perf_counter() + time_limit_s
+		requests: "queue.Queue" = queue.Queue()
+		results: "queue.Queue" = queue.Queue()
+		worker = threading.Thread(target=self._inference_loop, args=(requests, results, self._st), daemon=True)
+		worker.start()
+		state = root_state.clone()
+		pending: Dict[int, Node] = {}  # id(leaf) -> leaf, awaiting evaluation
+		in_flight: Optional[list] = None
+		dispatched = 0  # simulations started (terminal leaves count immediately)
+		stopping = False
+		try:
+			while True:
+				if not stopping:
+					reason = self._stop_reason(root, num_simulations - dispatched, deadline, should_stop)
+					if reason is not None:
+						info.stop_reason = reason
+						stopping = True
+				batch: list = []
+				if not stopping:
+					batch, done = self._gather(root, state, min(self.batch_size, num_simulations - dispatched), pending)
+					dispatched += done + len(batch)
+					info.simulations += done
+					if batch:
+						requests.put([leaf_state for _, _, leaf_state, _ in batch])
+				if in_flight is not None:
+					info.simulations += self._complete(in_flight, results.get(), pending)
+				in_flight = batch or None
+				if in_flight is None and (stopping or dispatched >= num_simulations):
+					break
+		finally:
+			requests.put(None)
+			worker.join()
+		if info.stop_reason in ("solved", "unreachable", "dominant"):
+			info.sims_saved = num_simulations - info.simulations
+		self._end_stats(info, t_run)
+		return root
+
+	def _stop_reason(self, root: Node, remaining: int, deadline: Optional[float], should_stop: Optional[Callable[[], bool]]) -> Optional[str]:
+		if remaining <= 0:
+			return "budget"
+		if root.proven is not None:
+			return "solved"
+		if deadline is not None:
+			if time.perf_counter() >= deadline:
+				return "time"
+		if should_stop is not None and should_stop():
+			return "cancelled"
+		if self.smart_stop:
+			return self._smart_stop_reason(root, remaining)
+		return None
+
+	def _inference_loop(self, requests: "queue.Queue", results: "queue.Queue", st: Optional[SearchStats] = None) -> None:
+		while True:
+			states = requests.get()
+			if states is None:
+				break
+			try:
+				if st is None:
+					outputs = self.batch_policy_fn(states)
+				else:
+					t0 = time.perf_counter()
+					encode0 = st.phase_s["encode"]
+					with collecting(st):
+						outputs = self.batch_policy_fn(states)
+					dt = time.perf_counter() - t0
+					st.add_time("inference", dt - (st.phase_s["encode"] - encode0))
+					st.record_batch(len(states), dt)
+				results.put(outputs)
+			except BaseException as e:  # re-raised on the search thread
+				results.put(e)
+
+	def _gather(self, root: Node, state: GameState, n: int, pending: Dict[int, Node]) -> Tuple[list, int]:
+		"""Select up to n leaves, applying virtual loss along each path. Returns the
+		batch of (path, leaf, leaf_state, legal_moves) and the number of simulations
+		finished on the spot (terminal leaves). Stops early on a pending-leaf collision.
+		"""
+		st = self._st
+		batch: list = []
+		done = 0
+		while len(batch) + done < n and root.proven is None:
+			if st is not None:
+				t0 = time.perf_counter()
+			path: List[Tuple[Node, int]] = []
+			node = root
+			while node.is_expanded and node.proven is None:
+				slot = self._select(node)
+				path.append((node, slot))
+				state.apply_move(Move(node.moves[slot]))
+				node = node.child(slot)
+			if st is not None:
+				st.add_time("select", time.perf_counter() - t0)
+			if id(node) in pending:
+				for _ in path:
+					state.undo_move()
+				break
+			if st is not None:
+				st.record_leaf(len(path), node.is_expanded)
+			if not node.is_expanded:
+				if st is not None:
+					t0 = time.perf_counter()
+				legal_moves = state.generate_legal_moves()
+				terminal = _terminal_value(state, legal_moves)
+				if st is not None:
+					st.add_time("movegen", time.perf_counter() - t0)
+				if terminal is None:
+					self._add_virtual_loss(path, 1)
+					pending[id(node)] = node
+					batch.append((path, node, state.clone(), legal_moves))
+					for _ in path:
+						state.undo_move()
+					continue
+				node.proven = terminal
+				node.is_expanded = True
+			self._backup(path, node.proven)
+			self._propagate_proven(path, node)
+			done += 1
+			for _ in path:
+				state.undo_move()
+		return batch, done
+
+	def _complete(self, batch: list, outputs, pending: Dict[int, Node]) -> int:
+		if isinstance(outputs, BaseException):
+			raise outputs
+		for (path, node, leaf_state, legal_moves), out in zip(batch, outputs):
+			self._add_virtual_loss(path, -1)
+			del pending[id(node)]
+			value = self._expand(leaf_state, node, None, legal_moves=legal_moves, evaluated=out)
+			if self._st is not None:
+				t0 = time.perf_counter()
+				self._backup(path, value)
+				self._st.add_time("backup", time.perf_counter() - t0)
+			else:
+				self._backup(path, value)
+		return len(batch)
+
+	def _add_virtual_loss(self, path: List[Tuple[Node, int]], sign: int) -> None:
+		# Counts as a lost visit for every mover on the path, steering other selections away
+		vl = sign * self.virtual_loss
+		for node, slot in path:
+			node.N[slot] += sign
+			node.W[slot] -= vl
+			node.visits += sign
+
+
+class GumbelMCTS(MCTS):
+	"""Gumbel root search with sequential halving (Danihelka et al., 2022).
+
+	The root samples max_considered actions by Gumbel-top-k over the prior logits and
+	splits the budget across them by sequential halving; below the root, selection is
+	ordinary PUCT. action_probs returns the improved policy built from completed
+	Q-values (a training target that stays informative at 16-64 simulations), and
+	best_action returns the sequential-halving winner. Root Dirichlet noise and
+	smart_stop are not used: the Gumbel sample already provides exploration.
+	"""
+
+	def __init__(self, cpuct: float = 1.5, max_considered: int = 16, c_visit: float = 50.0, c_scale: float = 1.0, **kwargs) -> None:
+		super().__init__(cpuct=cpuct, **kwargs)
+		self.max_considered = max_considered
+		self.c_visit = c_visit
+		self.c_scale = c_scale
+		self.root_value: float = 0.0
+		self.selected_action: Optional[int] = None
+		self._gumbel: List[float] = []
+
+	def run(
+		self,
+		root_state: GameState,
+		policy_fn: PolicyFn,
+		num_simulations: int = 200,
+		time_limit_s: Optional[float] = None,
+		add_noise: bool = True,
+		root: Optional[Node] = None,
+		should_stop: Optional[Callable[[], bool]] = None,
+	) -> Node:
+		"""Same signature as MCTS.run. The Gumbel sample and halving schedule are
+		drawn fresh for every search, so a passed-in root is only continued while it
+		has no visits (the root expanded by the previous run, as run_adaptive does);
+		a searched one is ignored.
+		"""
+		info = SearchInfo()
+		self.last_info = info
+		t_run = self._begin_stats(info)
+		self.selected_action = None
+		if root is not None and root.is_expanded and root.visits == 0:
+			# self.root_value is still this root's evaluation
+			root.parent = None
+		else:
+			root = Node(parent=None, prior=1.0)
+			self.root_value = self._expand(root_state, root, policy_fn, is_root=True)
+		info.root_value = self.root_value
+		n_actions = len(root.actions)
+		if n_actions == 0:
+			self._end_stats(info, t_run)
+			return root
+		logits = _logits(root.P)
+		self._gumbel = [-math.log(-math.log(random.uniform(1e-12, 1.0))) for _ in range(n_actions)]
+		m = min(self.max_considered, n_actions)
+		remaining = sorted(range(n_actions), key=lambda i: -(self._gumbel[i] + logits[i]))[:m]
+		phases = max(1, math.ceil(math.log2(m))) if m > 1 else 1
+		deadline = None
+		if time_limit_s is not None:
+			deadline = time.perf_counter() + time_limit_s
+		state = root_state.clone()
+		budget = num_simulations
+		while budget > 0 and root.proven is None:
+			per_action = max(1, num_simulations // (phases * len(remaining)))
+			for slot in remaining:
+				for _ in range(per_action):
+					if budget <= 0 or root.proven is not None:
+						break
+					if deadline is not None:
+						if time.perf_counter() >= deadline:
+							info.stop_reason = "time"
+							budget = 0
+							break
+					if should_stop is not None and should_stop():
+						info.stop_reason = "cancelled"
+						budget = 0
+						break
+					self._simulate(root, state, policy_fn, first_slot=slot)
+					info.simulations += 1
+					budget -= 1
+			if len(remaining) == 1:
+				# Single survivor: spend what is left on it
+				continue
+			remaining = sorted(remaining, key=lambda i: -self._score(root, i, logits))[:max(1, (len(remaining) + 1) // 2)]
+		if root.proven is not None:
+			info.stop_reason = "solved"
+			info.sims_saved = num_simulations - info.simulations
+			# the proven-best edge; GumbelMCTS.action_probs would defer to selected_action
+			self.selected_action = next(iter(MCTS.action_probs(self, root, 0.0)), None)
+		else:
+			best = max(remaining, key=lambda i: self._score(root, i, logits))
+			self.selected_action = root.actions[best]
+		self._end_stats(info, t_run)
+		return root
+
+	def _sigma(self, root: Node, q: float) -> float:
+		# Monotone transform of a [-1,1] value, growing with the visit scale
+		return (self.c_visit + max(root.N)) * self.c_scale * (q + 1.0) / 2.0
+
+	def _score(self, root: Node, slot: int, logits: List[float]) -> float:
+		n = root.N[slot]
+		q = root.W[slot] / n if n > 0 else 0.0
+		return self._gumbel[slot] + logits[slot] + self._sigma(root, q)
+
+	def best_action(self, root: Node) -> Optional[int]:
+		return self.selected_action
+
+	def improved_policy(self, root: Node) -> Dict[int, float]:
+		"""softmax(logits + sigma(completed Q)); unvisited actions use the mixed value v_mix."""
+		if not root.actions:
+			return {}
+		N, W, P = root.N, root.W, root.P
+		total_n = root.visits
+		visited = [i for i in range(len(N)) if N[i] > 0]
+		v_mix = self.root_value
+		if visited:
+			p_visited = sum(P[i] for i in visited)
+			if p_visited > 0:
+				weighted_q = sum(P[i] * W[i] / N[i] for i in visited) / p_visited
+				v_mix = (self.root_value + total_n * weighted_q) / (1 + total_n)
+		logits = _logits(P)
+		scores = []
+		for i in range(len(N)):
+			q = W[i] / N[i] if N[i] > 0 else v_mix
+			scores.append(logits[i] + self._sigma(root, q))
+		mx = max(scores)
+		exps = [math.exp(x - mx) for x in scores]
+		s = sum(exps)
+		return {a: e / s for a, e in zip(root.actions, exps)}
+
+	def action_probs(self, root: Node, tau: float = 1.0) -> Dict[int, float]:
+		"""Improved policy; one-hot at the selected action if tau==0, or at the best
+		proven move if the root is solved (any tau)."""
+		if root.proven is not None:
+			return MCTS.action_probs(self, root, 0.0)
+		if tau <= 1e-6:
+			return {} if self.selected_action is None else {self.selected_action: 1.0}
+		return self.improved_policy(root)
+
+
+def _logits(priors: List[float]) -> List[float]:
+	return [math.log(max(p, 1e-12)) for p in priors]
+
+
+def _terminal_value(state: GameState, legal_moves: List[Move], check_repetition: bool = True) -> Optional[float]:
+	"""Game result from the side to move's POV, or None if ongoing.
+	Follows GameState.adjudicate_result: mate loses, stalemate and threefold repetition draw.
+	"""
+	if not legal_moves:
+		return -1.0 if state.is_in_check(state.side_to_move) else 0.0
+	if check_repetition and state.threefold_repetition():
+		return 0.0
+	return None
+
+
 def _sample_dirichlet(k: int, alpha: float) -> List[float]:
 	# Sample using Gamma variates
 	if k <= 0:
@@ -154,5 +754,3 @@ def _sample_dirichlet(k: int, alpha: float) -> List[float]:
 	if s <= 0:
 		return [1.0 / k] * k
 	return [v / s for v in vals]
-
-
@@ -7,6 +7,9 @@ import torch.nn as nn
 import torch.nn.functional as F
 
 from . import constants as C
+from .stats import record_phase
+from .encoding import states_to_tensor
+from .policy import NUM_ACTIONS, NUM_COMPACT_ACTIONS
 
 # Import generic framework
 try:
@@ -19,29 +22,20 @@ except ImportError:
 def state_to_tensor(state, history_k: int = 1) -> torch.Tensor:
 	"""Convert GameState to input tensor of shape [C,H,W] where H=10, W=9.
 	Currently uses 15 planes (14 pieces + 1 side-to-move). History stacking is stubbed (k=1).
+	Batches should use xq.encoding.states_to_tensor directly.
 	"""
-	planes = state.to_planes()  # 15 x 90
-	h = C.RANKS
-	w = C.FILES
-	# reshape to [C, H, W] with row-major ranks
-	ch = len(planes)
-	t = torch.zeros((ch, h, w), dtype=torch.float32)
-	for c in range(ch):
-		for idx, v in enumerate(planes[c]):
-			r = C.rank_of(idx)
-			f = C.file_of(idx)
-			t[c, r, f] = float(v)
-	return t
+	return states_to_tensor([state])[0]
 
 
 class XQNet(nn.Module):
 	"""Simple CNN policy-value net for 9x10 Xiangqi.
-	Policy head outputs 8100 logits (from-to), value head outputs scalar in [-1,1].
+	Policy head outputs 8100 logits (from-to), or with compact=True one logit per
+	compact action (xq.policy.COMPACT_TO_FULL); value head outputs scalar in [-1,1].
 	
 	This is the legacy implementation. For new code, use create_xiangqi_net() from alphazero.network.
 	"""
 
-	def __init__(self, in_channels: int = 15, channels: int = 64, num_blocks: int = 3) -> None:
+	def __init__(self, in_channels: int = 15, channels: int = 64, num_blocks: int = 3, compact: bool = False) -> None:
 		super().__init__()
 		self.stem = nn.Conv2d(in_channels, channels, kernel_size=3, padding=1)
 		self.blocks = nn.ModuleList([
@@ -49,7 +43,7 @@ class XQNet(nn.Module):
 		])
 		# Policy head
 		self.p_conv = nn.Conv2d(channels, 32, kernel_size=1)
-		self.p_fc = nn.Linear(32 * C.RANKS * C.FILES, C.NUM_SQUARES * C.NUM_SQUARES)
+		self.p_fc = nn.Linear(32 * C.RANKS * C.FILES, NUM_COMPACT_ACTIONS if compact else NUM_ACTIONS)
 		# Value head
 		self.v_conv = nn.Conv2d(channels, 32, kernel_size=1)
 		self.v_fc1 = nn.Linear(32 * C.RANKS * C.FILES, 128)
@@ -61,11 +55,11 @@ class XQNet(nn.Module):
 			x = blk(x)
 		# Policy
 		p = F.relu(self.p_conv(x))
-		p = p.view(p.size(0), -1)
+		p = p.reshape(p.size(0), -1)
 		p = self.p_fc(p)
 		# Value
 		v = F.relu(self.v_conv(x))
-		v = v.view(v.size(0), -1)
+		v = v.reshape(v.size(0), -1)
 		v = F.relu(self.v_fc1(v))
 		v = torch.tanh(self.v_fc2(v))
 		return p, v.squeeze(-1)
@@ -89,7 +83,8 @@ class ResidualBlock(nn.Module):
 def infer_policy_value(model: XQNet, states: List) -> Tuple[List[List[float]], List[float]]:
 	model.eval()
 	device = next(model.parameters()).device
-	inputs = torch.stack([state_to_tensor(s) for s in states]).to(device)
+	with record_phase("encode"):
+		inputs = states_to_tensor(states).to(device)
 	logits, values = model(inputs)
 	policies: List[List[float]] = []
 	for i in range(logits.size(0)):
@@ -0,0 +1,247 @@
+from __future__ import annotations
+
+import multiprocessing as mp
+import random
+import threading
+import time
+from multiprocessing.connection import wait
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .state import GameState
+from .mcts import MCTS, Node, PolicyFn, SearchInfo
+from .stats import SearchStats
+
+
+PolicyFactory = Callable[..., PolicyFn]  # called in the worker as factory(*policy_args)
+
+
+def _worker_main(conn, factory: PolicyFactory) -> None:
+	"""Worker loop: one MCTS.run per task. Policy functions (and whatever model they
+	load) are built once per distinct policy_args and kept for the process lifetime.
+	"""
+	try:
+		import torch  # type: ignore
+		torch.set_num_threads(1)
+	except Exception:
+		pass
+	policies: Dict[tuple, PolicyFn] = {}
+	while True:
+		try:
+			task = conn.recv()
+		except EOFError:
+			break
+		if task is None:
+			break
+		task_id, state, sims, time_limit_s, policy_args, mcts_kwargs, add_noise, seed = task
+		try:
+			policy_fn = policies.get(policy_args)
+			if policy_fn is None:
+				policy_fn = policies[policy_args] = factory(*policy_args)
+			random.seed(seed)
+			mcts = MCTS(**mcts_kwargs)
+			root = mcts.run(state, policy_fn, num_simulations=sims, time_limit_s=time_limit_s, add_noise=add_noise)
+			conn.send((task_id, _root_stats(root, mcts.last_info), None))
+		except Exception as e:  # report and keep serving
+			conn.send((task_id, None, repr(e)))
+	conn.close()
+
+
+def _root_stats(root: Node, info: SearchInfo) -> dict:
+	return {
+		"actions": root.actions,
+		"moves": root.moves,
+		"P": root.P,
+		"N": root.N,
+		"W": root.W,
+		"R": root.R,
+		"proven": root.proven,
+		"simulations": info.simulations,
+		"sims_saved": info.sims_saved,
+		"stop_reason": info.stop_reason,
+		"stats": info.stats,
+	}
+
+
+def merge_roots(stats: List[dict]) -> Node:
+	"""Sum root visit counts and values of independent searches into one expanded
+	root Node (no children), so MCTS.best_action / action_probs work on it. Priors
+	are averaged; proven edge values are exact, so any worker's proof is kept.
+	"""
+	root = Node(parent=None, prior=1.0)
+	slots: Dict[int, int] = {}
+	for st in stats:
+		for a, mv, p, n, w, r in zip(st["actions"], st["moves"], st["P"], st["N"], st["W"], st["R"]):
+			slot = slots.get(a)
+			if slot is None:
+				slot = slots[a] = len(root.actions)
+				root.actions.append(a)
+				root.moves.append(mv)
+				root.P.append(0.0)
+				root.N.append(0)
+				root.W.append(0.0)
+				root.R.append(None)
+			root.P[slot] += p / len(stats)
+			root.N[slot] += n
+			root.W[slot] += w
+			if r is not None:
+				root.R[slot] = r
+		if st["proven"] is not None:
+			root.proven = st["proven"]
+	root.visits = sum(root.N)
+	root.width = len(root.actions)
+	root.unsolved = sum(1 for r in root.R if r is None)
+	root.is_expanded = bool(root.actions) or root.proven is not None
+	return root
+
+
+def _stop(procs, timeout: float = 1.0) -> None:
+	"""Terminate procs and wait for them to exit, killing any that ignore SIGTERM, so
+	none is still alive (and mistaken for a usable worker) afterwards."""
+	for p in procs:
+		p.terminate()
+	for p in procs:
+		p.join(timeout)
+		if p.is_alive():
+			p.kill()
+			p.join()
+
+
+class RootParallelMCTS:
+	"""Root-parallel MCTS over a pool of pre-started worker processes.
+
+	Each worker runs an independent search of the same position with its own seed
+	(so Dirichlet root noise differs); root visit counts and values are merged with
+	merge_roots. Workers keep their policy functions, and therefore loaded models,
+	between requests. policy_factory must be picklable (a module-level function).
+	A worker that dies, or has not replied by run()'s deadline, is terminated and
+	replaced before the next search; the current one merges whatever the other
+	workers returned.
+
+	Searches are serialised: concurrent callers wait for the pool.
+	"""
+
+	POLL_S = 0.5  # how often run() checks that the workers it waits for are alive
+
+	def __init__(self, workers: int, policy_factory: PolicyFactory, start_method: str = "spawn") -> None:
+		self._ctx = mp.get_context(start_method)
+		self._factory = policy_factory
+		self._lock = threading.Lock()
+		self._conns = []
+		self._procs = []
+		for _ in range(max(1, workers)):
+			conn, p = self._spawn()
+			self._conns.append(conn)
+			self._procs.append(p)
+		self._task_id = 0
+		self.last_info = SearchInfo()
+
+	def _spawn(self):
+		parent_conn, child_conn = self._ctx.Pipe()
+		p = self._ctx.Process(target=_worker_main, args=(child_conn, self._factory), daemon=True)
+		p.start()
+		child_conn.close()
+		return parent_conn, p
+
+	def _replace_dead(self, n: int) -> None:
+		for i in range(n):
+			if not self._procs[i].is_alive():
+				self._conns[i].close()
+				self._procs[i].join(timeout=1.0)
+				self._conns[i], self._procs[i] = self._spawn()
+
+	@property
+	def workers(self) -> int:
+		return len(self._procs)
+
+	def run(
+		self,
+		root_state: GameState,
+		num_simulations: int = 200,
+		time_limit_s: Optional[float] = None,
+		policy_args: Tuple[Any, ...] = (),
+		workers: Optional[int] = None,
+		add_noise: bool = True,
+		grace_s: float = 1.0,
+		timeout_s: Optional[float] = 600.0,
+		**mcts_kwargs,
+	) -> Node:
+		"""Split num_simulations across `workers` processes (all by default, at most
+		one per simulation) and merge their roots. With time_limit_s every worker
+		searches until that deadline and has grace_s more to reply; without one, it
+		has timeout_s (None waits forever). Workers that miss the deadline are presumed
+		hung and terminated; workers that die are skipped. Simulations, sims_saved and
+		stats (pass stats=SearchStats() to collect them) are summed into self.last_info.
+		"""
+		n = min(self.workers, workers or self.workers, max(1, num_simulations))
+		with self._lock:
+			self._replace_dead(n)
+			self._task_id += 1
+			task_id = self._task_id
+			procs = dict(zip(self._conns[:n], self._procs[:n]))
+			for i, conn in enumerate(procs):
+				sims = num_simulations // n + (i < num_simulations % n)
+				seed = random.getrandbits(32)
+				conn.send((task_id, root_state, sims, time_limit_s, tuple(policy_args), mcts_kwargs, add_noise, seed))
+			deadline = None
+			if time_limit_s is not None:
+				deadline = time.perf_counter() + time_limit_s + grace_s
+			elif timeout_s is not None:
+				deadline = time.perf_counter() + timeout_s
+			stats: List[dict] = []
+			errors: List[str] = []
+			pending = list(procs)
+			while pending:
+				timeout = self.POLL_S
+				if deadline is not None:
+					timeout = min(timeout, max(0.0, deadline - time.perf_counter()))
+				for conn in wait(pending, timeout=timeout):
+					try:
+						tid, st, err = conn.recv()
+					except (EOFError, OSError):
+						pending.remove(conn)
+						errors.append(f"worker exited with code {procs[conn].exitcode}")
+						continue
+					if tid != task_id:
+						continue  # not expected: stragglers are terminated
+					pending.remove(conn)
+					if err is not None:
+						errors.append(err)
+					else:
+						stats.append(st)
+				for conn in [c for c in pending if not procs[c].is_alive()]:
+					pending.remove(conn)
+					errors.append(f"worker exited with code {procs[conn].exitcode}")
+				if deadline is not None and time.perf_counter() >= deadline:
+					break
+			if pending:  # hung: replaced before the next search
+				_stop([procs[conn] for conn in pending])
+				errors.append(f"{len(pending)} worker(s) timed out")
+		if not stats:
+			raise RuntimeError("root-parallel search failed: " + ("; ".join(errors) or "no worker replied"))
+		root = merge_roots(stats)
+		info = SearchInfo(
+			simulations=sum(st["simulations"] for st in stats),
+			sims_saved=sum(st["sims_saved"] for st in stats),
+		)
+		reasons = {st["stop_reason"] for st in stats}
+		info.stop_reason = reasons.pop() if len(reasons) == 1 else "budget"
+		for st in stats:
+			if st["stats"] is not None:
+				if info.stats is None:
+					info.stats = SearchStats()
+				info.stats.merge(st["stats"])
+		self.last_info = info
+		return root
+
+	def close(self) -> None:
+		for conn in self._conns:
+			try:
+				conn.send(None)
+				conn.close()
+			except Exception:
+				pass
+		for p in self._procs:
+			p.join(timeout=1.0)
+		_stop([p for p in self._procs if p.is_alive()])
+		self._conns = []
+		self._procs = []
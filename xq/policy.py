@@ -1,26 +1,109 @@
 from __future__ import annotations
 
-from typing import List
+from typing import Dict, List, Tuple
+
+import numpy as np
 
 from . import constants as C
 from .move import Move
 from .state import GameState
 
 
+NUM_ACTIONS = C.NUM_SQUARES * C.NUM_SQUARES
+
+
 def move_index(from_sq: int, to_sq: int) -> int:
 	"""Map (from,to) in [0..89]x[0..89] to a unique index in [0..8099]."""
 	return from_sq * C.NUM_SQUARES + to_sq
 
 
-def legal_move_mask(state: GameState) -> List[float]:
-	"""Return 8100-dim policy mask (0/1 floats) over from-to space.
+def _reachable_pairs() -> List[Tuple[int, int]]:
+	"""(from, to) pairs some piece can move between on an empty board: rank/file lines
+	(rook, cannon, king, pawn, flying general), knight jumps, and bishop and advisor
+	steps on their own squares."""
+	pairs = set()
+	for sq in range(C.NUM_SQUARES):
+		f, r = C.file_of(sq), C.rank_of(sq)
+		for t in range(C.NUM_SQUARES):
+			if t != sq and (C.file_of(t) == f or C.rank_of(t) == r):
+				pairs.add((sq, t))
+		for df, dr in ((1, 2), (2, 1), (2, -1), (1, -2), (-1, -2), (-2, -1), (-2, 1), (-1, 2)):
+			if C.in_bounds(f + df, r + dr):
+				pairs.add((sq, C.index_of(f + df, r + dr)))
+		for df, dr in ((2, 2), (2, -2), (-2, 2), (-2, -2)):
+			tf, tr = f + df, r + dr
+			if C.in_bounds(tf, tr) and _bishop_square(f, r) and _bishop_square(tf, tr) and (r <= 4) == (tr <= 4):
+				pairs.add((sq, C.index_of(tf, tr)))
+		for df, dr in ((1, 1), (1, -1), (-1, 1), (-1, -1)):
+			tf, tr = f + df, r + dr
+			centre = (f == 4 and r in (1, 8)) or (tf == 4 and tr in (1, 8))
+			same_palace = (C.in_red_palace(f, r) and C.in_red_palace(tf, tr)) or (C.in_black_palace(f, r) and C.in_black_palace(tf, tr))
+			if centre and same_palace:
+				pairs.add((sq, C.index_of(tf, tr)))
+	return sorted(pairs)
+
+
+def _bishop_square(file: int, rank: int) -> bool:
+	own_rank = rank if rank <= 4 else C.RANKS - 1 - rank
+	return file % 2 == 0 and own_rank % 2 == 0 and (file + own_rank) % 4 == 2
+
+
+# Compact action space: the reachable (from, to) pairs in from-to index order.
+# COMPACT_TO_FULL[c] is the 8100-space index of compact action c; FULL_TO_COMPACT
+# maps back, with -1 for pairs no piece can move between.
+COMPACT_TO_FULL: np.ndarray = np.array([move_index(a, b) for a, b in _reachable_pairs()], dtype=np.int64)
+NUM_COMPACT_ACTIONS = len(COMPACT_TO_FULL)
+FULL_TO_COMPACT: np.ndarray = np.full(NUM_ACTIONS, -1, dtype=np.int64)
+FULL_TO_COMPACT[COMPACT_TO_FULL] = np.arange(NUM_COMPACT_ACTIONS)
+
+
+def compact_index(from_sq: int, to_sq: int) -> int:
+	"""Compact action index of (from, to); -1 if no piece can make that move."""
+	return int(FULL_TO_COMPACT[from_sq * C.NUM_SQUARES + to_sq])
+
+
+def is_compact_policy(policy) -> bool:
+	"""True if policy is a vector over the compact action space (by its length)."""
+	return len(policy) == NUM_COMPACT_ACTIONS
+
+
+def policy_to_compact(policy) -> np.ndarray:
+	"""8100-space policies ([..., 8100]) restricted to the compact actions ([..., K])."""
+	return np.asarray(policy)[..., COMPACT_TO_FULL]
+
+
+def policy_from_compact(policy) -> np.ndarray:
+	"""Compact policies ([..., K]) scattered back to the 8100 space (zeros elsewhere)."""
+	policy = np.asarray(policy)
+	out = np.zeros(policy.shape[:-1] + (NUM_ACTIONS,), dtype=policy.dtype)
+	out[..., COMPACT_TO_FULL] = policy
+	return out
+
+
+def pi_to_compact(pi: Dict[str, float]) -> Dict[str, float]:
+	"""Self-play pi record ({"from-to index": p}) rekeyed by compact index; moves no
+	piece can make (never in real records) are dropped."""
+	out = {}
+	for k, p in pi.items():
+		c = int(FULL_TO_COMPACT[int(k)])
+		if c >= 0:
+			out[str(c)] = p
+	return out
+
+
+def pi_from_compact(pi: Dict[str, float]) -> Dict[str, float]:
+	"""Compact-keyed pi rekeyed by 8100-space index."""
+	return {str(int(COMPACT_TO_FULL[int(k)])): p for k, p in pi.items()}
+
+
+def legal_move_mask(state: GameState, compact: bool = False) -> List[float]:
+	"""Return 8100-dim policy mask (0/1 floats) over from-to space, or with compact
+	the NUM_COMPACT_ACTIONS-dim mask over the compact action space.
 	Only legal moves are 1. Others are 0.
 	"""
-	mask = [0.0] * (C.NUM_SQUARES * C.NUM_SQUARES)
+	mask = [0.0] * (NUM_COMPACT_ACTIONS if compact else NUM_ACTIONS)
 	moves = state.generate_legal_moves()
 	for m in moves:
 		idx = move_index(m.from_sq, m.to_sq)
-		mask[idx] = 1.0
+		mask[int(FULL_TO_COMPACT[idx]) if compact else idx] = 1.0
 	return mask
-
-
@@ -4,12 +4,14 @@ import json
 import math
 import random
 from dataclasses import dataclass
-from typing import Callable, Dict, List, Optional, Tuple
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 from . import constants as C
 from .state import GameState
-from .mcts import MCTS
+from .mcts import MCTS, GumbelMCTS, PipelinedMCTS
+from .budget import BudgetConfig, SimAllocator, run_adaptive
 from .policy import legal_move_mask
+from .stats import SearchStats, record_phase
 
 
 PolicyFn = Callable[[GameState], Tuple[List[float], float]]
@@ -50,7 +52,7 @@ def default_policy_fn() -> PolicyFn:
 
 @dataclass
 class SelfPlayConfig:
-	engine: str = "mcts"  # "mcts" or "mcts_nn"
+	engine: str = "mcts"  # "mcts", "mcts_nn", "gumbel" or "gumbel_nn"
 	sims: int = 200
 	max_moves: int = 512
 	tau_moves: int = 10  # use high temperature for first N moves
@@ -61,6 +63,25 @@ class SelfPlayConfig:
 	# payload size controls
 	store_planes: bool = True
 	store_pi: bool = True
+	# playout cap randomisation: only this fraction of moves gets a full `sims` search
+	# (with root noise) and a policy target; the rest use `fast_sims` and record z only
+	full_search_prob: float = 1.0
+	fast_sims: int = 32
+	gumbel_considered: int = 16  # root actions sampled by the gumbel engines
+	# adaptive budget: full searches average `sims` but scale with position complexity;
+	# forced moves are played without search and recorded without pi
+	adaptive_sims: bool = False
+	# mcts_nn: gather leaves in batches of this size under virtual loss and evaluate
+	# them on an inference thread while the next batch is gathered (0 = off)
+	pipeline_batch: int = 0
+	# aggregate MCTS instrumentation over the game into the result's "search_stats"
+	collect_stats: bool = False
+	# *_nn engines: evaluate through a shared InferenceServer (xq.inference.InferenceClient)
+	# instead of loading model_path in this process
+	inference: Optional[Any] = None
+	# *_nn engines without `inference`: "fp32", "bf16", "fp16" or "int8", refused if it
+	# fails calibration against fp32 (alphazero.precision)
+	precision: str = "fp32"
 
 
 def _select_with_temperature(probs: Dict[int, float], tau: float) -> int:
@@ -91,42 +112,72 @@ def _result_value(state: GameState) -> int:
 def self_play_game(config: SelfPlayConfig) -> Dict:
 	state = GameState()
 	state.setup_starting_position()
-	mcts = MCTS()
+	use_gumbel = config.engine in ("gumbel", "gumbel_nn")
+	stats = SearchStats() if config.collect_stats else None
+	mcts = GumbelMCTS(max_considered=config.gumbel_considered, stats=stats) if use_gumbel else MCTS(stats=stats)
 	# choose policy function
 	policy_fn: PolicyFn
-	if config.engine == "mcts_nn":
+	if config.engine in ("mcts_nn", "gumbel_nn") and config.inference is not None:
+		policy_fn = config.inference.policy_fn
+		if config.engine == "mcts_nn" and config.pipeline_batch > 0:
+			mcts = PipelinedMCTS(config.inference.batch_policy_fn, batch_size=config.pipeline_batch, stats=stats)
+	elif config.engine in ("mcts_nn", "gumbel_nn"):
 		try:
-			from .nn import XQNet, state_to_tensor  # type: ignore
+			from .nn import XQNet, state_to_tensor, infer_policy_value  # type: ignore
 			import torch  # type: ignore
-			model = XQNet()
 			if config.model_path:
-				sd = torch.load(config.model_path, map_location="cpu")
-				model.load_state_dict(sd)
-			model.eval()
+				# loaded once per process, not per game
+				from alphazero.registry import cached_model
+				model = cached_model(config.model_path, config.precision)
+			else:
+				model = XQNet().eval()
 
 			def _pf(s: GameState):
 				with torch.no_grad():
-					x = state_to_tensor(s).unsqueeze(0)
+					with record_phase("encode"):
+						x = state_to_tensor(s).unsqueeze(0)
 					logits, v = model(x)
 					policy = torch.softmax(logits[0], dim=-1).tolist()
 					return policy, float(v.item())
 
 			policy_fn = _pf
+			if config.engine == "mcts_nn" and config.pipeline_batch > 0:
+				def _batch_pf(states: List[GameState]):
+					policies, values = infer_policy_value(model, states)
+					return list(zip(policies, values))
+
+				mcts = PipelinedMCTS(_batch_pf, batch_size=config.pipeline_batch, stats=stats)
+		except ValueError:  # precision refused by its calibration check
+			raise
 		except Exception:
 			policy_fn = default_policy_fn()
 	else:
 		policy_fn = default_policy_fn()
 
+	allocator = None
+	if config.adaptive_sims:
+		allocator = SimAllocator(BudgetConfig(mean_sims=config.sims, min_sims=max(1, config.sims // 8), max_sims=config.sims * 4))
+
 	records: List[Dict] = []
 	moves_san: List[Dict] = []
 	for ply in range(config.max_moves):
-		root = mcts.run(state, policy_fn, num_simulations=config.sims)
+		full_search = config.full_search_prob >= 1.0 or random.random() < config.full_search_prob
+		if full_search and allocator is not None:
+			root = run_adaptive(mcts, state, policy_fn, allocator)
+			full_search = len(root.actions) > 1
+		elif full_search:
+			root = mcts.run(state, policy_fn, num_simulations=config.sims)
+		else:
+			root = mcts.run(state, policy_fn, num_simulations=config.fast_sims, add_noise=False)
 		tau = config.tau_start if ply < config.tau_moves else config.tau_final
 		probs = mcts.action_probs(root, tau=tau)
 		if not probs:
 			break
-		# sample move index
-		idx = _select_with_temperature(probs, tau)
+		# sample move index (gumbel: the sequential-halving winner; pi is the improved policy)
+		if use_gumbel:
+			idx = mcts.best_action(root)
+		else:
+			idx = _select_with_temperature(probs, tau)
 		from_sq = idx // C.NUM_SQUARES
 		to_sq = idx % C.NUM_SQUARES
 		# find move object
@@ -149,10 +200,11 @@ def self_play_game(config: SelfPlayConfig) -> Dict:
 		# record training sample from current state's POV
 		rec = {
 			"player": 1 if state.side_to_move == C.RED else -1,
+			"has_pi": full_search,
 		}
 		if config.store_planes:
 			rec["planes"] = state.to_planes()
-		if config.store_pi:
+		if config.store_pi and full_search:
 			rec["pi"] = {str(k): float(v) for k, v in probs.items()}
 		records.append(rec)
 		moves_san.append({"from": move_obj.from_sq, "to": move_obj.to_sq, "move_id": int(move_obj)})
@@ -169,11 +221,16 @@ def self_play_game(config: SelfPlayConfig) -> Dict:
 		# optionally drop player field
 		del rec["player"]
 
-	return {
+	game = {
 		"moves": moves_san,
 		"result": final,
 		"records": records,
 	}
+	if stats is not None:
+		game["search_stats"] = stats.summary()
+	if config.inference is not None and config.inference.version is not None:
+		game["model_version"] = config.inference.version
+	return game
 
 
 def save_jsonl(path: str, games: List[Dict]) -> None:
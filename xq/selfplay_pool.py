@@ -0,0 +1,265 @@
+from __future__ import annotations
+
+import json
+import multiprocessing as mp
+import os
+import random
+import signal
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from multiprocessing.connection import Connection, wait
+from typing import Callable, Dict, List, Optional
+
+from .selfplay import SelfPlayConfig, self_play_game
+
+
+class ShardWriter:
+	"""Streams games as JSONL lines, flushed one game at a time, so finished games
+	survive an interrupted run. With games_per_shard <= 0 every game goes to path;
+	otherwise path "dir/sp.jsonl" rotates through dir/sp_00000.jsonl, sp_00001.jsonl,
+	... with at most games_per_shard games each."""
+
+	def __init__(self, path: str, games_per_shard: int = 0) -> None:
+		self.path = path
+		self.games_per_shard = games_per_shard
+		self.paths: List[str] = []
+		self._file = None
+		self._in_shard = 0
+		os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+	def _shard_path(self, index: int) -> str:
+		if self.games_per_shard <= 0:
+			return self.path
+		root, ext = os.path.splitext(self.path)
+		return f"{root}_{index:05d}{ext or '.jsonl'}"
+
+	def write(self, game: Dict) -> str:
+		"""Append game; returns the shard it went to."""
+		if self._file is None or (self.games_per_shard > 0 and self._in_shard >= self.games_per_shard):
+			self.close()
+			self.paths.append(self._shard_path(len(self.paths)))
+			self._file = open(self.paths[-1], "w", encoding="utf-8")
+			self._in_shard = 0
+		self._file.write(json.dumps(game, ensure_ascii=False) + "\n")
+		self._file.flush()
+		self._in_shard += 1
+		return self.paths[-1]
+
+	def close(self) -> None:
+		if self._file is not None:
+			self._file.close()
+			self._file = None
+
+
+@dataclass
+class SelfPlayProgress:
+	games_done: int
+	games_total: int
+	positions: int
+	elapsed_s: float
+	games_per_s: float
+	shard: str  # shard the latest game was written to
+	worker: int
+	result: int  # result of the latest game (1 red win, -1 black win, 0 draw)
+
+
+@dataclass
+class SelfPlayRun:
+	games: int = 0
+	positions: int = 0
+	errors: List[str] = field(default_factory=list)
+	shards: List[str] = field(default_factory=list)
+	stopped: bool = False
+	elapsed_s: float = 0.0
+
+
+def _pool_worker(worker_id: int, seed: int, config: SelfPlayConfig, conn) -> None:
+	"""Play one game per task received on conn until a None task or a closed pipe.
+	The model (config.model_path) is loaded once through the process-wide registry
+	and reused by every game."""
+	signal.signal(signal.SIGINT, signal.SIG_IGN)  # the parent decides when to stop
+	random.seed(seed)
+	try:
+		import numpy as np
+		import torch  # type: ignore
+		np.random.seed(seed % (1 << 32))
+		torch.manual_seed(seed)
+		torch.set_num_threads(1)
+	except Exception:
+		pass
+	while True:
+		try:
+			task = conn.recv()
+		except EOFError:
+			break
+		if task is None:
+			break
+		run_id, game_index = task
+		try:
+			reply = (run_id, game_index, "game", self_play_game(config))
+		except Exception as e:  # report and keep playing
+			reply = (run_id, game_index, "error", f"game {game_index}: {e!r}")
+		conn.send(reply)
+
+
+class SelfPlayPool:
+	"""Self-play on a pool of pre-started worker processes (one game per task).
+
+	Each worker is seeded with seed + worker index and keeps its model loaded
+	between games and runs, so startup costs are paid once. run() hands games to
+	idle workers, streams finished games to ShardWriter shards in completion order
+	and reports progress after each. request_stop() (thread-safe) lets in-flight
+	games finish and be written but starts no new ones; run() then returns early
+	with stopped set. A stop requested between runs applies to the next run.
+
+	Every worker has its own pipe, so one that dies (even mid-message) cannot block
+	the others. It is replaced; the game it was playing is requeued once and
+	recorded in the run's errors if it is lost again.
+	"""
+
+	def __init__(
+		self,
+		config: SelfPlayConfig,
+		workers: Optional[int] = None,
+		seed: Optional[int] = None,
+		start_method: str = "spawn",
+	) -> None:
+		self._ctx = mp.get_context(start_method)
+		self.config = config
+		self._stop = threading.Event()
+		self._run_id = 0
+		self._lock = threading.Lock()
+		self._seed = random.getrandbits(31) if seed is None else seed
+		self._next_worker = 0
+		self._procs: Dict[int, mp.process.BaseProcess] = {}
+		self._conns: Dict[int, Connection] = {}
+		for _ in range(max(1, workers or os.cpu_count() or 1)):
+			self._start_worker()
+
+	def _start_worker(self) -> None:
+		# replacements get fresh ids (and seeds), so a dead worker's game is never
+		# attributed to its successor
+		i = self._next_worker
+		self._next_worker += 1
+		parent_conn, child_conn = self._ctx.Pipe()
+		p = self._ctx.Process(target=_pool_worker, args=(i, self._seed + i, self.config, child_conn), daemon=True)
+		p.start()
+		child_conn.close()
+		self._procs[i] = p
+		self._conns[i] = parent_conn
+
+	@property
+	def workers(self) -> int:
+		return len(self._procs)
+
+	def request_stop(self) -> None:
+		self._stop.set()
+
+	def run(
+		self,
+		num_games: int,
+		out_path: str,
+		games_per_shard: int = 0,
+		progress: Optional[Callable[[SelfPlayProgress], None]] = None,
+	) -> SelfPlayRun:
+		"""Play num_games across the workers, writing them to out_path (see ShardWriter)."""
+		with self._lock:
+			self._run_id += 1
+			run_id = self._run_id
+			pending = deque(range(num_games))
+			writer = ShardWriter(out_path, games_per_shard)
+			summary = SelfPlayRun()
+			t0 = time.perf_counter()
+			finished = set()  # game indices written, failed or skipped
+			in_flight: Dict[int, int] = {}  # worker id -> game index it is playing
+			requeued = set()
+			respawns = 0
+			try:
+				while len(finished) < num_games:
+					for worker, p in list(self._procs.items()):
+						if p.is_alive():
+							continue
+						del self._procs[worker]
+						self._conns.pop(worker).close()
+						p.join(timeout=1.0)
+						self._start_worker()
+						respawns += 1
+						game = in_flight.pop(worker, None)
+						if game is None or game in finished:
+							continue
+						if game in requeued:
+							finished.add(game)
+							summary.errors.append(f"game {game}: worker exited with code {p.exitcode}")
+						else:
+							requeued.add(game)
+							pending.appendleft(game)
+					if respawns > 2 * num_games:  # more deaths than lost games can explain
+						summary.errors.append("self-play workers keep exiting")
+						break
+					if self._stop.is_set():
+						finished.update(pending)  # skipped
+						pending.clear()
+					for worker, conn in self._conns.items():
+						if pending and worker not in in_flight:
+							game = pending.popleft()
+							try:
+								conn.send((run_id, game))
+							except OSError:  # died; replaced on the next pass
+								pending.appendleft(game)
+								continue
+							in_flight[worker] = game
+					busy = {self._conns[w]: w for w in in_flight}
+					for conn in wait(list(busy), timeout=1.0):
+						worker = busy[conn]
+						try:
+							rid, game, kind, payload = conn.recv()
+						except (EOFError, OSError):
+							continue  # died; replaced on the next pass
+						if rid != run_id:
+							continue  # a game left over from an earlier run that broke off
+						if in_flight.get(worker) == game:
+							del in_flight[worker]
+						if game in finished:
+							continue  # the original of a requeued game finished after all
+						finished.add(game)
+						if kind == "error":
+							summary.errors.append(payload)
+							continue
+						shard = writer.write(payload)
+						summary.games += 1
+						summary.positions += len(payload["records"])
+						if progress is not None:
+							elapsed = time.perf_counter() - t0
+							progress(SelfPlayProgress(
+								games_done=summary.games,
+								games_total=num_games,
+								positions=summary.positions,
+								elapsed_s=elapsed,
+								games_per_s=summary.games / elapsed if elapsed > 0 else 0.0,
+								shard=shard,
+								worker=worker,
+								result=payload["result"],
+							))
+			finally:
+				writer.close()
+			summary.stopped = self._stop.is_set()
+			self._stop.clear()
+			summary.shards = list(writer.paths)
+			summary.elapsed_s = time.perf_counter() - t0
+			return summary
+
+	def close(self) -> None:
+		for conn in self._conns.values():
+			try:
+				conn.send(None)
+				conn.close()
+			except OSError:
+				pass
+		for p in self._procs.values():
+			p.join(timeout=5.0)
+			if p.is_alive():
+				p.terminate()
+		self._procs = {}
+		self._conns = {}
@@ -0,0 +1,156 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+
+PHASES = ("select", "movegen", "encode", "inference", "backup")
+
+
+class SearchStats:
+	"""Optional MCTS instrumentation.
+
+	Attach one to MCTS (or GenericMCTS) with stats=SearchStats(): each search then
+	records into a fresh collector, returned in SearchInfo.stats, and merges it into
+	the attached one, which therefore aggregates over a game or a session.
+
+	Recorded: wall time and simulations, time per phase (select, movegen, encode,
+	inference, backup), NN batch sizes and latencies, leaf depth and branching
+	factor histograms, nodes expanded, and cache hits (simulations that end in a
+	cached terminal/proven node instead of a network evaluation).
+
+	Policy functions can time their own encoding with `with record_phase("encode")`:
+	while a searcher calls them, that goes to the search's collector and is
+	subtracted from the inference time measured around the call.
+	"""
+
+	def __init__(self) -> None:
+		self.reset()
+
+	def reset(self) -> None:
+		self.searches = 0
+		self.simulations = 0
+		self.wall_s = 0.0
+		self.phase_s: Dict[str, float] = {p: 0.0 for p in PHASES}
+		self.batch_sizes: Counter = Counter()
+		self.latencies_s: List[float] = []
+		self.depths: Counter = Counter()
+		self.branching: Counter = Counter()
+		self.nodes = 0
+		self.cache_hits = 0
+		self.cache_lookups = 0
+
+	def add_time(self, phase: str, seconds: float) -> None:
+		self.phase_s[phase] = self.phase_s.get(phase, 0.0) + seconds
+
+	@contextmanager
+	def timed(self, phase: str) -> Iterator[None]:
+		t = time.perf_counter()
+		try:
+			yield
+		finally:
+			self.add_time(phase, time.perf_counter() - t)
+
+	def record_batch(self, size: int, latency_s: float) -> None:
+		self.batch_sizes[size] += 1
+		self.latencies_s.append(latency_s)
+
+	def record_leaf(self, depth: int, cached: bool) -> None:
+		self.depths[depth] += 1
+		self.cache_lookups += 1
+		if cached:
+			self.cache_hits += 1
+
+	def record_expand(self, branching: int) -> None:
+		self.nodes += 1
+		self.branching[branching] += 1
+
+	def merge(self, other: "SearchStats") -> None:
+		self.searches += other.searches
+		self.simulations += other.simulations
+		self.wall_s += other.wall_s
+		for p, s in other.phase_s.items():
+			self.add_time(p, s)
+		self.batch_sizes.update(other.batch_sizes)
+		self.latencies_s.extend(other.latencies_s)
+		self.depths.update(other.depths)
+		self.branching.update(other.branching)
+		self.nodes += other.nodes
+		self.cache_hits += other.cache_hits
+		self.cache_lookups += other.cache_lookups
+
+	def summary(self) -> dict:
+		"""JSON-friendly digest. phase_share is each phase's share of wall time; with a
+		pipelined search inference overlaps traversal, so shares can sum past 1."""
+		wall = self.wall_s
+		lat = sorted(self.latencies_s)
+		batches = sum(self.batch_sizes.values())
+		return {
+			"searches": self.searches,
+			"simulations": self.simulations,
+			"wall_s": wall,
+			"sims_per_sec": (self.simulations / wall) if wall > 0 else None,
+			"phase_s": dict(self.phase_s),
+			"phase_share": {p: (s / wall if wall > 0 else 0.0) for p, s in self.phase_s.items()},
+			"nn": {
+				"batches": batches,
+				"mean_batch": (sum(k * n for k, n in self.batch_sizes.items()) / batches) if batches else None,
+				"batch_sizes": _hist(self.batch_sizes),
+				"latency_ms": None if not lat else {
+					"mean": 1000.0 * sum(lat) / len(lat),
+					"p50": 1000.0 * _percentile(lat, 0.5),
+					"p95": 1000.0 * _percentile(lat, 0.95),
+					"max": 1000.0 * lat[-1],
+				},
+			},
+			"depth": {"mean": _mean(self.depths), "max": max(self.depths) if self.depths else 0, "hist": _hist(self.depths)},
+			"branching": {"mean": _mean(self.branching), "hist": _hist(self.branching)},
+			"nodes": self.nodes,
+			"cache_hit_rate": (self.cache_hits / self.cache_lookups) if self.cache_lookups else None,
+		}
+
+
+def _hist(c: Counter) -> Dict[str, int]:
+	return {str(k): c[k] for k in sorted(c)}
+
+
+def _mean(c: Counter) -> Optional[float]:
+	n = sum(c.values())
+	return (sum(k * v for k, v in c.items()) / n) if n else None
+
+
+def _percentile(sorted_vals: List[float], q: float) -> float:
+	return sorted_vals[min(len(sorted_vals) - 1, int(q * len(sorted_vals)))]
+
+
+_active = threading.local()
+
+
+def active_stats() -> Optional[SearchStats]:
+	"""Collector of the search currently calling a policy function on this thread."""
+	return getattr(_active, "stats", None)
+
+
+@contextmanager
+def collecting(stats: Optional[SearchStats]) -> Iterator[None]:
+	"""Make stats the active collector for this thread (used around policy calls)."""
+	prev = getattr(_active, "stats", None)
+	_active.stats = stats
+	try:
+		yield
+	finally:
+		_active.stats = prev
+
+
+@contextmanager
+def record_phase(phase: str) -> Iterator[None]:
+	"""Time a block into the active collector's phase; no-op outside instrumented searches."""
+	st = getattr(_active, "stats", None)
+	if st is None:
+		yield
+		return
+	with st.timed(phase):
+		yield
@@ -5,7 +5,8 @@ import time
 from dataclasses import dataclass
 from typing import Optional, Callable
 
-from .selfplay import SelfPlayConfig, self_play_game, save_jsonl
+from .selfplay import SelfPlayConfig, self_play_game
+from .selfplay_pool import SelfPlayPool, SelfPlayProgress, ShardWriter
 
 
 @dataclass
@@ -20,6 +21,13 @@ class TrainLoopConfig:
 	model_path: str = "models/latest.pt"
 	data_dir: str = "data"
 	use_nn: bool = False  # if true, use mcts_nn; else mcts
+	full_search_prob: float = 1.0  # playout cap randomisation (see SelfPlayConfig)
+	fast_sims: int = 32
+	compact_actions: bool = False  # new models predict the compact action space (xq.policy)
+	checkpoint_format: str = "torch"  # "torch" (torch.save) or "flat" (alphazero.checkpoint, mmap-loaded)
+	# self-play worker processes (xq.selfplay_pool, kept across iterations); 0 plays in this process
+	selfplay_workers: int = 0
+	games_per_shard: int = 0  # rotate the iteration's JSONL output every N games (0 = one file)
 
 
 @dataclass
@@ -46,6 +54,7 @@ class TrainLoopStatus:
 
 _global_status = TrainLoopStatus()
 _stop_requested = False
+_pool: Optional[SelfPlayPool] = None
 
 
 def get_status() -> TrainLoopStatus:
@@ -55,6 +64,23 @@ def get_status() -> TrainLoopStatus:
 def request_stop() -> None:
 	global _stop_requested
 	_stop_requested = True
+	if _pool is not None:
+		_pool.request_stop()  # in-flight games finish and are saved, no new ones start
+
+
+def _get_pool(config: TrainLoopConfig, sp_config: SelfPlayConfig) -> SelfPlayPool:
+	global _pool
+	if _pool is None or _pool.workers != config.selfplay_workers or _pool.config != sp_config:
+		close_pool()
+		_pool = SelfPlayPool(sp_config, workers=config.selfplay_workers)
+	return _pool
+
+
+def close_pool() -> None:
+	global _pool
+	if _pool is not None:
+		_pool.close()
+		_pool = None
 
 
 def train_loop_iteration(config: TrainLoopConfig, status_callback: Optional[Callable[[str], None]] = None) -> bool:
@@ -84,21 +110,53 @@ def train_loop_iteration(config: TrainLoopConfig, status_callback: Optional[Call
 		model_path=config.model_path if config.use_nn else None,
 		store_planes=True,
 		store_pi=True,
+		full_search_prob=config.full_search_prob,
+		fast_sims=config.fast_sims,
 	)
 	
-	games = []
-	for i in range(config.games_per_batch):
-		if _stop_requested:
-			_global_status.message = "已停止"
-			_global_status.running = False
-			return False
-		g = self_play_game(sp_config)
-		games.append(g)
-		_global_status.games_played += 1
-		_global_status.samples_collected += len(g['records'])
+	games_before, samples_before = _global_status.games_played, _global_status.samples_collected
+	
+	def _progress(p: SelfPlayProgress) -> None:
+		_global_status.games_played = games_before + p.games_done
+		_global_status.samples_collected = samples_before + p.positions
+		_global_status.message = f"自对弈中 ({p.games_done}/{p.games_total} 局, {p.games_per_s:.2f} 局/秒)"
+		if status_callback:
+			status_callback(_global_status.message)
+	
+	if config.selfplay_workers > 0:
+		pool = _get_pool(config, sp_config)
+		if _stop_requested:  # requested while the pool was starting
+			pool.request_stop()
+		shards = pool.run(config.games_per_batch, jsonl_path, config.games_per_shard, _progress).shards
+	else:
+		writer = ShardWriter(jsonl_path, config.games_per_shard)
+		t0 = time.perf_counter()
+		positions = 0
+		for i in range(config.games_per_batch):
+			if _stop_requested:
+				break
+			g = self_play_game(sp_config)
+			shard = writer.write(g)
+			positions += len(g['records'])
+			elapsed = time.perf_counter() - t0
+			_progress(SelfPlayProgress(
+				games_done=i + 1,
+				games_total=config.games_per_batch,
+				positions=positions,
+				elapsed_s=elapsed,
+				games_per_s=(i + 1) / elapsed,
+				shard=shard,
+				worker=0,
+				result=g['result'],
+			))
+		writer.close()
+		shards = writer.paths
+	if _stop_requested:
+		_global_status.message = "已停止"
+		_global_status.running = False
+		return False
 	
-	save_jsonl(jsonl_path, games)
-	_global_status.message = f"已保存 {jsonl_path}"
+	_global_status.message = f"已保存 {', '.join(shards)}"
 	if status_callback:
 		status_callback(_global_status.message)
 	
@@ -114,24 +172,42 @@ def train_loop_iteration(config: TrainLoopConfig, status_callback: Optional[Call
 	
 	try:
 		from .nn import XQNet
+		from .encoding import planes_to_tensor
 		import torch
 		import torch.nn as nn
 		import torch.optim as optim
 		from torch.utils.data import Dataset, DataLoader
 		import json
-		from . import constants as C
+		from .policy import NUM_ACTIONS, NUM_COMPACT_ACTIONS, pi_to_compact
 		
 		# Load data
 		records = []
-		with open(jsonl_path, 'r', encoding='utf-8') as f:
-			for line in f:
-				game = json.loads(line.strip())
-				records.extend(game.get('records', []))
+		for shard in shards:
+			with open(shard, 'r', encoding='utf-8') as f:
+				for line in f:
+					game = json.loads(line.strip())
+					records.extend(game.get('records', []))
 		
 		if not records:
 			_global_status.message = "无训练数据"
 			return True
 		
+		# Model
+		device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+		model = XQNet(compact=config.compact_actions)
+		
+		# Resume from existing model (its head decides the action space)
+		if os.path.exists(config.model_path):
+			from alphazero.checkpoint import is_flat, read_flat
+			if is_flat(config.model_path):
+				_, state_dict = read_flat(config.model_path)
+			else:
+				state_dict = torch.load(config.model_path, map_location="cpu")
+			model = XQNet(compact=state_dict["p_fc.weight"].shape[0] == NUM_COMPACT_ACTIONS)
+			model.load_state_dict(state_dict)
+		model = model.to(device)
+		compact = model.p_fc.out_features == NUM_COMPACT_ACTIONS
+		
 		# Dataset
 		class XQDataset(Dataset):
 			def __init__(self, recs):
@@ -145,30 +221,19 @@ def train_loop_iteration(config: TrainLoopConfig, status_callback: Optional[Call
 				planes = rec['planes']
 				pi = rec.get('pi', {})
 				z = rec['z']
-				tensor_planes = torch.zeros((15, C.RANKS, C.FILES), dtype=torch.float32)
-				for c in range(15):
-					for sq in range(C.NUM_SQUARES):
-						r = C.rank_of(sq)
-						f = C.file_of(sq)
-						tensor_planes[c, r, f] = float(planes[c][sq])
-				pi_tensor = torch.zeros(C.NUM_SQUARES * C.NUM_SQUARES, dtype=torch.float32)
-				for k, v in pi.items():
+				tensor_planes = planes_to_tensor(planes)
+				pi_tensor = torch.zeros(NUM_COMPACT_ACTIONS if compact else NUM_ACTIONS, dtype=torch.float32)
+				for k, v in (pi_to_compact(pi) if compact else pi).items():
 					pi_tensor[int(k)] = float(v)
 				z_tensor = torch.tensor(float(z), dtype=torch.float32)
-				return tensor_planes, pi_tensor, z_tensor
+				has_pi = torch.tensor(1.0 if (pi and rec.get('has_pi', True)) else 0.0, dtype=torch.float32)
+				return tensor_planes, pi_tensor, z_tensor, has_pi
 		
 		dataset = XQDataset(records)
 		loader = DataLoader(dataset, batch_size=config.train_batch_size, shuffle=True)
 		
-		device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-		model = XQNet().to(device)
-		
-		# Resume from existing model
-		if os.path.exists(config.model_path):
-			model.load_state_dict(torch.load(config.model_path, map_location=device))
-		
 		optimizer = optim.Adam(model.parameters(), lr=config.train_lr, weight_decay=1e-4)
-		criterion_policy = nn.CrossEntropyLoss()
+		criterion_policy = nn.CrossEntropyLoss(reduction="none")
 		criterion_value = nn.MSELoss()
 		
 		total_loss = 0.0
@@ -176,14 +241,16 @@ def train_loop_iteration(config: TrainLoopConfig, status_callback: Optional[Call
 			if _stop_requested:
 				break
 			model.train()
-			for planes, pi_target, z_target in loader:
+			for planes, pi_target, z_target, has_pi in loader:
 				planes = planes.to(device)
 				pi_target = pi_target.to(device)
 				z_target = z_target.to(device)
+				has_pi = has_pi.to(device)
 				
 				optimizer.zero_grad()
 				logits, v = model(planes)
-				loss_p = criterion_policy(logits, pi_target)
+				# policy loss only on records with a full-search pi target
+				loss_p = (criterion_policy(logits, pi_target) * has_pi).sum() / has_pi.sum().clamp(min=1.0)
 				loss_v = criterion_value(v, z_target)
 				loss = loss_p + loss_v
 				loss.backward()
@@ -195,7 +262,11 @@ def train_loop_iteration(config: TrainLoopConfig, status_callback: Optional[Call
 		
 		# Save model
 		os.makedirs(os.path.dirname(config.model_path) or ".", exist_ok=True)
-		torch.save(model.state_dict(), config.model_path)
+		if config.checkpoint_format == "flat":
+			from alphazero.checkpoint import save_flat
+			save_flat(model, config.model_path, meta={"iteration": _global_status.iteration})
+		else:
+			torch.save(model.state_dict(), config.model_path)
 		_global_status.current_model = config.model_path
 		_global_status.message = f"模型已保存，损失: {avg_loss:.4f}"
 		if status_callback:
@@ -216,9 +287,12 @@ def run_train_loop(config: TrainLoopConfig, status_callback: Optional[Callable[[
 	_stop_requested = False
 	_global_status = TrainLoopStatus(running=True, current_model=config.model_path)
 	
-	for i in range(config.max_iterations):
-		if not train_loop_iteration(config, status_callback):
-			break
+	try:
+		for i in range(config.max_iterations):
+			if not train_loop_iteration(config, status_callback):
+				break
+	finally:
+		close_pool()
 	
 	_global_status.running = False
 	_global_status.message = "训练循环结束"